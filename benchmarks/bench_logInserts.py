@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import tempfile
+
+# Add the src directory to the Python path so we can import modules from there
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import init_db
+from logWriter import INSERT_LOG, log_records
+
+# One fan-out signal: a log row per (account, tp) leg
+ROWS_PER_MESSAGE = 6
+BATCH_ROWS = 100
+
+
+def message_rows():
+    parameters = json.dumps({"signal": "buy", "symbol": "XAUUSD", "price": 2000.0, "sl": 1990.0, "tp": [2010.0]})
+    response = json.dumps({"success": True, "result": {"retcode": 10009, "deal": 67890, "order": 12345}})
+    return log_records("Gold Signals", "XAUUSD buy 2000 sl 1990 tp 2010", [
+        (parameters, response, None, 1, '2024-01-01 00:00:00', None)
+    ] * ROWS_PER_MESSAGE, '2024-01-01 00:00:00')
+
+
+def new_database(directory, name, wal):
+    init_db.DB_FILE = os.path.join(directory, name)
+    init_db.initialize_database()
+    if not wal:
+        # The journal mode the database used before
+        conn = sqlite3.connect(init_db.DB_FILE)
+        conn.execute('PRAGMA journal_mode=DELETE')
+        conn.close()
+    return init_db.DB_FILE
+
+
+def connection_per_message(db_file, messages, records):
+    # What process_message did: connect, INSERT and commit each row, close
+    for _ in range(messages):
+        conn = sqlite3.connect(db_file)
+        cursor = conn.cursor()
+        for record in records:
+            cursor.execute(INSERT_LOG, record)
+            conn.commit()
+        conn.close()
+
+
+def shared_connection(db_file, messages, records):
+    # One tuned connection, still committing each row
+    conn = init_db.connect(db_file)
+    cursor = conn.cursor()
+    for _ in range(messages):
+        for record in records:
+            cursor.execute(INSERT_LOG, record)
+            conn.commit()
+    conn.close()
+
+
+def shared_connection_batched(db_file, messages, records):
+    # One tuned connection committing in batches, as the log writer does
+    conn = init_db.connect(db_file)
+    pending = []
+    for _ in range(messages):
+        pending.extend(records)
+        if len(pending) >= BATCH_ROWS:
+            conn.executemany(INSERT_LOG, pending)
+            conn.commit()
+            pending = []
+    if pending:
+        conn.executemany(INSERT_LOG, pending)
+        conn.commit()
+    conn.close()
+
+
+def measure(label, write, db_file, messages):
+    records = message_rows()
+    started = time.perf_counter()
+    write(db_file, messages, records)
+    elapsed = time.perf_counter() - started
+    count = messages * len(records)
+    print(f"{label:<55} {count / elapsed:>10,.0f} inserts/s  {elapsed / count * 1e6:>8.1f} us/insert")
+    return count / elapsed
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = measure("rollback journal, connection per message",
+                           connection_per_message, new_database(directory, 'before.db', wal=False), messages)
+        measure("WAL, connection per message",
+                connection_per_message, new_database(directory, 'wal.db', wal=True), messages)
+        shared = measure("WAL, shared tuned connection",
+                         shared_connection, new_database(directory, 'shared.db', wal=True), messages)
+        batched = measure(f"WAL, shared tuned connection, batches of {BATCH_ROWS}",
+                          shared_connection_batched, new_database(directory, 'batched.db', wal=True), messages)
+
+    print(f"\nShared WAL connection: {shared / baseline:.1f}x, with the log writer's batches: {batched / baseline:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+
+# Add the src directory to the Python path so we can import modules from there
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from cleanMessage import cleanMessage
+from currencies import currencies
+from validateOrder import validateOrder, _validateOrderHeuristic
+from parseCache import get_parse_cache
+from build_corpus import load_corpus
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Fraction of the baseline throughput a stage may lose before the suite fails
+DEFAULT_THRESHOLD = float(os.getenv('BENCH_REGRESSION_THRESHOLD', '0.15'))
+
+
+def previous_validateOrder(message):
+    # The parser as it was before: cleans again and compiles one regex per symbol on every call
+    message = cleanMessage(message)
+    currenciesList = currencies()
+
+    signal_match = re.search(r'\b(buy|sell)\b', message, re.IGNORECASE)
+    signal = signal_match.group().lower() if signal_match else None
+
+    symbol = None
+    if signal and signal_match:
+        signal_pos = signal_match.start()
+        currency_matches = []
+        for key, value in currenciesList.items():
+            for match in re.finditer(r'\b' + re.escape(value) + r'\b', message, flags=re.IGNORECASE):
+                currency_matches.append((abs(match.start() - signal_pos), value))
+        if currency_matches:
+            currency_matches.sort(key=lambda x: x[0])
+            symbol = currency_matches[0][1]
+
+    if not symbol:
+        for key, value in currenciesList.items():
+            if re.search(r'\b' + re.escape(value) + r'\b', message, flags=re.IGNORECASE):
+                symbol = value
+                break
+
+    if symbol:
+        message = re.sub(r'\b' + re.escape(symbol) + r'\b', '', message, flags=re.IGNORECASE).strip()
+    if signal:
+        message = re.sub(r'\b(buy|sell)\b', '', message, flags=re.IGNORECASE).strip()
+
+    sl_match = re.search(r'\bsl:? ?(\d+\.?\d*)', message, re.IGNORECASE)
+    sl = float(sl_match.group(1)) if sl_match else None
+    if sl:
+        message = re.sub(r'\bsl:? ?\d+\.?\d*', '', message, flags=re.IGNORECASE).strip()
+
+    tp_dot_matches = re.findall(r'\btp\.(\d+)\b', message, re.IGNORECASE)
+    tp_dot_values = [float('0.' + tp) for tp in tp_dot_matches]
+    message_without_dot_tp = message
+    for match in tp_dot_matches:
+        message_without_dot_tp = message_without_dot_tp.replace(f"tp.{match}", "")
+
+    tp_indexed_matches = re.findall(r'\btp\s+(\d+)\s+(\d+\.?\d*)', message_without_dot_tp, re.IGNORECASE)
+    tp_indexed_values = [float(match[1]) for match in tp_indexed_matches]
+    message_without_indexed_tp = message_without_dot_tp
+    for match in re.finditer(r'\btp\s+\d+\s+\d+\.?\d*', message_without_dot_tp, re.IGNORECASE):
+        message_without_indexed_tp = message_without_indexed_tp.replace(match.group(), "")
+
+    tp_matches = re.findall(r'\btp[.: ]?(\d+\.?\d*)', message_without_indexed_tp, re.IGNORECASE)
+    tps = tp_dot_values + tp_indexed_values + [float(tp) for tp in tp_matches]
+
+    if tp_dot_matches or tp_matches:
+        message = re.sub(r'\btp[.: ]?\d+\.?\d*', '', message, flags=re.IGNORECASE).strip()
+
+    range_match = re.search(r'(\d+\.?\d*) ?- ?(\d+\.?\d*)', message)
+    if range_match:
+        price = (float(range_match.group(1)), float(range_match.group(2)))
+    else:
+        price_match = re.search(r'\d+\.?\d*', message)
+        price = float(price_match.group()) if price_match else None
+
+    return {"signal": signal, "symbol": symbol, "price": price, "sl": sl, "tp": tps}
+
+
+def parse_raw(message):
+    return validateOrder(message)
+
+
+def parse_cleaned(message):
+    return validateOrder(message, cleaned=True)
+
+
+PREVIOUS = 'previous parser (raw input)'
+HEURISTIC = 'heuristic parser (cleaned input)'
+CLEANED = 'validateOrder (cleaned input)'
+
+# Stage name, function, and whether it takes the cleaned message. The previous
+# parser is only a reference point and never counts as a regression.
+STAGES = [
+    ('cleanMessage', cleanMessage, False),
+    (PREVIOUS, previous_validateOrder, False),
+    (HEURISTIC, _validateOrderHeuristic, True),
+    (CLEANED, parse_cleaned, True),
+    ('validateOrder (raw input)', parse_raw, False),
+]
+
+
+def _percentile(samples, fraction):
+    # Nearest-rank percentile of sorted samples
+    index = min(len(samples) - 1, max(0, int(round(fraction * len(samples))) - 1))
+    return samples[index]
+
+
+def measure_stage(function, messages, rounds):
+    # Throughput comes from the fastest round, the one least disturbed by the
+    # rest of the machine. Latency is timed message by message in every round.
+    function_latencies = []
+    fastest_round = None
+    for _ in range(rounds):
+        round_started = time.perf_counter()
+        for message in messages:
+            message_started = time.perf_counter_ns()
+            function(message)
+            function_latencies.append(time.perf_counter_ns() - message_started)
+        round_elapsed = time.perf_counter() - round_started
+        if fastest_round is None or round_elapsed < fastest_round:
+            fastest_round = round_elapsed
+
+    # Allocations are traced in a separate pass, tracing slows everything down
+    allocated = 0
+    tracemalloc.start()
+    try:
+        for message in messages:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            function(message)
+            allocated += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+    function_latencies.sort()
+    return {
+        'messages_per_sec': len(messages) / fastest_round,
+        'p50_us': _percentile(function_latencies, 0.50) / 1000,
+        'p99_us': _percentile(function_latencies, 0.99) / 1000,
+        'alloc_bytes_per_message': allocated / len(messages)
+    }
+
+
+def disagreements(corpus):
+    # Corpus messages validateOrder parses differently from the previous parser
+    return [entry['text'] for entry in corpus['messages']
+            if validateOrder(entry['text']) != previous_validateOrder(entry['text'])]
+
+
+def run(corpus, rounds=200):
+    """
+    Time every stage over the corpus and return the results, keyed by stage.
+    The parse cache is off, or every round after the first would be a hit.
+    """
+    messages = [entry['text'] for entry in corpus['messages']]
+    cleaned = [cleanMessage(message) for message in messages]
+
+    cache = get_parse_cache()
+    cache_size = cache.max_size
+    cache.max_size = 0
+    cache.clear()
+    try:
+        stages = {}
+        for name, function, takes_cleaned in STAGES:
+            stage_messages = cleaned if takes_cleaned else messages
+            # One untimed pass so imports and lazy tables don't count
+            for message in stage_messages:
+                function(message)
+            stages[name] = measure_stage(function, stage_messages, rounds)
+    finally:
+        cache.max_size = cache_size
+
+    return {
+        'corpus_version': corpus['version'],
+        'messages': len(messages),
+        'rounds': rounds,
+        'python': platform.python_version(),
+        'machine': platform.node(),
+        'stages': stages
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    # Stages whose throughput fell more than `threshold` below the baseline
+    regressions = []
+    for name, stage in results['stages'].items():
+        expected = baseline['stages'].get(name)
+        if expected is None or name == PREVIOUS:
+            continue
+        floor = expected['messages_per_sec'] * (1 - threshold)
+        if stage['messages_per_sec'] < floor:
+            regressions.append((name, stage['messages_per_sec'], expected['messages_per_sec']))
+    return regressions
+
+
+def load_baseline(path=BASELINE_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE_FILE):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+        f.write('\n')
+
+
+def report(results, baseline=None):
+    print(f"Corpus version {results['corpus_version']}: {results['messages']} messages x {results['rounds']} rounds")
+    print(f"{'stage':<32} {'msg/s':>12} {'p50 us':>9} {'p99 us':>9} {'alloc B/msg':>12} {'vs baseline':>12}")
+    for name, stage in results['stages'].items():
+        change = ''
+        if baseline and name in baseline['stages']:
+            ratio = stage['messages_per_sec'] / baseline['stages'][name]['messages_per_sec']
+            change = f"{(ratio - 1) * 100:+.1f}%"
+        print(f"{name:<32} {stage['messages_per_sec']:>12,.0f} {stage['p50_us']:>9.1f} {stage['p99_us']:>9.1f} "
+              f"{stage['alloc_bytes_per_message']:>12,.0f} {change:>12}")
+
+    # The gain over the previous parser comes from precompiled patterns and cleaning once;
+    # the strict fast path and cache lookup are shown on their own
+    stages = results['stages']
+    if all(name in stages for name in (PREVIOUS, HEURISTIC, CLEANED)):
+        speed = {name: stages[name]['messages_per_sec'] for name in (PREVIOUS, HEURISTIC, CLEANED)}
+        print(f"\nPrecompiled patterns, cleaning once: {speed[HEURISTIC] / speed[PREVIOUS]:.1f}x over the previous parser")
+        print(f"Strict fast path and cache lookup on top: {speed[CLEANED] / speed[HEURISTIC]:.2f}x over the heuristic parser alone")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parser benchmark over the signal corpus")
+    parser.add_argument('--rounds', type=int, default=200, help="Passes over the corpus per stage")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed throughput loss against the baseline, as a fraction")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="Baseline results file")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus()
+    differing = disagreements(corpus)
+    for message in differing:
+        print(f"validateOrder and the previous parser disagree on: {message!r}")
+    if differing:
+        return 1
+
+    results = run(corpus, args.rounds)
+    baseline = load_baseline(args.baseline)
+    if baseline and baseline['corpus_version'] != results['corpus_version']:
+        print(f"Baseline was measured on corpus version {baseline['corpus_version']}, not comparing")
+        baseline = None
+
+    report(results, baseline)
+
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print("\nNo baseline to compare with, run with --save-baseline first")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for name, current, expected in regressions:
+        print(f"\nREGRESSION {name}: {current:,.0f} msg/s, baseline {expected:,.0f} msg/s "
+              f"(more than {args.threshold:.0%} slower)")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import os
+import re
+import sys
+import json
+import sqlite3
+import argparse
+
+# Add the src directory to the Python path so we can import modules from there
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from init_db import DB_FILE
+
+CORPUS_FILE = os.path.join(os.path.dirname(__file__), 'corpus', 'signals.json')
+
+# Anything that could identify a channel or a person
+URL_PATTERN = re.compile(r'(?:https?://|www\.|t\.me/)\S+', re.IGNORECASE)
+EMAIL_PATTERN = re.compile(r'\b[\w.+-]+@[\w-]+\.[\w.]+\b')
+HANDLE_PATTERN = re.compile(r'(?<![\w@])@[A-Za-z_]\w{3,}')
+
+
+def anonymise(message):
+    # Prices, symbols and layout are what the parser sees, so only names and links go
+    message = URL_PATTERN.sub('link', message)
+    message = EMAIL_PATTERN.sub('user@example.com', message)
+    return HANDLE_PATTERN.sub('@channel', message)
+
+
+def load_corpus(path=CORPUS_FILE):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_corpus(corpus, path=CORPUS_FILE):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(corpus, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+def add_log_messages(corpus, conn, limit):
+    """
+    Append up to `limit` anonymised logs.message rows not in the corpus yet.
+    The corpus version is bumped when anything was added, so results
+    measured on the previous corpus are never compared with the new one.
+    """
+    known = {entry['text'] for entry in corpus['messages']}
+    cursor = conn.cursor()
+    cursor.execute("SELECT message FROM logs WHERE message IS NOT NULL AND message != '' ORDER BY id DESC")
+
+    added = 0
+    for (message,) in cursor:
+        if added >= limit:
+            break
+        message = anonymise(message)
+        if message in known:
+            continue
+        known.add(message)
+        corpus['messages'].append({"source": "log", "text": message})
+        added += 1
+
+    if added:
+        corpus['version'] += 1
+    return added
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add anonymised messages from the logs table to the benchmark corpus")
+    parser.add_argument('--db', default=DB_FILE, help="SQLite database file")
+    parser.add_argument('--limit', type=int, default=200, help="Maximum number of messages to add")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus()
+    conn = sqlite3.connect(args.db)
+    try:
+        added = add_log_messages(corpus, conn, args.limit)
+    finally:
+        conn.close()
+
+    if added:
+        save_corpus(corpus)
+    print(f"Added {added} messages, corpus version {corpus['version']} has {len(corpus['messages'])} messages")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+import os
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dotenv import load_dotenv
+from parsedOrder import OrderLeg
+
+# Load environment variables
+load_dotenv()
+
+# Jobs waiting for one worker; signals for its account beyond that fail at once
+JOB_QUEUE_SIZE = int(os.getenv('MT5_WORKER_QUEUE_SIZE', '16'))
+
+EXPIRED = "Order expired before the worker could send it"
+
+
+class MT5Backend:
+    """
+    Sends orders through a real MetaTrader 5 terminal.
+
+    Each worker process owns one terminal, so MetaTrader5 is only imported
+    inside the worker once the process has started.
+    """
+
+    def __init__(self, account_info):
+        self.account_info = account_info
+
+    def start(self):
+        import mt5Session
+        from sendOrder import sendOrderBatch
+        from tickPoller import start_tick_poller
+        from warmup import WARMUP_ENABLED, warm_up
+
+        # Point this process' session at the account's own terminal
+        mt5Session.session = mt5Session.MT5Session(path=self.account_info.get('terminal_path'))
+        self.send_batch = sendOrderBatch
+        # Log in and select the symbols now rather than on the first signal
+        if WARMUP_ENABLED:
+            warm_up(accounts=[self.account_info])
+        # Keep the ticks of this terminal's symbols fresh between signals
+        start_tick_poller()
+
+    def send(self, order_json, legs, stop_on_failure=False, deadline=None):
+        return self.send_batch(order_json, legs, stop_on_failure=stop_on_failure, deadline=deadline)
+
+    def stop(self):
+        import mt5Session
+        from tickPoller import stop_tick_poller
+        stop_tick_poller()
+        mt5Session.get_session().shutdown()
+
+
+class FakeBackend:
+    """
+    Pretends to send orders so the pool can be exercised without MetaTrader 5.
+    `latency` is the time spent per leg, `fail` makes every leg fail.
+    """
+
+    def __init__(self, account_info, latency=0.0, fail=False):
+        self.account_info = account_info
+        self.latency = latency
+        self.fail = fail
+
+    def start(self):
+        self.ticket = 0
+
+    def send(self, order_json, legs, stop_on_failure=False, deadline=None):
+        results = []
+        for account_info, tp in legs:
+            if deadline is not None and time.time() >= deadline:
+                response = {"success": False, "error": EXPIRED}
+            elif self.fail:
+                time.sleep(self.latency)
+                response = {"success": False, "error": "Fake order failure"}
+            else:
+                time.sleep(self.latency)
+                self.ticket += 1
+                response = {
+                    "success": True,
+                    "result": {"retcode": 10009, "order": self.ticket, "pid": os.getpid()}
+                }
+            results.append({
+                "account": account_info['account_name'],
+                "id": account_info.get('id'),
+                "tp": tp,
+                "response": response
+            })
+            if stop_on_failure and not response['success']:
+                break
+        return results
+
+    def stop(self):
+        pass
+
+
+class FakeBackendFactory:
+    # Picklable factory so a configured FakeBackend can be built inside each worker
+    def __init__(self, latency=0.0, fail=False):
+        self.latency = latency
+        self.fail = fail
+
+    def __call__(self, account_info):
+        return FakeBackend(account_info, latency=self.latency, fail=self.fail)
+
+
+def _leg_failures(account_info, tps, error):
+    return [{
+        "account": account_info['account_name'],
+        "id": account_info.get('id'),
+        "tp": tp,
+        "response": {"success": False, "error": error}
+    } for tp in tps]
+
+
+def _worker_main(account_info, backend_factory, jobs, results):
+    backend = backend_factory(account_info)
+    try:
+        backend.start()
+    except Exception as e:
+        logging.error(f"Worker for account {account_info['account_name']} failed to start: {e}")
+        backend = None
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+
+        job_id, order_json, tps, stop_on_failure, deadline = job
+        legs = [OrderLeg(account_info, tp) for tp in tps]
+        # A job that waited past its deadline is reported, never sent late
+        if time.time() >= deadline:
+            leg_results = _leg_failures(account_info, tps, EXPIRED)
+        else:
+            try:
+                if backend is None:
+                    raise RuntimeError("Worker backend is not available")
+                leg_results = backend.send(order_json, legs, stop_on_failure, deadline)
+            except Exception as e:
+                leg_results = _leg_failures(account_info, tps, f"Worker error: {e}")
+        results.put((job_id, account_info['id'], leg_results))
+
+    if backend is not None:
+        backend.stop()
+
+
+class AccountWorkerPool:
+    """
+    One long-lived worker process per MetaTrader account.
+
+    Each worker drives its own terminal and receives order jobs over its own
+    IPC queue, so one signal reaches every account at the same time instead of
+    one account after another.
+
+    A leg not sent within `timeout` seconds of the signal is dropped by the
+    worker and reported as expired. `send` waits `grace` seconds more for the
+    legs already on their way to the broker, so the results say what was sent.
+    """
+
+    def __init__(self, accounts, backend_factory=MT5Backend, timeout=60, grace=10, queue_size=JOB_QUEUE_SIZE):
+        self.accounts = list(accounts)
+        self.backend_factory = backend_factory
+        self.timeout = timeout
+        self.grace = grace
+        self.queue_size = queue_size
+        # spawn gives every worker a clean MetaTrader5 module, and is the only option on Windows
+        self.context = multiprocessing.get_context('spawn')
+        self.results = self.context.Queue()
+        self.workers = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.next_job_id = 0
+        self.collector = None
+        self.running = False
+
+    def start(self):
+        for account_info in self.accounts:
+            self._start_worker(account_info)
+
+        self.running = True
+        self.collector = threading.Thread(target=self._collect_results, name="mt5-worker-results", daemon=True)
+        self.collector.start()
+        return self
+
+    def _start_worker(self, account_info):
+        jobs = self.context.Queue(self.queue_size)
+        process = self.context.Process(
+            target=_worker_main,
+            args=(account_info, self.backend_factory, jobs, self.results),
+            name=f"mt5-worker-{account_info['id']}",
+            daemon=True
+        )
+        process.start()
+        self.workers[account_info['id']] = (process, jobs)
+        logging.info(f"Started worker for account {account_info['account_name']} (PID: {process.pid})")
+
+    def _account(self, account_id):
+        return next((account for account in self.accounts if account['id'] == account_id), None)
+
+    def _failed_legs(self, account_id, tps, error):
+        account_info = self._account(account_id) or {'account_name': None, 'id': account_id}
+        return _leg_failures(account_info, tps, error)
+
+    def has_accounts(self, account_ids):
+        return all(account_id in self.workers for account_id in account_ids)
+
+    def submit(self, order_json, tps, account_ids=None, stop_on_failure=False):
+        """
+        Queue one job per account and return a Future resolving to the leg
+        results of every account, in the pool's account order. With
+        `stop_on_failure`, an account's remaining legs are skipped after one fails.
+        """
+        return self._submit(order_json, tps, account_ids, stop_on_failure)[1]
+
+    def _submit(self, order_json, tps, account_ids, stop_on_failure):
+        if account_ids is None:
+            account_ids = [account['id'] for account in self.accounts]
+
+        # Accounts without a worker fail at once, their orders never go through another terminal
+        missing = [account_id for account_id in account_ids if account_id not in self.workers]
+        queued = [account_id for account_id in account_ids if account_id in self.workers]
+        error = "No worker for this account, restart the listener to start one"
+        results = {account_id: self._failed_legs(account_id, tps, error) for account_id in missing}
+
+        # Jobs already given to a worker that died are failed before it is replaced
+        self._fail_dead_workers()
+
+        future = Future()
+        with self.lock:
+            # A dead worker fails its legs now rather than at the timeout, and is
+            # restarted for the next signal instead of sending this one late
+            for account_id in list(queued):
+                process = self.workers[account_id][0]
+                if process.is_alive():
+                    continue
+                logging.error(f"Worker for account {account_id} exited (code {process.exitcode}), restarting it")
+                queued.remove(account_id)
+                results[account_id] = self._failed_legs(account_id, tps, "Worker exited, it is being restarted")
+                self._start_worker(self._account(account_id))
+
+            if not queued:
+                future.set_result(results)
+                return None, future
+
+            self.next_job_id += 1
+            job_id = self.next_job_id
+            self.pending[job_id] = {
+                'future': future,
+                'waiting': set(queued),
+                'results': results,
+                'tps': list(tps)
+            }
+            targets = [self.workers[account_id][1] for account_id in queued]
+
+        # A ParsedOrder is immutable and goes as is, a plain dict is copied
+        if isinstance(order_json, dict):
+            order_json = dict(order_json)
+        job = (job_id, order_json, list(tps), stop_on_failure, time.time() + self.timeout)
+        for account_id, jobs in zip(queued, targets):
+            try:
+                jobs.put_nowait(job)
+            except queue.Full:
+                logging.error(f"Worker for account {account_id} has {self.queue_size} jobs waiting, failing this one")
+                self._expire(job_id, tps, "Worker is busy, too many orders waiting", {account_id})
+
+        return job_id, future
+
+    def send(self, order_json, tps, account_ids=None, stop_on_failure=False):
+        if account_ids is None:
+            account_ids = [account['id'] for account in self.accounts]
+
+        job_id, future = self._submit(order_json, tps, account_ids, stop_on_failure)
+        try:
+            account_results = future.result(timeout=self.timeout + self.grace)
+        except FutureTimeoutError:
+            # A leg may still be stuck at the broker, so it can't be called failed for sure
+            account_results = self._expire(job_id, tps, "Worker timed out, the order may still be filled")
+            if account_results is None:
+                # The last result came in just as the wait ran out
+                account_results = future.result()
+
+        # Flatten the per-account results in the order the accounts were given
+        results = []
+        for account_id in account_ids:
+            results.extend(account_results[account_id])
+        return results
+
+    def _expire(self, job_id, tps, error, account_ids=None):
+        """
+        Fail the legs of the accounts `job_id` still waits on, all of them or
+        only `account_ids`. Returns the job's results once it has none left to
+        wait for, None when it was already finished.
+        """
+        with self.lock:
+            job = self.pending.get(job_id)
+            if job is None:
+                return None
+            for account_id in list(job['waiting']):
+                if account_ids is None or account_id in account_ids:
+                    job['results'][account_id] = self._failed_legs(account_id, tps, error)
+                    job['waiting'].discard(account_id)
+            if job['waiting']:
+                return None
+            # Results arriving later for this job are dropped by the collector
+            del self.pending[job_id]
+
+        if not job['future'].done():
+            job['future'].set_result(job['results'])
+        return job['results']
+
+    def _fail_dead_workers(self):
+        with self.lock:
+            dead = {account_id for account_id, (process, jobs) in self.workers.items() if not process.is_alive()}
+            jobs = [(job_id, job['tps']) for job_id, job in self.pending.items() if job['waiting'] & dead]
+        for job_id, tps in jobs:
+            self._expire(job_id, tps, "Worker exited before sending the order", dead)
+
+    def _collect_results(self):
+        while self.running:
+            try:
+                job_id, account_id, leg_results = self.results.get(timeout=0.5)
+            except queue.Empty:
+                # Nothing will ever come from a worker that died
+                self._fail_dead_workers()
+                continue
+            except (EOFError, OSError):
+                break
+
+            with self.lock:
+                job = self.pending.get(job_id)
+                if job is None:
+                    sent = [leg for leg in leg_results if leg['response'].get('success')]
+                    if sent:
+                        logging.warning(f"Account {account_id} sent {len(sent)} leg(s) of job {job_id} "
+                                        f"after it was reported as timed out: {sent}")
+                    continue
+                job['results'][account_id] = leg_results
+                job['waiting'].discard(account_id)
+                if job['waiting']:
+                    continue
+                del self.pending[job_id]
+
+            job['future'].set_result(job['results'])
+
+    def close(self, timeout=5):
+        for process, jobs in self.workers.values():
+            try:
+                jobs.put(None, timeout=timeout)
+            except queue.Full:
+                # A worker whose queue is full is terminated below
+                pass
+        for process, jobs in self.workers.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self.running = False
+        if self.collector:
+            self.collector.join(timeout)
+        self.workers = {}
+
+
+def check_terminal_paths(accounts):
+    """
+    Why `accounts` can't each get a worker, as a list of messages. Every
+    worker logs into its own account, so two workers on one terminal would
+    keep switching it between accounts and an order could be filled on the
+    wrong one.
+    """
+    problems = []
+    terminals = {}
+    for account_info in accounts:
+        path = account_info.get('terminal_path')
+        if not path:
+            problems.append(f"Account {account_info['account_name']} has no terminal_path")
+            continue
+        terminal = os.path.normcase(os.path.abspath(path))
+        if terminal in terminals:
+            problems.append(f"Accounts {terminals[terminal]} and {account_info['account_name']} share the terminal {path}")
+        else:
+            terminals[terminal] = account_info['account_name']
+    return problems
+
+
+def load_accounts(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT id, account_name, server_name, login_id, password, terminal_path FROM mt_accounts')
+    except Exception:
+        # Older databases don't have a terminal_path column yet
+        cursor.execute('SELECT id, account_name, server_name, login_id, password, NULL FROM mt_accounts')
+
+    return [{
+        'id': row[0],
+        'account_name': row[1],
+        'server_name': row[2],
+        'login_id': row[3],
+        'password': row[4],
+        'terminal_path': row[5]
+    } for row in cursor.fetchall()]
+
+
+# The pool used by process_message when one has been started for this process
+worker_pool = None
+
+
+def get_worker_pool():
+    return worker_pool
+
+
+def start_worker_pool(conn, backend_factory=MT5Backend):
+    global worker_pool
+    accounts = load_accounts(conn)
+    if not accounts:
+        logging.warning("No MetaTrader accounts found, not starting account workers")
+        return None
+    if backend_factory is MT5Backend:
+        problems = check_terminal_paths(accounts)
+        if problems:
+            for problem in problems:
+                logging.error(problem)
+            logging.error("Not starting account workers, every account needs a terminal of its own")
+            return None
+    worker_pool = AccountWorkerPool(accounts, backend_factory=backend_factory).start()
+    return worker_pool
+
+
+def stop_worker_pool():
+    global worker_pool
+    if worker_pool is not None:
+        worker_pool.close()
+        worker_pool = None
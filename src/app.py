@@ -286,7 +286,8 @@ def get_accounts(db_connection=None):
             'server_name': row[2],
             'login_id': row[3],
             'password': row[4],
-            'created_at': row[5]
+            'created_at': row[5],
+            'terminal_path': row[6] if len(row) > 6 else None
         }
         for row in rows
     ]
@@ -307,8 +308,8 @@ def create_account(db_connection=None):
 
     cursor = conn.cursor()
     cursor.execute(
-        'INSERT INTO mt_accounts (account_name, server_name, login_id, password) VALUES (?, ?, ?, ?)',
-        (data['account_name'], data['server_name'], data['login_id'], data['password'])
+        'INSERT INTO mt_accounts (account_name, server_name, login_id, password, terminal_path) VALUES (?, ?, ?, ?, ?)',
+        (data['account_name'], data['server_name'], data['login_id'], data['password'], data.get('terminal_path'))
     )
     conn.commit()
 
@@ -336,8 +337,8 @@ def update_account(account_id, db_connection=None):
 
     cursor = conn.cursor()
     cursor.execute(
-        'UPDATE mt_accounts SET account_name = ?, server_name = ?, login_id = ?, password = ? WHERE id = ?',
-        (data['account_name'], data['server_name'], data['login_id'], data['password'], account_id)
+        'UPDATE mt_accounts SET account_name = ?, server_name = ?, login_id = ?, password = ?, terminal_path = COALESCE(?, terminal_path) WHERE id = ?',
+        (data['account_name'], data['server_name'], data['login_id'], data['password'], data.get('terminal_path'), account_id)
     )
     conn.commit()
 
@@ -473,6 +474,92 @@ def delete_channel_mapping(mapping_id, db_connection=None):
 
     return jsonify({'message': 'Channel mapping deleted successfully'})
 
+# Routes for symbol aliases, picked up by the listener without a restart
+@app.route('/symbol-aliases', methods=['GET'])
+def get_symbol_aliases(db_connection=None):
+    # If no connection is provided, create a new one
+    if db_connection is None:
+        conn = sqlite3.connect(DB_FILE)
+        should_close_conn = True
+    else:
+        # Use the provided connection
+        conn = db_connection
+        should_close_conn = False
+
+    cursor = conn.cursor()
+    cursor.execute('SELECT id, alias, symbol, created_at FROM symbol_aliases ORDER BY id')
+    rows = cursor.fetchall()
+
+    # Close the connection only if we created it
+    if should_close_conn:
+        conn.close()
+
+    # Convert rows to a list of dictionaries
+    aliases = [
+        {
+            'id': row[0],
+            'alias': row[1],
+            'symbol': row[2],
+            'created_at': row[3]
+        }
+        for row in rows
+    ]
+    return jsonify(aliases)
+
+@app.route('/symbol-aliases', methods=['POST'])
+def create_symbol_alias(db_connection=None):
+    data = request.json
+
+    # If no connection is provided, create a new one
+    if db_connection is None:
+        conn = sqlite3.connect(DB_FILE)
+        should_close_conn = True
+    else:
+        # Use the provided connection
+        conn = db_connection
+        should_close_conn = False
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            'INSERT INTO symbol_aliases (alias, symbol) VALUES (?, ?)',
+            (data['alias'].strip(), data['symbol'].strip())
+        )
+        conn.commit()
+        alias_id = cursor.lastrowid
+    except sqlite3.IntegrityError:
+        alias_id = None
+    finally:
+        # Close the connection only if we created it
+        if should_close_conn:
+            conn.close()
+
+    if alias_id is None:
+        return jsonify({'error': f"Alias {data['alias']} already exists"}), 409
+
+    return jsonify({'id': alias_id, 'message': 'Symbol alias created successfully'})
+
+@app.route('/symbol-aliases/<int:alias_id>', methods=['DELETE'])
+def delete_symbol_alias(alias_id, db_connection=None):
+    # If no connection is provided, create a new one
+    if db_connection is None:
+        conn = sqlite3.connect(DB_FILE)
+        should_close_conn = True
+    else:
+        # Use the provided connection
+        conn = db_connection
+        should_close_conn = False
+
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM symbol_aliases WHERE id = ?', (alias_id,))
+    conn.commit()
+
+    # Close the connection only if we created it
+    if should_close_conn:
+        conn.close()
+
+    return jsonify({'message': 'Symbol alias deleted successfully'})
+
 # Route to render HTML page
 @app.route('/')
 def index():
@@ -0,0 +1,185 @@
+import os
+import re
+import time
+import logging
+import threading
+import MetaTrader5 as mt5
+from dotenv import load_dotenv
+from symbolAliases import get_alias_index
+
+# Load environment variables
+load_dotenv()
+
+# How often, in seconds, an account's symbol list is fetched again from the broker
+REFRESH_INTERVAL = float(os.getenv('BROKER_SYMBOLS_REFRESH_SECONDS', '3600'))
+# After a failed fetch, the next attempt waits this long instead
+RETRY_INTERVAL = 60
+
+SEPARATOR_PATTERN = re.compile(r'[^0-9a-z]')
+
+
+def _compact(name):
+    # Lowercase and drop the separators brokers put around a symbol: "#XAUUSD.m" -> "xauusdm"
+    return SEPARATOR_PATTERN.sub('', name.lower())
+
+
+# Suffixes brokers add to a symbol, e.g. "m" in XAUUSDm or "pro" in XAUUSD.pro. Only these are
+# stripped: anything else may be another instrument, GOLDEUR is not XAUUSD and GBPUSDJPY not GBPUSD
+SUFFIXES = os.getenv('BROKER_SYMBOL_SUFFIXES', 'm,i,r,c,e,x,z,pro,raw,ecn,std,cash,mini,micro,plus')
+BROKER_SUFFIXES = sorted({_compact(suffix) for suffix in SUFFIXES.split(',')} - {''}, key=len)
+
+
+def base_symbol(name, index=None):
+    """
+    Canonical symbol a broker's symbol name stands for, or None.
+
+    Names are compared without case or separators, either as a known alias
+    ("GOLD") or as a known symbol followed by one of BROKER_SUFFIXES
+    ("XAUUSD.m", "XAUUSDm", "XAUUSD_pro").
+    """
+    if index is None:
+        index = get_alias_index()
+
+    compact = _compact(name)
+    if not compact:
+        return None
+
+    lookup = _compact_lookup(index)
+    symbol = lookup.get(compact)
+    if symbol is not None:
+        return symbol
+
+    # Longest known name the broker's name starts with, leaving only a broker suffix
+    for suffix in BROKER_SUFFIXES:
+        if len(suffix) < len(compact) and compact.endswith(suffix):
+            symbol = lookup.get(compact[:-len(suffix)])
+            if symbol is not None:
+                return symbol
+    return None
+
+
+# Compact spelling of every alias and symbol -> canonical symbol, rebuilt when the alias index changes
+lookup_index = None
+lookup_table = None
+
+
+def _compact_lookup(index):
+    global lookup_index, lookup_table
+    if index is not lookup_index:
+        table = {}
+        for symbol in index.symbols:
+            table.setdefault(_compact(symbol), symbol)
+        for alias, symbol in index.aliases.items():
+            table.setdefault(_compact(alias), symbol)
+        lookup_table = table
+        lookup_index = index
+    return lookup_table
+
+
+def _preference(name, symbol):
+    # The symbol itself wins, then the symbol with the shortest suffix, then an alias like GOLD
+    compact, canonical = _compact(name), _compact(symbol)
+    if compact == canonical:
+        rank = 0
+    elif compact.startswith(canonical):
+        rank = 1
+    else:
+        rank = 2
+    return (rank, len(name), name)
+
+
+def build_symbol_index(names, index=None):
+    # Canonical symbol -> the broker's name for it
+    if index is None:
+        index = get_alias_index()
+
+    symbols = {}
+    for name in names:
+        symbol = base_symbol(name, index)
+        if symbol is None:
+            continue
+        current = symbols.get(symbol)
+        if current is None or _preference(name, symbol) < _preference(current, symbol):
+            symbols[symbol] = name
+    return symbols
+
+
+class BrokerSymbolCache:
+    """
+    Per-account map from canonical symbols to the names the broker uses.
+
+    The broker's symbols_get() list is fetched for an account the first time
+    one of its orders is resolved, then again every REFRESH_INTERVAL seconds,
+    so resolving a symbol on the order path is a dict lookup. Must be called
+    while the session is logged into that account.
+    """
+
+    def __init__(self, refresh_interval=REFRESH_INTERVAL, retry_interval=RETRY_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.accounts = {}
+        self.lock = threading.Lock()
+        self.stats = {
+            'refreshes': 0,
+            'failed_refreshes': 0,
+            'resolved': 0,
+            'unresolved': 0
+        }
+
+    @staticmethod
+    def account_key(account_info):
+        return (str(account_info['login_id']), account_info['server_name'])
+
+    def _refresh(self, key, entry):
+        symbols = mt5.symbols_get()
+        if symbols is None:
+            logging.warning(f"Could not fetch the broker symbols for account {key[0]}: {mt5.last_error()}")
+            self.stats['failed_refreshes'] += 1
+            # Keep whatever was loaded before and try again soon
+            return (entry[0] if entry else {}), time.monotonic() + self.retry_interval
+
+        self.stats['refreshes'] += 1
+        index = build_symbol_index(symbol.name for symbol in symbols)
+        logging.info(f"Loaded {len(symbols)} broker symbols for account {key[0]}, {len(index)} known")
+        return index, time.monotonic() + self.refresh_interval
+
+    def resolve(self, account_info, symbol):
+        """
+        The broker's name for `symbol` on this account, or `symbol` itself
+        when the broker doesn't list it under another name.
+        """
+        if account_info is None:
+            return symbol
+
+        key = self.account_key(account_info)
+        with self.lock:
+            entry = self.accounts.get(key)
+            if entry is None or time.monotonic() >= entry[1]:
+                entry = self.accounts[key] = self._refresh(key, entry)
+
+            broker_symbol = entry[0].get(symbol)
+            if broker_symbol is None:
+                self.stats['unresolved'] += 1
+                return symbol
+            self.stats['resolved'] += 1
+            return broker_symbol
+
+    def invalidate(self, account_info=None):
+        # Fetch the list again on next use, for one account or all of them
+        with self.lock:
+            if account_info is None:
+                self.accounts.clear()
+            else:
+                self.accounts.pop(self.account_key(account_info), None)
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, accounts=len(self.accounts))
+
+
+# One cache per process, like the session it reads through
+broker_symbols = BrokerSymbolCache()
+
+
+def get_broker_symbols():
+    return broker_symbols
@@ -0,0 +1,160 @@
+import logging
+import sqlite3
+import threading
+from typing import NamedTuple, Optional, Tuple
+from dbConnection import get_connection
+
+# Telegram's "marked" channel ids are -100 followed by the channel id, e.g. -1001234567890
+MARKED_CHANNEL_OFFSET = 1000000000000
+
+
+def normalise_telegram_id(telegram_id):
+    """
+    The bare channel id of a Telegram chat id, however it was written:
+    -1001234567890, 1001234567890 and 1234567890 are all 1234567890.
+    """
+    if telegram_id is None:
+        return None
+    telegram_id = abs(int(telegram_id))
+    if telegram_id > MARKED_CHANNEL_OFFSET:
+        telegram_id -= MARKED_CHANNEL_OFFSET
+    return telegram_id
+
+
+class Route(NamedTuple):
+    """Where a channel's signals go: its mapped account, or every account when it has none."""
+    channel_id: Optional[int]
+    account: Optional[dict]
+    all_accounts: Tuple[dict, ...] = ()
+
+
+class RoutingTable:
+    """
+    In-memory snapshot of channels, accounts and channel_account_mappings.
+
+    Channels are resolved by their normalised Telegram chat id, falling back
+    to their title only when the chat id is unknown. Either way it is a dict
+    lookup instead of a name query, a LIKE scan and a join per message.
+    A new table is built when the routing_version counter changes, which
+    triggers bump on every write to the three tables, including those made
+    through the web interface. An existing table is never modified, so the
+    account dicts it hands out must not be changed.
+    """
+
+    def __init__(self, channels, accounts, mappings, version=None):
+        self.version = version
+        self.accounts = tuple({
+            'id': row[0],
+            'account_name': row[1],
+            'server_name': row[2],
+            'login_id': row[3],
+            'password': row[4]
+        } for row in accounts)
+        accounts_by_id = {account['id']: account for account in self.accounts}
+
+        # The first channel with a name wins, like the query it replaces
+        self.channels_by_name = {}
+        self.channels_by_telegram_id = {}
+        for channel_id, name, telegram_id in channels:
+            if name is not None:
+                self.channels_by_name.setdefault(name.lower(), channel_id)
+            if telegram_id is not None:
+                self.channels_by_telegram_id.setdefault(normalise_telegram_id(telegram_id), channel_id)
+        self.channel_names = tuple(self.channels_by_name.items())
+
+        self.mapped_channels = set()
+        self.channel_accounts = {}
+        for channel_id, account_id in mappings:
+            self.mapped_channels.add(channel_id)
+            account = accounts_by_id.get(account_id)
+            if account is not None:
+                self.channel_accounts.setdefault(channel_id, account)
+
+        # Names only found through the substring fallback, remembered for the next message
+        self.fuzzy_matches = {}
+
+    def find_channel(self, name):
+        # Case-insensitive exact name first, then any channel whose name contains it
+        if name is None:
+            return None
+        lowered = name.lower()
+        channel_id = self.channels_by_name.get(lowered)
+        if channel_id is not None:
+            return channel_id
+
+        if lowered not in self.fuzzy_matches:
+            logging.info(f"Exact match not found, trying flexible match for: {name}")
+            self.fuzzy_matches[lowered] = next(
+                (channel_id for channel_name, channel_id in self.channel_names if lowered in channel_name), None)
+        return self.fuzzy_matches[lowered]
+
+    def resolve(self, channel, chat_id=None):
+        channel_id = None
+        if chat_id is not None:
+            channel_id = self.channels_by_telegram_id.get(normalise_telegram_id(chat_id))
+            if channel_id is None:
+                logging.warning(f"No channel with chat id {chat_id}, matching {channel} by title")
+        if channel_id is None:
+            channel_id = self.find_channel(channel)
+        if channel_id is None:
+            logging.warning(f"Channel {channel} not found in database")
+            return Route(None, None, self.accounts)
+
+        account = self.channel_accounts.get(channel_id)
+        if account is not None:
+            logging.info(f"Using account {account['account_name']} (ID: {account['id']}) for channel {channel}")
+            return Route(channel_id, account)
+
+        if channel_id in self.mapped_channels:
+            logging.warning(f"Found mapping for channel {channel} (ID: {channel_id}) but couldn't retrieve account info")
+        else:
+            logging.warning(f"No account mapped for channel {channel} (ID: {channel_id})")
+        return Route(channel_id, None, self.accounts)
+
+
+def routing_version(conn):
+    # (token, version) of the routing tables, or None for a database without the counter
+    try:
+        row = conn.execute('SELECT token, version FROM routing_version WHERE id = 1').fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return tuple(row) if row else None
+
+
+def load_routing_table(conn, version=None):
+    cursor = conn.cursor()
+    cursor.execute('SELECT id, name, telegram_id FROM channels ORDER BY id')
+    channels = cursor.fetchall()
+    cursor.execute('SELECT id, account_name, server_name, login_id, password FROM mt_accounts ORDER BY id')
+    accounts = cursor.fetchall()
+    cursor.execute('SELECT channel_id, account_id FROM channel_account_mappings ORDER BY id')
+    mappings = cursor.fetchall()
+    return RoutingTable(channels, accounts, mappings, version)
+
+
+# The table shared by every message, built on first use
+routing_table = None
+lock = threading.Lock()
+
+
+def get_routing_table(db_connection=None):
+    """
+    The routing table for the database, rebuilt only when its routing_version
+    changed. Checking costs one primary key lookup per call. A database without
+    the counter gets a fresh, uncached table every time.
+    """
+    global routing_table
+
+    # If no connection is provided, use this thread's long-lived one
+    conn = db_connection if db_connection is not None else get_connection()
+
+    version = routing_version(conn)
+    if version is None:
+        return load_routing_table(conn)
+
+    with lock:
+        if routing_table is None or routing_table.version != version:
+            routing_table = load_routing_table(conn, version)
+            logging.info(f"Loaded routing for {len(routing_table.channels_by_name)} channels and "
+                         f"{len(routing_table.accounts)} accounts (version {version[1]})")
+        return routing_table
@@ -1,70 +1,138 @@
 import json
 import sys
 import re
-from currencies import currencies
+from symbolAliases import get_alias_index
+
+# Emoticons commonly used in WhatsApp/Telegram
+EMOTICON_PATTERN = re.compile(r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F700-\U0001F77F\U0001F780-\U0001F7FF\U0001F800-\U0001F8FF\U0001F900-\U0001F9FF\U0001FA00-\U0001FA6F\U0001FA70-\U0001FAFF\U00002700-\U000027BF\U000024C2-\U0001F251]')
+# The same code points as ranges, for the translate table
+EMOTICON_RANGES = ((0x24C2, 0x1F251), (0x1F300, 0x1F64F), (0x1F680, 0x1FAFF))
+# Non-breaking hyphens and dashes
+DASH_RANGE = (0x2012, 0x2015)
+
+
+class CharacterTable(dict):
+    """
+    str.translate table removing dashes and emoticons and turning @ into a space.
+
+    Code points are classified the first time they are seen and remembered,
+    so the table only ever holds the characters that actually show up.
+    """
+
+    def __missing__(self, code):
+        if DASH_RANGE[0] <= code <= DASH_RANGE[1]:
+            value = None
+        elif code == ord('@'):
+            value = ' '
+        elif any(low <= code <= high for low, high in EMOTICON_RANGES):
+            value = None
+        else:
+            value = code
+        self[code] = value
+        return value
+
+
+CHARACTER_TABLE = CharacterTable()
+
+# "now" words and new lines, in one pass: a run of them becomes a space when it holds a new line.
+# The lookahead lets the regex engine skip every other character quickly.
+NOW_NEWLINE_PATTERN = re.compile(r'(?=[\nn])(?:\n|\bnow\b)+')
+
+# Stop loss / take profit rewrites and space runs, in one pass. Each alternative also
+# covers what the next rewrite did to its output, e.g. "stop loss :" -> "sl :" -> "sl ",
+# and a run of colons goes at once, so cleaning a cleaned message changes nothing.
+KEYWORD_PATTERN = re.compile(r'''
+    (?=[st\ ])
+    (?:
+        \b(?:
+              (?P<stop_loss>stop\s*loss\b(?P<stop_loss_colon>\s*(?::\s*)+)?)
+            | (?P<sl_colon>sl\s*(?::\s*)+)
+            | (?P<take_profit>take\s*profit\b(?:(?P<take_profit_colon>\s*(?::\s*)+)|\.\s*(?P<take_profit_dot>\d+))?)
+            | (?P<tp_colon>tp\s*(?::\s*)+)
+            | (?P<tp_dot>tp\.\s*(?P<tp_dot_value>\d+))
+            | (?P<tp_indexed>tp\d+\s+(?=\d))
+        )
+        | (?P<spaces>\ {2,})
+    )
+''', re.VERBOSE)
+
+# "tp 1 :" and "tp 1. :" labels (and "tp 1 ::"), the second also when the first one's removal forms it
+TP_LABEL_PATTERN = re.compile(r'tp\s?\d+\s?:(?P<more>(?:\s?:)*)(?: \d+\. :(?P<more_dot>(?: ?:)*))?|tp \d+\. :(?P<more_label>(?: ?:)*)')
+
+
+def _rewrite_now_newline(match):
+    return ' ' if '\n' in match.group() else ''
+
+
+def _rewrite_tp_label(match):
+    # Further colons are a "tp :" of their own, rewritten to "tp " as KEYWORD_PATTERN does
+    return 'tp ' if match.group('more') or match.group('more_dot') or match.group('more_label') else 'tp'
+
+
+def _rewrite_keyword(match):
+    kind = match.lastgroup
+    if kind == 'stop_loss':
+        return 'sl ' if match.group('stop_loss_colon') is not None else 'sl'
+    if kind == 'take_profit':
+        if match.group('take_profit_colon') is not None:
+            return 'tp '
+        if match.group('take_profit_dot') is not None:
+            return 'tp ' + match.group('take_profit_dot')
+        return 'tp'
+    if kind == 'tp_dot':
+        return 'tp ' + match.group('tp_dot_value')
+    if kind == 'spaces':
+        return ' '
+    # sl_colon, tp_colon and tp_indexed
+    return kind[:2] + ' '
+
 
 def removeEmoticons(input_string):
     # Regex pattern to match emoticons commonly used in WhatsApp/Telegram
-    emoticon_pattern = r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F700-\U0001F77F\U0001F780-\U0001F7FF\U0001F800-\U0001F8FF\U0001F900-\U0001F9FF\U0001FA00-\U0001FA6F\U0001FA70-\U0001FAFF\U00002700-\U000027BF\U000024C2-\U0001F251]'
-    return re.sub(emoticon_pattern, '', input_string)
+    return EMOTICON_PATTERN.sub('', input_string)
 
 def cleanMessage(input_string):
-    # Remove non-breaking hyphens and dashes from the input string
-    cleaned_string = re.sub(r"[\u2012-\u2015]+", "", input_string)
-
-    # Remove @ signs and replace with a single space
-    cleaned_string = re.sub(r'@', ' ', cleaned_string)
-
-    # Remove emoticons from the input string
-    cleaned_string = removeEmoticons(cleaned_string)
+    # Remove dashes and emoticons, and replace @ signs with a single space
+    cleaned_string = input_string.translate(CHARACTER_TABLE)
 
     # Convert all characters to lowercase
     cleaned_string = cleaned_string.lower()
 
-    # Remove the word 'now' accounting for spaces
-    cleaned_string = re.sub(r'\bnow\b', '', cleaned_string)
-
-    # Remove new lines and replace with a space
-    cleaned_string = re.sub(r'\n+', ' ', cleaned_string)
+    # Remove the word 'now' accounting for spaces, and replace new lines with a space
+    if '\n' in cleaned_string or 'now' in cleaned_string:
+        cleaned_string = NOW_NEWLINE_PATTERN.sub(_rewrite_now_newline, cleaned_string)
 
     # Strip leading and trailing spaces
     cleaned_string = cleaned_string.strip()
 
     # Replace all instances of "point :" with blank space
-    cleaned_string = re.sub(r'point :', '', cleaned_string)
+    if 'point :' in cleaned_string:
+        cleaned_string = cleaned_string.replace('point :', '')
+        # The removal can leave a "now" standing on its own ("nowpoint : 2677")
+        if 'now' in cleaned_string:
+            cleaned_string = NOW_NEWLINE_PATTERN.sub(_rewrite_now_newline, cleaned_string)
 
     # Replace common currency symbols with standard symbols
-    for key, value in currencies().items():
-        cleaned_string = cleaned_string.replace(key.lower(), value)
-
-    # Replace stoploss or stop loss with sl
-    cleaned_string = re.sub(r'\bstop\s*loss\b', 'sl', cleaned_string)
-
-    # Normalize "sl :" or "sl:" to "sl"
-    cleaned_string = re.sub(r'\bsl\s*:\s*', 'sl ', cleaned_string)
-
-    # Replace instances of take profit or takeprofit with tp
-    cleaned_string = re.sub(r'\btake\s*profit\b', 'tp', cleaned_string)
-
-    # Normalize "tp :" or "tp:" to "tp"
-    cleaned_string = re.sub(r'\btp\s*:\s*', 'tp ', cleaned_string)
-
-    # Normalize sequences like "tp.575" or "tp.580"
-    cleaned_string = re.sub(r'\btp\.\s*(\d+)', r'tp \1', cleaned_string)
-
-    # Normalize patterns like "tp1 3128" to "tp 3128"
-    cleaned_string = re.sub(r'\btp(\d+)\s+(?=\d)', 'tp ', cleaned_string)
-
-    # Replace multiple spaces with a single space
-    cleaned_string = re.sub(r' {2,}', ' ', cleaned_string)
-
-    # Replace instances where "tp \d :"" as tp
-    cleaned_string = re.sub(r'tp\s?(\d+)\s?:', r'tp', cleaned_string)
-
-    # Replace instances where "tp \d\. :" with tp
-    cleaned_string = re.sub(r'tp (\d+)\. :', r'tp', cleaned_string)
-
-    return cleaned_string
+    cleaned_string = get_alias_index().matcher.replace(cleaned_string)
+
+    # Replace stop loss / take profit with sl / tp, normalize "sl :", "tp :", "tp.575" and "tp1 3128",
+    # and replace multiple spaces with a single space
+    cleaned_string = KEYWORD_PATTERN.sub(_rewrite_keyword, cleaned_string)
+
+    # Replace instances where "tp \d :" or "tp \d. :" as tp
+    if 'tp' in cleaned_string:
+        cleaned_string, labels = TP_LABEL_PATTERN.subn(_rewrite_tp_label, cleaned_string)
+        # What is left of a label can form a new one ("tp1: :2575"), settle it here so that
+        # cleaning a cleaned message changes nothing. Each label found shortens the string.
+        while labels:
+            settled = KEYWORD_PATTERN.sub(_rewrite_keyword, cleaned_string)
+            settled, labels = TP_LABEL_PATTERN.subn(_rewrite_tp_label, settled)
+            if settled == cleaned_string:
+                break
+            cleaned_string = settled
+
+    # The rewrites can leave a space at either end
+    return cleaned_string.strip()
 
 
 def main():
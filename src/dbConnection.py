@@ -0,0 +1,56 @@
+import os
+import logging
+import threading
+import init_db
+
+# This thread's connection, and every connection opened so far so they can be closed on shutdown
+local = threading.local()
+connections = set()
+lock = threading.Lock()
+
+
+def get_connection():
+    """
+    The calling thread's long-lived connection to the application database.
+
+    Opened on first use with the tuned pragmas of init_db.connect and kept
+    for the life of the thread, so each message reuses its compiled
+    statements and page cache instead of opening a new connection. A sqlite3
+    connection must not be used by two threads at once, hence one per thread
+    (the listener's pipeline stages each get their own). Callers commit but
+    never close it.
+    """
+    db_file = os.path.abspath(init_db.DB_FILE)
+    current = getattr(local, 'connection', None)
+    if current is not None:
+        with lock:
+            is_open = current[1] in connections
+        if is_open and current[0] == db_file:
+            return current[1]
+        if is_open:
+            # The database file changed, e.g. between tests
+            _close(current[1])
+
+    # Closed from the shutdown thread, never used by two threads
+    conn = init_db.connect(db_file, check_same_thread=False)
+    local.connection = (db_file, conn)
+    with lock:
+        connections.add(conn)
+    return conn
+
+
+def _close(conn):
+    with lock:
+        connections.discard(conn)
+    try:
+        conn.close()
+    except Exception as e:
+        logging.error(f"Error closing database connection: {e}")
+
+
+def close_connections():
+    # Call once the threads using them are done, e.g. after the pipeline stopped
+    with lock:
+        opened = list(connections)
+    for conn in opened:
+        _close(conn)
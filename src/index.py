@@ -12,6 +12,16 @@ from cleanMessage import cleanMessage
 from validateOrder import validateOrder
 from sendOrder import sendOrder
 from processMessage import process_message
+from accountWorkers import start_worker_pool, stop_worker_pool
+from signalFilter import get_rejected_log
+from parserStats import get_parser_stats
+from tickPoller import start_tick_poller, stop_tick_poller
+from warmup import WARMUP_ENABLED, warm_up
+from messageExecutor import get_loop_lag
+from pipeline import get_pipeline, start_pipeline, stop_pipeline
+from logWriter import start_log_writer, stop_log_writer
+from dbConnection import close_connections
+from init_db import initialize_database
 
 # Load environment variables
 load_dotenv()
@@ -80,14 +90,40 @@ async def start_telegram_client():
 
         # Only process messages if there's a valid message text
         if message:
-            process_message(message, chat_title)
+            # Processing blocks on SQLite and MT5, so it runs in the pipeline and the loop only enqueues
+            pipeline = get_pipeline()
+            if pipeline is not None:
+                pipeline.submit(message, chat_title, chat_id=chat_id)
+            else:
+                await asyncio.to_thread(process_message, message, chat_title, chat_id=chat_id)
         else:
             logging.info('No message found.')
 
     await client.run_until_disconnected()
 
+# Start one worker process per MetaTrader account when enabled
+def start_account_workers():
+    if os.getenv('MT5_ACCOUNT_WORKERS', 'false').lower() != 'true':
+        return None
+    conn = sqlite3.connect('telegram_mt5_logs.db')
+    try:
+        return start_worker_pool(conn)
+    finally:
+        conn.close()
+
 # Main async function that combines client startup and message listening
 async def main():
+    # Bring the tables up to date first, the log inserts expect the current schema
+    initialize_database()
+    # With account workers, every order goes through the worker of its account, which warms and
+    # polls its own terminal. Without them, the listener sends every order from its own session
+    if start_account_workers() is None:
+        if WARMUP_ENABLED:
+            warm_up()
+        start_tick_poller()
+    start_log_writer()
+    start_pipeline()
+    lag_monitor = asyncio.create_task(get_loop_lag().run())
     await initialize_telegram_client()
     try:
         await start_telegram_client()
@@ -96,6 +132,18 @@ async def main():
     finally:
         if client and client.is_connected():
             await client.disconnect()
+        lag_monitor.cancel()
+        logging.info(f"Event loop lag: {get_loop_lag().get_stats()}")
+        # Finish the messages already received before the workers go away
+        stop_pipeline()
+        # The pipeline's last rows are queued by now; write them before exiting
+        stop_log_writer()
+        stop_worker_pool()
+        stop_tick_poller()
+        # Write the chatter still waiting in the rejected message buffer
+        get_rejected_log().flush()
+        get_parser_stats().log_summary()
+        close_connections()
 
 # Main function
 if __name__ == "__main__":
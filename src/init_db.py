@@ -1,9 +1,96 @@
+import os
 import sqlite3
+import logging
+from dotenv import load_dotenv
+from currencies import currencies
+
+# Load environment variables
+load_dotenv()
 
 DB_FILE = 'telegram_mt5_logs.db'
 
+# Bytes of the database file read through memory mapped I/O, 0 turns it off
+MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+# Page cache per connection: pages when positive, KiB when negative (SQLite's cache_size convention)
+CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', '-16000'))
+# Compiled statements each connection keeps for reuse
+STATEMENT_CACHE_SIZE = 256
+
+
+def configure_connection(conn):
+    """
+    Apply the per-connection pragmas. In WAL mode a commit with
+    synchronous=NORMAL skips the fsync, which only happens at checkpoints,
+    and a crash can lose the last commits but never corrupts the database.
+    """
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+    conn.execute(f'PRAGMA cache_size={CACHE_SIZE}')
+    return conn
+
+
+def connect(db_file=None, **kwargs):
+    # A connection to the application database with the tuned pragmas
+    conn = sqlite3.connect(db_file or DB_FILE, cached_statements=STATEMENT_CACHE_SIZE, **kwargs)
+    return configure_connection(conn)
+
+
+def add_parser_version_column(cursor):
+    # Rows stored before parser versions existed count as version 0
+    cursor.execute('PRAGMA table_info(logs)')
+    log_columns = [column[1] for column in cursor.fetchall()]
+    if 'parser_version' not in log_columns:
+        cursor.execute('ALTER TABLE logs ADD COLUMN parser_version INTEGER NOT NULL DEFAULT 0')
+
+    # Lets parse_database find the rows parsed by an older version without a full scan
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_logs_parser_version ON logs (parser_version)')
+
+
+ROUTING_TABLES = ('channels', 'mt_accounts', 'channel_account_mappings')
+
+
+def add_routing_version(cursor):
+    # Bumped by triggers on every change to the routing tables, so the listener
+    # knows when to rebuild its in-memory routing table. The token tells one
+    # database from another when both are at the same version.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS routing_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0,
+            token TEXT NOT NULL
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO routing_version (id, version, token) VALUES (1, 0, lower(hex(randomblob(8))))")
+
+    for table in ROUTING_TABLES:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_routing_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE routing_version SET version = version + 1 WHERE id = 1;
+                END
+            ''')
+
+
+# channels.telegram_id without the sign or the -100 prefix of channel ids, see channelRouting
+NORMALISED_TELEGRAM_ID = '''
+    CASE WHEN abs(telegram_id) > 1000000000000 THEN abs(telegram_id) - 1000000000000 ELSE abs(telegram_id) END
+'''
+
+
+def add_telegram_id_index(cursor):
+    # One channel per Telegram chat, however its id was written
+    try:
+        cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS idx_channels_telegram_id ON channels ({NORMALISED_TELEGRAM_ID})')
+    except sqlite3.IntegrityError:
+        logging.warning("Several channels share a Telegram chat id; messages from it go to the first one until the duplicates are removed")
+
+
 def initialize_database():
-    conn = sqlite3.connect(DB_FILE)
+    conn = connect()
+    # Stored in the database file: readers such as the web interface no longer block the listener's writes
+    conn.execute('PRAGMA journal_mode=WAL')
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -54,5 +141,52 @@ def initialize_database():
         )
     ''')
 
+    add_parser_version_column(cursor)
+
+    # Each account can point at its own terminal installation
+    cursor.execute('PRAGMA table_info(mt_accounts)')
+    account_columns = [column[1] for column in cursor.fetchall()]
+    if 'terminal_path' not in account_columns:
+        cursor.execute('ALTER TABLE mt_accounts ADD COLUMN terminal_path TEXT')
+
+    add_routing_version(cursor)
+    add_telegram_id_index(cursor)
+
+    # Symbol aliases, e.g. "gold" -> XAUUSD, editable without restarting the listener
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS symbol_aliases (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            alias TEXT NOT NULL UNIQUE COLLATE NOCASE,
+            symbol TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Bumped by the triggers below on every change, so readers know when to reload
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS symbol_aliases_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO symbol_aliases_version (id, version) VALUES (1, 0)')
+
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS symbol_aliases_{event.lower()}
+            AFTER {event} ON symbol_aliases
+            BEGIN
+                UPDATE symbol_aliases_version SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+
+    # Seed the aliases from the built-in table the first time
+    cursor.execute('SELECT COUNT(*) FROM symbol_aliases')
+    if cursor.fetchone()[0] == 0:
+        cursor.executemany(
+            'INSERT OR IGNORE INTO symbol_aliases (alias, symbol) VALUES (?, ?)',
+            currencies().items()
+        )
+
     conn.commit()
     conn.close()
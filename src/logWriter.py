@@ -0,0 +1,148 @@
+import os
+import time
+import queue
+import logging
+import threading
+from dotenv import load_dotenv
+from init_db import DB_FILE, connect
+from validateOrder import PARSER_VERSION
+
+# Load environment variables
+load_dotenv()
+
+# Log rows are committed together once this many are waiting, or once the first has waited this long
+BATCH_ROWS = int(os.getenv('LOG_WRITER_BATCH_ROWS', '100'))
+FLUSH_MS = float(os.getenv('LOG_WRITER_FLUSH_MS', '200'))
+
+INSERT_LOG = '''
+    INSERT INTO logs (channel, message, parameters, trade_response, exception, is_valid_trade, processed_at, failed_at, created_at, parser_version)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def log_records(channel, message, rows, created_at):
+    # INSERT_LOG parameters of each log row of one message
+    return [(channel, message) + tuple(row) + (created_at, PARSER_VERSION) for row in rows]
+
+
+class LogWriter:
+    """
+    Background thread writing log rows to the logs table.
+
+    Callers only queue their rows, so sending the next order never waits for
+    an INSERT and its commit. The thread groups rows into one transaction per
+    `batch_rows` rows or `flush_ms` milliseconds, whichever comes first, and
+    writes whatever is still queued when it is stopped.
+    """
+
+    def __init__(self, db_file=DB_FILE, batch_rows=BATCH_ROWS, flush_ms=FLUSH_MS):
+        self.db_file = db_file
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_ms / 1000
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.stats = {
+            'rows': 0,
+            'batches': 0,
+            'errors': 0,
+            'max_batch': 0
+        }
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+        logging.info(f"Started log writer, committing every {self.batch_rows} rows or {self.flush_seconds}s")
+        return self
+
+    def add(self, channel, message, rows, created_at):
+        # Never blocks; the rows are committed by the writer thread
+        for record in log_records(channel, message, rows, created_at):
+            self.queue.put(record)
+
+    def _next_batch(self):
+        # Waits for a first record, then collects more until the batch is full or due
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.flush_seconds
+        while batch[-1] is not None and len(batch) < self.batch_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = connect(self.db_file)
+        try:
+            while True:
+                batch = self._next_batch()
+                stopping = batch[-1] is None
+                records = batch[:-1] if stopping else batch
+                try:
+                    if records:
+                        self._write(conn, records)
+                finally:
+                    for _ in batch:
+                        self.queue.task_done()
+                if stopping:
+                    break
+        finally:
+            conn.close()
+
+    def _write(self, conn, records):
+        try:
+            conn.executemany(INSERT_LOG, records)
+            conn.commit()
+            logging.debug(f"Logged {len(records)} rows")
+        except Exception as e:
+            logging.error(f"Error inserting logs into database: {e}")
+            conn.rollback()
+            with self.lock:
+                self.stats['errors'] += 1
+            return
+
+        with self.lock:
+            self.stats['rows'] += len(records)
+            self.stats['batches'] += 1
+            self.stats['max_batch'] = max(self.stats['max_batch'], len(records))
+
+    def flush(self):
+        # Wait until every row queued so far has been written
+        self.queue.join()
+
+    def stop(self, timeout=30):
+        # Rows already queued are written before the thread exits
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout)
+            self.thread = None
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, queued=self.queue.qsize())
+
+
+# The log writer of the listener process
+log_writer = None
+
+
+def get_log_writer():
+    return log_writer
+
+
+def start_log_writer():
+    global log_writer
+    if log_writer is None:
+        log_writer = LogWriter().start()
+    return log_writer
+
+
+def stop_log_writer():
+    global log_writer
+    if log_writer is not None:
+        log_writer.stop()
+        logging.info(f"Log writer: {log_writer.get_stats()}")
+        log_writer = None
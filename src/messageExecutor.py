@@ -0,0 +1,208 @@
+import os
+import time
+import queue
+import asyncio
+import logging
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Messages waiting for a worker thread; once full, new messages are dropped and logged
+QUEUE_SIZE = int(os.getenv('MESSAGE_QUEUE_SIZE', '1000'))
+# Threads processing messages. One keeps signals in the order they arrived
+WORKERS = int(os.getenv('MESSAGE_WORKERS', '1'))
+# How often the event loop lag is sampled, and the lag worth a warning, in seconds
+LOOP_LAG_INTERVAL = float(os.getenv('LOOP_LAG_INTERVAL_SECONDS', '1'))
+LOOP_LAG_WARNING = float(os.getenv('LOOP_LAG_WARNING_SECONDS', '0.1'))
+
+# Upper bounds, in seconds, of the time-in-stage histogram buckets
+HISTOGRAM_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+
+class StageHistogram:
+    """Counts of durations per bucket, plus their count, sum and maximum."""
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        position = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        self.counts[position] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction, counts=None):
+        # Upper bound of the bucket reaching `fraction` of the durations, the maximum past the last bucket
+        counts = self.counts if counts is None else counts
+        total = sum(counts)
+        seen = 0
+        for bound, count in zip(self.buckets, counts):
+            seen += count
+            if total and seen >= fraction * total:
+                return bound
+        return self.max if total else 0.0
+
+    def get_stats(self):
+        labels = [f"<={bound * 1000:g}ms" for bound in self.buckets] + [f">{self.buckets[-1] * 1000:g}ms"]
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+            'p99': self.percentile(0.99),
+            'buckets': dict(zip(labels, self.counts))
+        }
+
+
+class MessageExecutor:
+    """
+    Runs message processing on worker threads behind a bounded queue.
+
+    The Telegram handler only enqueues, so SQLite queries and blocking MT5
+    calls never hold up the event loop and messages from other channels are
+    received while an order is being sent. Each executor also serves as one
+    stage of the message pipeline, with a queue depth gauge and a histogram
+    of the time jobs spend in it, waiting and running.
+    """
+
+    def __init__(self, queue_size=QUEUE_SIZE, workers=WORKERS, name='message'):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.workers = workers
+        self.name = name
+        self.threads = []
+        self.lock = threading.Lock()
+        self.histogram = StageHistogram()
+        self.stats = {
+            'submitted': 0,
+            'processed': 0,
+            'dropped': 0,
+            'errors': 0,
+            'max_wait': 0.0,
+            'max_depth': 0
+        }
+
+    def start(self):
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-worker-{number}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def _submitted(self):
+        with self.lock:
+            self.stats['submitted'] += 1
+            self.stats['max_depth'] = max(self.stats['max_depth'], self.queue.qsize())
+
+    def submit(self, func, *args, **kwargs):
+        # Never blocks; returns False when the queue is full and the message was dropped
+        try:
+            self.queue.put_nowait((func, args, kwargs, time.monotonic()))
+        except queue.Full:
+            with self.lock:
+                self.stats['dropped'] += 1
+            logging.error(f"{self.name.capitalize()} queue is full ({self.queue.maxsize}), dropping message")
+            return False
+
+        self._submitted()
+        return True
+
+    def put(self, func, *args, **kwargs):
+        # Waits for room in the queue, so a slow stage holds back the one feeding it
+        self.queue.put((func, args, kwargs, time.monotonic()))
+        self._submitted()
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    break
+
+                func, args, kwargs, queued_at = job
+                wait = time.monotonic() - queued_at
+                try:
+                    func(*args, **kwargs)
+                except Exception as e:
+                    logging.error(f"Error processing message: {e}")
+                    with self.lock:
+                        self.stats['errors'] += 1
+
+                with self.lock:
+                    self.stats['processed'] += 1
+                    self.stats['max_wait'] = max(self.stats['max_wait'], wait)
+                    self.histogram.record(time.monotonic() - queued_at)
+            finally:
+                self.queue.task_done()
+
+    def join(self):
+        # Wait until every message queued so far has been processed
+        self.queue.join()
+
+    def stop(self, timeout=30):
+        # Messages already queued are processed before the workers exit
+        for _ in self.threads:
+            self.queue.put(None, timeout=timeout)
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, queued=self.queue.qsize(), time_in_stage=self.histogram.get_stats())
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up from a sleep of `interval`
+    seconds. Anything beyond a few milliseconds means something is blocking
+    the loop, and with it the reception of Telegram messages.
+    """
+
+    def __init__(self, interval=LOOP_LAG_INTERVAL, warning=LOOP_LAG_WARNING):
+        self.interval = interval
+        self.warning = warning
+        self.lock = threading.Lock()
+        self.samples = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.record(loop.time() - started - self.interval)
+
+    def record(self, lag):
+        lag = max(lag, 0.0)
+        with self.lock:
+            self.samples += 1
+            self.total += lag
+            self.last = lag
+            self.max = max(self.max, lag)
+        if lag >= self.warning:
+            logging.warning(f"Event loop lagged by {lag * 1000:.1f}ms")
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'samples': self.samples,
+                'last': self.last,
+                'max': self.max,
+                'mean': self.total / self.samples if self.samples else 0.0
+            }
+
+
+# The event loop lag monitor of the listener process
+loop_lag = LoopLagMonitor()
+
+
+def get_loop_lag():
+    return loop_lag
@@ -0,0 +1,266 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+import MetaTrader5 as mt5
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# A selected symbol and its contract details are reused for this many seconds
+SYMBOL_INFO_TTL = float(os.getenv('SYMBOL_INFO_TTL_SECONDS', '300'))
+# A tick is fetched again once it is older than this many seconds
+TICK_MAX_AGE = float(os.getenv('TICK_MAX_AGE_SECONDS', '0.25'))
+# The tick poller keeps the ticks of this many recently traded symbols fresh
+TICK_POLL_SYMBOLS = int(os.getenv('TICK_POLL_SYMBOLS', '8'))
+
+
+def get_mt5_path():
+    # Default path for MetaTrader 5 on Windows
+    mt5_path = os.getenv('MT5_PATH', 'C:/Program Files/MetaTrader 5/terminal64.exe')
+
+    # Convert backslashes to forward slashes if needed
+    return mt5_path.replace('\\', '/')
+
+
+class SymbolDetails(NamedTuple):
+    """Contract details of a selected symbol, None where the terminal didn't report them."""
+    name: str
+    digits: Optional[int] = None
+    point: Optional[float] = None
+    stops_level: Optional[int] = None
+    filling_mode: Optional[int] = None
+    volume_min: Optional[float] = None
+    volume_step: Optional[float] = None
+
+    @classmethod
+    def from_info(cls, name, info):
+        if info is None:
+            return cls(name)
+        return cls(name, info.digits, info.point, info.trade_stops_level, info.filling_mode,
+                   info.volume_min, info.volume_step)
+
+
+class MT5Session:
+    """
+    Long-lived MetaTrader 5 session for the current process.
+
+    The terminal is initialized once and kept alive between orders. A login
+    only happens when the requested account differs from the one currently
+    logged in, or when the terminal connection has dropped.
+
+    Selected symbols and their details are cached for SYMBOL_INFO_TTL seconds
+    and ticks for TICK_MAX_AGE seconds, so the TP legs of one signal share a
+    single symbol_select. Both are dropped whenever the account changes, as
+    are the last `poll_symbols` symbols orders were sent for, which the tick
+    poller refreshes.
+    """
+
+    def __init__(self, path=None, symbol_ttl=SYMBOL_INFO_TTL, tick_max_age=TICK_MAX_AGE,
+                 poll_symbols=TICK_POLL_SYMBOLS):
+        self.path = path
+        self.symbol_ttl = symbol_ttl
+        self.tick_max_age = tick_max_age
+        self.poll_symbols = poll_symbols
+        self.initialized = False
+        self.login_id = None
+        self.server_name = None
+        # symbol -> (SymbolDetails, expires at) and symbol -> (tick, fetched at)
+        self.symbols = {}
+        self.ticks = {}
+        # Recently traded symbols, the most recent last, and the orders being sent right now
+        self.traded = OrderedDict()
+        self.sending = 0
+        self.lock = threading.RLock()
+        self.stats = {
+            'initializations': 0,
+            'logins': 0,
+            'reuses': 0,
+            'reconnects': 0,
+            'shutdowns': 0,
+            'symbol_selects': 0,
+            'symbol_hits': 0,
+            'tick_fetches': 0,
+            'tick_hits': 0
+        }
+
+    def is_connected(self):
+        # terminal_info() returns None once the terminal is gone
+        return self.initialized and mt5.terminal_info() is not None
+
+    def initialize(self):
+        mt5_path = self.path or get_mt5_path()
+
+        if not mt5.initialize(path=mt5_path):
+            print("MT5 initialization failed")
+            print("Last error:", mt5.last_error())
+            return {"success": False, "error": f"Initialization failed: {mt5.last_error()}"}
+
+        self.initialized = True
+        self.login_id = None
+        self.server_name = None
+        self.clear_symbols()
+        self.stats['initializations'] += 1
+        return {"success": True}
+
+    def ensure(self, account_info):
+        """
+        Make sure the terminal is initialized and logged into `account_info`.
+        Returns {"success": True} or a failure dict in the same shape as sendOrder.
+        """
+        login_id = int(account_info['login_id'])
+        server_name = account_info['server_name']
+
+        with self.lock:
+            if not self.is_connected():
+                if self.initialized:
+                    logging.warning("MT5 terminal connection lost, re-initializing")
+                    self.stats['reconnects'] += 1
+                    self.initialized = False
+                result = self.initialize()
+                if not result['success']:
+                    return result
+
+            # Reuse the session when we are already logged into this account
+            if self.login_id == login_id and self.server_name == server_name:
+                self.stats['reuses'] += 1
+                return {"success": True, "reused": True}
+
+            if mt5.login(login=login_id, password=account_info['password'], server=server_name):
+                print(f"Logged in successfully to account {account_info['account_name']}")
+                self.login_id = login_id
+                self.server_name = server_name
+                # Symbol names and details belong to the broker of the previous account
+                self.clear_symbols()
+                self.stats['logins'] += 1
+                return {"success": True, "reused": False}
+
+            error_code = mt5.last_error()
+            print(f"Failed to login to account {account_info['account_name']}, error code:", error_code)
+            self.shutdown()
+            return {"success": False, "error": f"Login failed with error code {error_code}"}
+
+    def select_symbol(self, symbol):
+        """
+        Select `symbol` in Market Watch and return its SymbolDetails, or None
+        when the broker doesn't offer it. Cached for symbol_ttl seconds.
+        """
+        with self.lock:
+            now = time.monotonic()
+            entry = self.symbols.get(symbol)
+            if entry is not None and now < entry[1]:
+                self.stats['symbol_hits'] += 1
+                return entry[0]
+
+            self.stats['symbol_selects'] += 1
+            if not mt5.symbol_select(symbol, True):
+                self.symbols.pop(symbol, None)
+                return None
+
+            details = SymbolDetails.from_info(symbol, mt5.symbol_info(symbol))
+            self.symbols[symbol] = (details, now + self.symbol_ttl)
+            return details
+
+    def tick(self, symbol):
+        # The last tick for `symbol`, fetched again once older than tick_max_age seconds
+        with self.lock:
+            now = time.monotonic()
+            entry = self.ticks.get(symbol)
+            if entry is not None and now - entry[1] < self.tick_max_age:
+                self.stats['tick_hits'] += 1
+                return entry[0]
+
+            self.stats['tick_fetches'] += 1
+            tick = mt5.symbol_info_tick(symbol)
+            if tick is None:
+                self.ticks.pop(symbol, None)
+            else:
+                self.ticks[symbol] = (tick, now)
+                self._traded(symbol)
+            return tick
+
+    def _traded(self, symbol):
+        self.traded[symbol] = None
+        self.traded.move_to_end(symbol)
+        while len(self.traded) > self.poll_symbols:
+            self.traded.popitem(last=False)
+
+    @contextmanager
+    def sending_order(self):
+        # Held while an order is sent, the tick poller stays off the terminal meanwhile
+        with self.lock:
+            self.sending += 1
+        try:
+            yield self
+        finally:
+            with self.lock:
+                self.sending -= 1
+
+    def is_sending(self):
+        with self.lock:
+            return self.sending > 0
+
+    def refresh_ticks(self):
+        """
+        Fetch a fresh tick for each recently traded symbol of the current
+        account, so orders find one younger than tick_max_age. Returns the
+        number of ticks fetched. Used by the background tick poller, which
+        gives way to orders: the sweep ends as soon as one is being sent.
+        """
+        with self.lock:
+            if self.login_id is None:
+                return 0
+            symbols = list(self.traded)
+
+        fetched = 0
+        for symbol in symbols:
+            # The lock is taken per symbol so an order never waits for a whole sweep
+            with self.lock:
+                if self.sending:
+                    break
+                # The account changed since the sweep started
+                if symbol not in self.traded:
+                    continue
+                tick = mt5.symbol_info_tick(symbol)
+                if tick is not None:
+                    self.ticks[symbol] = (tick, time.monotonic())
+                    fetched += 1
+        return fetched
+
+    def clear_symbols(self):
+        with self.lock:
+            self.symbols.clear()
+            self.ticks.clear()
+            self.traded.clear()
+
+    def invalidate(self):
+        # Forget the logged in account so the next order logs in again
+        with self.lock:
+            self.login_id = None
+            self.server_name = None
+            self.clear_symbols()
+
+    def shutdown(self):
+        with self.lock:
+            mt5.shutdown()
+            self.initialized = False
+            self.login_id = None
+            self.server_name = None
+            self.clear_symbols()
+            self.stats['shutdowns'] += 1
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, logged_in=self.login_id is not None)
+
+
+# One session per process, shared by every order sent from it
+session = MT5Session()
+
+
+def get_session():
+    return session
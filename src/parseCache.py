@@ -0,0 +1,84 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Number of parsed messages kept, 0 turns the cache off
+DEFAULT_SIZE = int(os.getenv('PARSE_CACHE_SIZE', '1024'))
+
+
+class ParseCache:
+    """
+    Bounded LRU cache of parse results, keyed on a hash of the cleaned text.
+    Results are immutable ParsedOrders, shared by every caller.
+
+    Channels repost and mirror the same signals, so identical texts are only
+    parsed once. The cache is emptied whenever the alias table or the parser
+    version changes, since either can change the result for the same text.
+    """
+
+    def __init__(self, max_size=DEFAULT_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.generation = None
+        self.lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'invalidations': 0
+        }
+
+    @staticmethod
+    def key(text):
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+    def _check_generation(self, generation):
+        # Results parsed with other aliases or another parser version no longer apply
+        if generation != self.generation:
+            if self.entries:
+                self.stats['invalidations'] += 1
+            self.entries.clear()
+            self.generation = generation
+
+    def get(self, key, generation):
+        with self.lock:
+            self._check_generation(generation)
+            order_data = self.entries.get(key)
+            if order_data is None:
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return order_data
+
+    def put(self, key, generation, order_data):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self._check_generation(generation)
+            self.entries[key] = order_data
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, size=len(self.entries), max_size=self.max_size)
+
+
+# One cache per process, shared by every parse
+parse_cache = ParseCache()
+
+
+def get_parse_cache():
+    return parse_cache
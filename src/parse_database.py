@@ -1,44 +1,193 @@
+import os
 import sqlite3
-import json
-from validateOrder import validateOrder
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from init_db import DB_FILE, add_parser_version_column
+from validateOrder import parseOrder, PARSER_VERSION
 
-def main():
-    # Connect to the SQLite database
-    db_path = 'telegram_mt5_logs.db'
-    connection = sqlite3.connect(db_path)
+# Name under which this backfill stores its progress in parse_checkpoints
+CHECKPOINT_NAME = 'parse_database'
+
+
+def parse_chunk(rows):
+    # Runs in a worker process: parse every (rowid, message) and return what to write back
+    parsed = []
+    failed = []
+    for rowid, message in rows:
+        try:
+            # Validate and parse each message
+            order = parseOrder(message)
+            parsed.append((1, order.to_json(), PARSER_VERSION, rowid))
+        except Exception as e:
+            # A failure is stamped too, so the row isn't retried until the parser changes
+            failed.append((str(e), PARSER_VERSION, rowid))
+    return rows[-1][0], parsed, failed
+
+
+def read_chunks(cursor, start_after, chunk_size):
+    # Walk the logs table in rowid order, one bounded chunk at a time.
+    # Each chunk is its own query so commits in between never conflict with an open read.
+    last_rowid = start_after
+    while True:
+        cursor.execute(
+            "SELECT rowid, message FROM logs WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (last_rowid, chunk_size)
+        )
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        last_rowid = rows[-1][0]
+        yield rows
+
+
+def read_stale_chunks(cursor, version, chunk_size):
+    # Only the rows parsed by an older version, walked in (parser_version, rowid) order
+    # so every page is a range scan of idx_logs_parser_version
+    last_version, last_rowid = -1, 0
+    while True:
+        cursor.execute(
+            "SELECT rowid, message, parser_version FROM logs "
+            "WHERE parser_version < ? AND (parser_version, rowid) > (?, ?) "
+            "ORDER BY parser_version, rowid LIMIT ?",
+            (version, last_version, last_rowid, chunk_size)
+        )
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        last_rowid, last_version = rows[-1][0], rows[-1][2]
+        yield [(rowid, message) for rowid, message, _ in rows]
+
+
+def ensure_checkpoint_table(connection):
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS parse_checkpoints (
+            name TEXT PRIMARY KEY,
+            last_rowid INTEGER NOT NULL,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    connection.commit()
+
+
+def get_checkpoint(connection, name=CHECKPOINT_NAME):
+    cursor = connection.cursor()
+    cursor.execute("SELECT last_rowid FROM parse_checkpoints WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def write_chunk(connection, last_rowid, parsed, failed, name=CHECKPOINT_NAME):
+    # One bounded transaction per chunk, saving the checkpoint (if any) with the rows it covers
     cursor = connection.cursor()
+    cursor.executemany("UPDATE logs SET is_valid_trade = ?, parameters = ?, parser_version = ? WHERE rowid = ?", parsed)
+    cursor.executemany("UPDATE logs SET exception = ?, parser_version = ? WHERE rowid = ?", failed)
+    if name is not None:
+        cursor.execute(
+            "INSERT OR REPLACE INTO parse_checkpoints (name, last_rowid, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)",
+            (name, last_rowid)
+        )
+    connection.commit()
+
+
+def backfill(connection, chunk_size=1000, workers=None, start_after=0, stale_only=False, progress_interval=5.0):
+    """
+    Re-parse every log after `start_after`, or only the logs parsed by an
+    older parser version when `stale_only` is set, and store the results.
+
+    Chunks are parsed in a process pool (in this process when workers is 0)
+    and written back in read order, so the checkpoint always marks a point
+    before which every row is done. Returns the number of rows processed.
+    """
+    cursor = connection.cursor()
+    if stale_only:
+        # The stale rows are their own checkpoint: they stop being stale once committed
+        chunks = read_stale_chunks(cursor, PARSER_VERSION, chunk_size)
+        checkpoint = None
+    else:
+        chunks = read_chunks(cursor, start_after, chunk_size)
+        checkpoint = CHECKPOINT_NAME
+
+    processed = 0
+    failures = 0
+    started = time.monotonic()
+    last_report = started
+
+    def store(result):
+        nonlocal processed, failures, last_report
+        last_rowid, parsed, failed = result
+        write_chunk(connection, last_rowid, parsed, failed, checkpoint)
+        processed += len(parsed) + len(failed)
+        failures += len(failed)
+
+        now = time.monotonic()
+        if now - last_report >= progress_interval:
+            last_report = now
+            rate = processed / (now - started)
+            print(f"Processed {processed} rows ({rate:,.0f} rows/sec), {failures} failed, last rowid {last_rowid}")
+
+    if workers == 0:
+        for rows in chunks:
+            store(parse_chunk(rows))
+    else:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Keep a couple of chunks in flight per worker, never the whole table
+            max_pending = 2 * workers
+            pending = deque()
+            for rows in chunks:
+                pending.append(pool.submit(parse_chunk, rows))
+                if len(pending) >= max_pending:
+                    store(pending.popleft().result())
+            while pending:
+                store(pending.popleft().result())
+
+    elapsed = time.monotonic() - started
+    rate = processed / elapsed if elapsed > 0 else 0
+    print(f"Done: {processed} rows in {elapsed:.1f}s ({rate:,.0f} rows/sec), {failures} failed")
+    return processed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Re-parse stored Telegram messages and update their parameters")
+    parser.add_argument('--db', default=DB_FILE, help="SQLite database file")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="Rows read, parsed and committed together")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Parser processes (default: one per CPU, 0 parses in this process)")
+    parser.add_argument('--all', action='store_true',
+                        help="Re-parse every row, not only the rows parsed by an older parser version")
+    parser.add_argument('--resume', action='store_true', help="With --all, continue after the last committed rowid")
+    parser.add_argument('--start-after', type=int, default=None, help="With --all, only process rows after this rowid")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Connect to the SQLite database
+    connection = sqlite3.connect(args.db)
 
     try:
-        # Fetch all rows from the 'logs' table
-        cursor.execute("SELECT rowid, message FROM logs")
-        rows = cursor.fetchall()
-
-        for row in rows:
-            rowid, message = row
-
-            try:
-                # Validate and parse each message
-                order_data = validateOrder(message)
-                order_data_json = json.dumps(order_data)
-
-                # If successful, update the columns is_valid_trade and parameters
-                cursor.execute(
-                    "UPDATE logs SET is_valid_trade = ?, parameters = ? WHERE rowid = ?",
-                    (1, order_data_json, rowid)
-                )
-                print(f"Successfully processed row {rowid}")
-
-            except Exception as e:
-                # If an exception occurs, update the exception column
-                cursor.execute(
-                    "UPDATE logs SET exception = ? WHERE rowid = ?",
-                    (str(e), rowid)
-                )
-                print(f"Failed to process row {rowid}: {e}")
-
-        # Commit all changes to the database
+        ensure_checkpoint_table(connection)
+        add_parser_version_column(connection.cursor())
         connection.commit()
 
+        if args.all:
+            if args.start_after is not None:
+                start_after = args.start_after
+            elif args.resume:
+                start_after = get_checkpoint(connection)
+                print(f"Resuming after rowid {start_after}")
+            else:
+                start_after = 0
+
+            backfill(connection, chunk_size=args.chunk_size, workers=args.workers, start_after=start_after)
+        else:
+            # Rows are stamped as they are committed, so an interrupted run simply picks up the rest
+            print(f"Re-parsing rows older than parser version {PARSER_VERSION}")
+            backfill(connection, chunk_size=args.chunk_size, workers=args.workers, stale_only=True)
+
     except Exception as e:
         print(f"An error occurred while accessing the database: {e}")
 
@@ -0,0 +1,93 @@
+import json
+from typing import NamedTuple, Optional
+
+
+class OrderLeg(NamedTuple):
+    """One take-profit leg of a parsed order, sent to one account."""
+    account: Optional[dict]
+    tp: float
+
+
+class ParsedOrder:
+    """
+    Immutable result of parsing a signal.
+
+    price is a float, a (low, high) range or None, and tp a tuple, so one
+    instance can be shared by the parse cache and every account a signal is
+    sent to. The JSON stored in logs.parameters is built once and cached.
+    Read-only item access (order["tp"], order.get("sl")) is kept for code
+    written against the old dict results.
+    """
+
+    __slots__ = ('signal', 'symbol', 'price', 'sl', 'tp', '_json')
+
+    FIELDS = ('signal', 'symbol', 'price', 'sl', 'tp')
+
+    def __init__(self, signal=None, symbol=None, price=None, sl=None, tp=()):
+        set_field = object.__setattr__
+        set_field(self, 'signal', signal)
+        set_field(self, 'symbol', symbol)
+        set_field(self, 'price', price)
+        set_field(self, 'sl', sl)
+        set_field(self, 'tp', tuple(tp))
+        set_field(self, '_json', None)
+
+    @classmethod
+    def from_dict(cls, order_data):
+        price = order_data.get('price')
+        if isinstance(price, list):
+            price = tuple(price)
+        return cls(order_data.get('signal'), order_data.get('symbol'), price, order_data.get('sl'), order_data.get('tp') or ())
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"ParsedOrder is immutable, can't set {name}")
+
+    def __getitem__(self, name):
+        if name not in self.FIELDS:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def get(self, name, default=None):
+        if name not in self.FIELDS:
+            return default
+        return getattr(self, name)
+
+    def __eq__(self, other):
+        if not isinstance(other, ParsedOrder):
+            return NotImplemented
+        return (self.signal, self.symbol, self.price, self.sl, self.tp) == \
+            (other.signal, other.symbol, other.price, other.sl, other.tp)
+
+    def __hash__(self):
+        return hash((self.signal, self.symbol, self.price, self.sl, self.tp))
+
+    def __repr__(self):
+        return (f"ParsedOrder(signal={self.signal!r}, symbol={self.symbol!r}, price={self.price!r}, "
+                f"sl={self.sl!r}, tp={self.tp!r})")
+
+    def __reduce__(self):
+        # Sent to the account worker processes; the cached JSON is rebuilt there if needed
+        return (ParsedOrder, (self.signal, self.symbol, self.price, self.sl, self.tp))
+
+    def is_complete(self):
+        # Everything an order needs before it can be sent
+        return bool(self.signal and self.symbol and self.price and self.tp and self.sl)
+
+    def to_dict(self):
+        # The dict validateOrder has always returned, with a fresh TP list
+        return {
+            "signal": self.signal,
+            "symbol": self.symbol,
+            "price": self.price,
+            "sl": self.sl,
+            "tp": list(self.tp)
+        }
+
+    def to_json(self):
+        if self._json is None:
+            object.__setattr__(self, '_json', json.dumps(self.to_dict()))
+        return self._json
+
+    def legs(self, account=None):
+        # One leg per take-profit, in the order the signal listed them
+        return [OrderLeg(account, tp) for tp in self.tp]
@@ -0,0 +1,226 @@
+import os
+import re
+import json
+import logging
+from dotenv import load_dotenv
+from symbolAliases import get_alias_index
+from symbolMatcher import trie_pattern
+from parsedOrder import ParsedOrder
+from channelRouting import normalise_telegram_id
+
+# Load environment variables
+load_dotenv()
+
+# JSON file mapping Telegram channel ids to their parser profile
+PROFILES_FILE = os.getenv('PARSER_PROFILES_FILE', 'parser_profiles.json')
+
+NUMBER = r'\d+\.?\d*'
+
+# A format is a sequence of placeholders, literal words and [ ... ] groups
+# repeated with +, * or ?, e.g. "{symbol} {signal} {price} sl {sl} [tp {tp}]+"
+FORMAT_TOKEN_PATTERN = re.compile(r'\[|\][+*?]|\{\w+\}|[^\s\[\]{}]+')
+
+PLACEHOLDERS = ('symbol', 'signal', 'price', 'sl', 'tp', 'text')
+
+
+def normalise_channel_id(channel_id):
+    # Telegram reports channel ids with and without their sign and -100 prefix, profiles use the bare id
+    return normalise_telegram_id(channel_id)
+
+
+class ParserProfile:
+    """
+    Declarative message format for one channel, compiled into a single
+    anchored regex.
+
+    A profile only parses messages that match its format exactly; anything
+    else returns None so the caller can fall back to the generic parser.
+    Options:
+        tp_shorthand: TPs are written as the decimals of the entry price,
+                      e.g. "tp.77400" for an entry of 1.78050 means 1.77400
+    """
+
+    def __init__(self, channel_id, spec):
+        self.channel_id = normalise_channel_id(channel_id)
+        self.name = spec.get('name', str(self.channel_id))
+        self.format = spec['format']
+        self.tp_shorthand = bool(spec.get('tp_shorthand', False))
+        self.items = _parse_format(self.format)
+        # The regex depends on the symbols known to the alias index, so it is
+        # compiled against one index and only rebuilt when the index changes
+        self.index = None
+        self.pattern = None
+        self.tp_groups = []
+
+    def compile(self, index):
+        sources = []
+        tp_groups = []
+        for position, item in enumerate(self.items):
+            if isinstance(item, tuple):
+                inner, repeat = item
+                name = f'group_{position}'
+                sources.append(f'(?P<{name}>(?:\\s*{_group_source(inner)}){repeat})')
+                if '{tp}' in inner:
+                    tp_groups.append((name, re.compile(_group_source(inner, capture_tp=True), re.IGNORECASE)))
+            elif item == '{tp}':
+                name = f'tp_{position}'
+                sources.append(f'(?P<{name}>{NUMBER})')
+                tp_groups.append((name, None))
+            elif item[0] == '{':
+                sources.append(_placeholder_source(item[1:-1], index))
+            else:
+                sources.append(item)
+
+        self.pattern = re.compile(r'\s*' + r'\s*'.join(sources) + r'\s*', re.IGNORECASE | re.DOTALL)
+        self.tp_groups = tp_groups
+        self.index = index
+
+    def parse(self, message, index=None):
+        """
+        Order details for a cleaned message in this channel's format,
+        or None when the message doesn't follow the format.
+        """
+        if index is None:
+            index = get_alias_index()
+        if index is not self.index:
+            self.compile(index)
+
+        match = self.pattern.fullmatch(message)
+        if match is None:
+            return None
+
+        groups = match.groupdict()
+        if groups.get('price_high') is not None:
+            price = (float(groups['price_low']), float(groups['price_high']))
+        elif groups.get('price_low') is not None:
+            price = float(groups['price_low'])
+        else:
+            price = None
+
+        tp_texts = []
+        for name, inner_pattern in self.tp_groups:
+            text = groups[name]
+            if text is None:
+                continue
+            if inner_pattern is None:
+                tp_texts.append(text)
+            else:
+                tp_texts.extend(inner.group('tp') for inner in inner_pattern.finditer(text))
+
+        if self.tp_shorthand and price is not None:
+            entry = price[0] if isinstance(price, tuple) else price
+            tps = [_from_shorthand(tp, entry) for tp in tp_texts]
+        else:
+            tps = [float(tp) for tp in tp_texts]
+
+        return ParsedOrder(
+            groups['signal'].lower() if groups.get('signal') else None,
+            index.symbol_for(groups['symbol']) if groups.get('symbol') else None,
+            price,
+            float(groups['sl']) if groups.get('sl') else None,
+            tps
+        )
+
+
+def _parse_format(format_string):
+    # Turns the format into {placeholders}, escaped literal words and (items, repeat) groups
+    items = []
+    group = None
+    for token in FORMAT_TOKEN_PATTERN.findall(format_string):
+        if token == '[':
+            if group is not None:
+                raise ValueError(f"Nested groups are not supported: {format_string}")
+            group = []
+        elif token[0] == ']':
+            if group is None:
+                raise ValueError(f"Unopened group in format: {format_string}")
+            items.append((group, token[1]))
+            group = None
+        elif token[0] == '{':
+            name = token[1:-1]
+            if name not in PLACEHOLDERS:
+                raise ValueError(f"Unknown placeholder {token} in format: {format_string}")
+            if group is not None and name != 'tp':
+                raise ValueError(f"Only {{tp}} can be repeated, found {token} in format: {format_string}")
+            (items if group is None else group).append(token)
+        else:
+            (items if group is None else group).append(re.escape(token))
+
+    if group is not None:
+        raise ValueError(f"Unclosed group in format: {format_string}")
+
+    for name in ('symbol', 'signal', 'price', 'sl'):
+        if items.count('{' + name + '}') > 1:
+            raise ValueError(f"{{{name}}} appears more than once in format: {format_string}")
+    return items
+
+
+def _group_source(items, capture_tp=False):
+    sources = []
+    for item in items:
+        if item == '{tp}':
+            sources.append(f'(?P<tp>{NUMBER})' if capture_tp else NUMBER)
+        else:
+            sources.append(item)
+    return r'\s*'.join(sources)
+
+
+def _placeholder_source(name, index):
+    if name == 'symbol':
+        return r'\b(?P<symbol>' + trie_pattern(index.symbol_order) + r')\b'
+    if name == 'signal':
+        return r'\b(?P<signal>buy|sell)\b'
+    if name == 'price':
+        return f'(?P<price_low>{NUMBER})(?:\\s*-\\s*(?P<price_high>{NUMBER}))?'
+    if name == 'sl':
+        return f'(?P<sl>{NUMBER})'
+    # {text}: free text the channel adds, such as a sign-off
+    return '.*?'
+
+
+def _from_shorthand(tp, entry):
+    # Written without a decimal point, the digits are the decimals of the entry's whole part
+    if '.' in tp:
+        return float(tp)
+    return float(f"{int(entry)}.{tp}")
+
+
+# Profiles by normalised Telegram channel id
+profiles = {}
+
+
+def register_profile(channel_id, spec):
+    profile = ParserProfile(channel_id, spec)
+    profiles[profile.channel_id] = profile
+    return profile
+
+
+def get_profile(channel_id):
+    if channel_id is None:
+        return None
+    return profiles.get(normalise_channel_id(channel_id))
+
+
+def load_profiles(path=PROFILES_FILE):
+    """
+    Register every profile in the JSON file at `path`, an object of
+    channel id -> {"name": ..., "format": ..., options}.
+    A missing file just means no channel has a profile.
+    """
+    if not os.path.exists(path):
+        return profiles
+
+    with open(path, encoding='utf-8') as f:
+        specs = json.load(f)
+
+    for channel_id, spec in specs.items():
+        try:
+            register_profile(channel_id, spec)
+        except (KeyError, ValueError) as e:
+            logging.error(f"Invalid parser profile for channel {channel_id}: {e}")
+
+    logging.info(f"Loaded {len(profiles)} parser profiles from {path}")
+    return profiles
+
+
+load_profiles()
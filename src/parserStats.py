@@ -0,0 +1,72 @@
+import time
+import logging
+import threading
+
+# Ways a message can be parsed, from cheapest to most expensive
+TIERS = ('profile', 'strict', 'cache', 'heuristic')
+
+# Seconds between two summaries in the log
+LOG_INTERVAL = 600
+
+
+class ParserStats:
+    """
+    Per-channel count of the parser tier that handled each message.
+
+    A channel whose messages keep missing the strict fast path is a good
+    candidate for its own parser profile.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.lock = threading.Lock()
+        self.last_logged = time.monotonic()
+
+    def record(self, channel, tier):
+        with self.lock:
+            counts = self.counts.get(channel)
+            if counts is None:
+                counts = self.counts[channel] = dict.fromkeys(TIERS, 0)
+            counts[tier] += 1
+
+    def get_stats(self):
+        with self.lock:
+            stats = {}
+            for channel, counts in self.counts.items():
+                total = sum(counts.values())
+                stats[channel] = dict(
+                    counts,
+                    total=total,
+                    # Share of the messages handled by a profile or the strict fast path
+                    fast_path_rate=(counts['profile'] + counts['strict']) / total if total else 0.0
+                )
+            return stats
+
+    def log_summary(self):
+        stats = self.get_stats()
+        for channel, counts in sorted(stats.items(), key=lambda item: item[1]['fast_path_rate']):
+            logging.info(
+                f"Parser tiers for {channel}: {counts['fast_path_rate']:.0%} fast path of {counts['total']} "
+                f"(profile {counts['profile']}, strict {counts['strict']}, cache {counts['cache']}, "
+                f"heuristic {counts['heuristic']})"
+            )
+
+    def maybe_log_summary(self):
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last_logged < LOG_INTERVAL:
+                return
+            self.last_logged = now
+        self.log_summary()
+
+    def clear(self):
+        with self.lock:
+            self.counts.clear()
+
+
+# One set of counters per process
+parser_stats = ParserStats()
+
+
+def get_parser_stats():
+    return parser_stats
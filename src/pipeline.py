@@ -0,0 +1,221 @@
+import os
+import time
+import logging
+import threading
+from dotenv import load_dotenv
+from messageExecutor import MessageExecutor, QUEUE_SIZE, WORKERS
+from signalFilter import looks_like_signal, get_rejected_log
+from parserStats import get_parser_stats
+from accountWorkers import get_worker_pool
+from logWriter import get_log_writer
+from dbConnection import get_connection
+from processMessage import parse_message, route_message, execute_order, failed_row, write_logs
+
+# Load environment variables
+load_dotenv()
+
+# Jobs waiting in each stage after ingest; a full stage holds back the one feeding it
+STAGE_QUEUE_SIZE = int(os.getenv('PIPELINE_STAGE_QUEUE_SIZE', '100'))
+# Seconds between two logged summaries of the stages, 0 turns them off
+STATS_INTERVAL = float(os.getenv('PIPELINE_STATS_INTERVAL_SECONDS', '60'))
+# A stage holding this many jobs has the summary logged as a warning, at most every WARNING_INTERVAL seconds
+DEPTH_WARNING = int(os.getenv('PIPELINE_DEPTH_WARNING', '20'))
+WARNING_INTERVAL = 5
+
+
+class MessagePipeline:
+    """
+    The steps of process_message as separate stages, each a MessageExecutor
+    with its own bounded queue:
+
+        ingest/parse -> route -> execution (per account) -> log
+
+    The event loop only submits to the ingest queue, which never blocks.
+    Parsing goes on while orders are being sent, and each stage's queue depth
+    and time-in-stage histogram show where latency builds up under a burst.
+    With account workers, each account gets an execution queue sending
+    through its worker; otherwise every order shares the queue of this
+    process' terminal.
+
+    While messages come in, a summary of every stage is logged each
+    `stats_interval` seconds, and as a warning as soon as a stage holds
+    `depth_warning` jobs, so a burst shows up in the log while it lasts.
+    """
+
+    def __init__(self, worker_pool=None, ingest_size=QUEUE_SIZE, parse_workers=WORKERS, stage_size=STAGE_QUEUE_SIZE,
+                 stats_interval=STATS_INTERVAL, depth_warning=DEPTH_WARNING):
+        self.worker_pool = worker_pool
+        self.stage_size = stage_size
+        self.stats_interval = stats_interval
+        self.depth_warning = depth_warning
+        # Time of the last summary and warning, and each stage's histogram counts at the last summary
+        self.stats_lock = threading.Lock()
+        self.last_logged = time.monotonic()
+        self.last_warning = 0.0
+        self.last_counts = {}
+        self.parse = MessageExecutor(ingest_size, parse_workers, name='parse')
+        self.route = MessageExecutor(stage_size, 1, name='route')
+        self.log = MessageExecutor(stage_size, 1, name='log')
+        # Account id, or None for this process' terminal -> execution stage
+        self.execution = {}
+        self.execution_lock = threading.Lock()
+
+    def start(self):
+        for stage in (self.parse, self.route, self.log):
+            stage.start()
+        return self
+
+    def submit(self, message, channel, chat_id=None):
+        # Called from the event loop: never blocks, returns False when the ingest queue is full
+        return self.parse.submit(self._parse, message, channel, chat_id)
+
+    def _worker_pool(self):
+        return self.worker_pool if self.worker_pool is not None else get_worker_pool()
+
+    def _parse(self, message, channel, chat_id):
+        self.maybe_log_stats()
+        if not message:
+            logging.info('No message found.')
+            return
+
+        # Chatter is logged in bulk and never reaches the later stages
+        if not looks_like_signal(message):
+            logging.debug(f"Not a signal: {message}")
+            get_rejected_log().add(channel, message)
+            return
+
+        created_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        message, order, exception = parse_message(message, channel, chat_id)
+        if order is None:
+            self.log.put(self._write, channel, message, [failed_row(None, exception)], created_at)
+        elif not order.is_complete():
+            # Nothing to route or send, execute_order only builds the invalid format row
+            self.log.put(self._write, channel, message, execute_order(order, None, []), created_at)
+        else:
+            self.route.put(self._route, channel, chat_id, message, order, created_at)
+
+    def _execution_stage(self, key):
+        with self.execution_lock:
+            stage = self.execution.get(key)
+            if stage is None:
+                name = 'execution-terminal' if key is None else f'execution-{key}'
+                stage = self.execution[key] = MessageExecutor(self.stage_size, 1, name=name).start()
+            return stage
+
+    def _route(self, channel, chat_id, message, order, created_at):
+        # Each stage thread keeps its own connection
+        account_info, all_accounts = route_message(get_connection(), channel, chat_id)
+
+        # With account workers every account has its own execution queue, sending through its worker
+        worker_pool = self._worker_pool()
+        if account_info or not all_accounts:
+            key = account_info['id'] if account_info and worker_pool is not None else None
+            self._execution_stage(key).put(self._execute, channel, message, order, account_info, [], created_at)
+            return
+
+        # Fan-out: one job per account, so a slow account never holds back the others
+        for account in all_accounts:
+            key = account['id'] if worker_pool is not None else None
+            self._execution_stage(key).put(self._execute, channel, message, order, None, [account], created_at)
+
+    def _execute(self, channel, message, order, account_info, all_accounts, created_at):
+        rows = execute_order(order, account_info, all_accounts, self._worker_pool())
+        self.log.put(self._write, channel, message, rows, created_at)
+
+    def _write(self, channel, message, rows, created_at):
+        # Handed to the log writer when it runs, which commits rows in batches
+        log_writer = get_log_writer()
+        if log_writer is not None:
+            log_writer.add(channel, message, rows, created_at)
+            get_rejected_log().flush_if_due()
+        else:
+            conn = get_connection()
+            write_logs(conn, channel, message, rows, created_at)
+            # Rejected messages waiting too long go out with this connection
+            get_rejected_log().flush_if_due(conn)
+
+        # Now and then, log how often each channel hits the parser's fast path
+        get_parser_stats().maybe_log_summary()
+        self.maybe_log_stats()
+
+    def stages(self):
+        with self.execution_lock:
+            execution = list(self.execution.values())
+        return [self.parse, self.route] + execution + [self.log]
+
+    def _in_order(self, action):
+        # Upstream stages first; execution stages are only listed once routing is
+        # done, since routing creates them
+        action(self.parse)
+        action(self.route)
+        with self.execution_lock:
+            execution = list(self.execution.values())
+        for stage in execution:
+            action(stage)
+        action(self.log)
+
+    def join(self):
+        # Wait until every message submitted so far has been logged
+        self._in_order(MessageExecutor.join)
+
+    def stop(self):
+        # Each stage finishes its queue before the next one stops
+        self._in_order(MessageExecutor.stop)
+
+    def get_stats(self):
+        return {stage.name: stage.get_stats() for stage in self.stages()}
+
+    def maybe_log_stats(self):
+        now = time.monotonic()
+        backed_up = any(stage.queue.qsize() >= self.depth_warning for stage in self.stages())
+        with self.stats_lock:
+            if backed_up and now - self.last_warning >= WARNING_INTERVAL:
+                level = logging.WARNING
+                self.last_warning = now
+            elif self.stats_interval > 0 and now - self.last_logged >= self.stats_interval:
+                level = logging.INFO
+            else:
+                return
+            self.last_logged = now
+        self.log_stats(level)
+
+    def log_stats(self, level=logging.INFO):
+        # One line per stage, with the jobs done and their p99 time in stage since the last summary
+        lines = []
+        with self.stats_lock:
+            for stage in self.stages():
+                stats = stage.get_stats()
+                counts = list(stats['time_in_stage']['buckets'].values())
+                previous = self.last_counts.get(stage.name, [0] * len(counts))
+                window = [count - before for count, before in zip(counts, previous)]
+                self.last_counts[stage.name] = counts
+                p99 = stage.histogram.percentile(0.99, window)
+                lines.append(f"Pipeline stage {stage.name}: {stats['queued']} queued (max {stats['max_depth']}), "
+                             f"{sum(window)} done at p99 {p99 * 1000:g}ms since the last summary, "
+                             f"{stats['dropped']} dropped, {stats['errors']} errors")
+        for line in lines:
+            logging.log(level, line)
+
+
+# The pipeline of the listener process
+pipeline = None
+
+
+def get_pipeline():
+    return pipeline
+
+
+def start_pipeline(worker_pool=None):
+    global pipeline
+    if pipeline is None:
+        pipeline = MessagePipeline(worker_pool).start()
+    return pipeline
+
+
+def stop_pipeline():
+    global pipeline
+    if pipeline is not None:
+        pipeline.stop()
+        for name, stats in pipeline.get_stats().items():
+            logging.info(f"Pipeline stage {name}: {stats}")
+        pipeline = None
@@ -1,247 +1,189 @@
-import sqlite3
 import time
 import json
 import logging
 from cleanMessage import cleanMessage
-from validateOrder import validateOrder
-from sendOrder import sendOrder
-
-
-def process_message(message, channel, db_connection=None):
-    # If no connection is provided, create a new one
-    if db_connection is None:
-        # Database file
-        db_file = 'telegram_mt5_logs.db'
-
-        # Connect to the SQLite database
-        conn = sqlite3.connect(db_file)
-        should_close_conn = True
-    else:
-        # Use the provided connection
-        conn = db_connection
-        should_close_conn = False
-
-    cursor = conn.cursor()
-
-    # Get account information for this channel
-    account_info = None
-    all_accounts = []
+from validateOrder import parseOrder
+from parserProfiles import get_profile
+from signalFilter import looks_like_signal, get_rejected_log
+from parserStats import get_parser_stats
+from sendOrder import sendOrderBatch
+from accountWorkers import get_worker_pool
+from channelRouting import get_routing_table
+from logWriter import INSERT_LOG, log_records, get_log_writer
+from dbConnection import get_connection
+
+
+def _now():
+    return time.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def route_message(conn, channel, chat_id=None):
+    """
+    The account a channel's signals go to, from the in-memory routing table.
+    Returns (account_info, all_accounts): all_accounts is every account when
+    the channel has no mapped account, so a valid trade fans out to them.
+    """
     try:
-        # First get the channel ID - try case-insensitive match
-        logging.info(f"Looking for channel with name: {channel}")
-        cursor.execute('SELECT id FROM channels WHERE LOWER(name) = LOWER(?)', (channel,))
-        channel_row = cursor.fetchone()
-
-        # If not found, try a more flexible match
-        if not channel_row:
-            logging.info(f"Exact match not found, trying flexible match for: {channel}")
-            cursor.execute('SELECT id FROM channels WHERE LOWER(name) LIKE LOWER(?)', (f'%{channel}%',))
-            channel_row = cursor.fetchone()
-            if channel_row:
-                logging.info(f"Found channel with flexible match: {channel_row[0]}")
-            else:
-                logging.warning(f"No channel found for: {channel} even with flexible match")
-
-        if channel_row:
-            channel_id = channel_row[0]
-
-            # Then get the account ID mapped to this channel
-            logging.info(f"Found channel ID: {channel_id}, looking for account mapping")
-            cursor.execute('''
-                SELECT a.* FROM mt_accounts a
-                JOIN channel_account_mappings m ON a.id = m.account_id
-                WHERE m.channel_id = ?
-            ''', (channel_id,))
-
-            account_row = cursor.fetchone()
-
-            if account_row:
-                account_info = {
-                    'id': account_row[0],
-                    'account_name': account_row[1],
-                    'server_name': account_row[2],
-                    'login_id': account_row[3],
-                    'password': account_row[4]
-                }
-                logging.info(f"Using account {account_info['account_name']} (ID: {account_info['id']}) for channel {channel}")
-            else:
-                # Check if there's a mapping in the database
-                cursor.execute('SELECT COUNT(*) FROM channel_account_mappings WHERE channel_id = ?', (channel_id,))
-                mapping_count = cursor.fetchone()[0]
-                if mapping_count > 0:
-                    logging.warning(f"Found mapping for channel {channel} (ID: {channel_id}) but couldn't retrieve account info")
-                else:
-                    logging.warning(f"No account mapped for channel {channel} (ID: {channel_id})")
-                # Fetch all accounts for potential use if this is a valid trade
-                cursor.execute('SELECT * FROM mt_accounts')
-                account_rows = cursor.fetchall()
-                for row in account_rows:
-                    all_accounts.append({
-                        'id': row[0],
-                        'account_name': row[1],
-                        'server_name': row[2],
-                        'login_id': row[3],
-                        'password': row[4]
-                    })
-                logging.info(f"Found {len(all_accounts)} accounts to use if this is a valid trade")
-        else:
-            logging.warning(f"Channel {channel} not found in database")
-            # Fetch all accounts for potential use if this is a valid trade
-            cursor.execute('SELECT * FROM mt_accounts')
-            account_rows = cursor.fetchall()
-            for row in account_rows:
-                all_accounts.append({
-                    'id': row[0],
-                    'account_name': row[1],
-                    'server_name': row[2],
-                    'login_id': row[3],
-                    'password': row[4]
-                })
-            logging.info(f"Found {len(all_accounts)} accounts to use if this is a valid trade")
+        # The chat id identifies the channel even when titles overlap or it was renamed
+        route = get_routing_table(conn).resolve(channel, chat_id)
     except Exception as e:
         logging.error(f"Error fetching account info: {e}")
         # Continue without account info if there's an error
+        return None, []
 
-    # Ensure message is not empty
-    if not message:
-        logging.info('No message found.')
-        if should_close_conn:
-            conn.close()
-        return
+    if not route.account:
+        logging.info(f"Found {len(route.all_accounts)} accounts to use if this is a valid trade")
+    return route.account, list(route.all_accounts)
 
+
+def parse_message(message, channel, chat_id=None):
+    """
+    Clean and parse a message. Returns (cleaned message, order, exception),
+    with order None and the exception text when parsing raised.
+    """
     # Clean the message
     message = cleanMessage(message)
     logging.info(f"Processing message: {message}")
 
-    # Initialize variables
-    created_at = time.strftime('%Y-%m-%d %H:%M:%S')
-    parameters = None
-    trade_response = None
-    exception = None
-    is_valid_trade = 0
-    processed_at = None
-    failed_at = None
+    try:
+        # Channels with a parser profile are parsed by their own format first,
+        # anything the profile doesn't match goes through the generic parser
+        profile = get_profile(chat_id)
+        order = profile.parse(message) if profile else None
+        if order is not None:
+            get_parser_stats().record(channel, 'profile')
+        else:
+            # Validate the message to extract order details (it was already cleaned above)
+            order = parseOrder(message, cleaned=True, channel=channel)
+    except Exception as e:
+        logging.error(f"Error validating order: {e}")
+        return message, None, str(e)
+
+    return message, order, None
+
+
+def failed_row(parameters, exception, is_valid_trade=0):
+    # Log row of a message that never produced an order response
+    return (parameters, json.dumps(None), exception, is_valid_trade, None, _now())
+
+
+def execute_order(order, account_info, all_accounts, worker_pool=None):
+    """
+    Send a parsed order to the mapped account, or to all_accounts when the
+    channel has none. Returns the log rows to write, each
+    (parameters, trade_response, exception, is_valid_trade, processed_at, failed_at).
+    """
+    # Serialised once per parsed order, shared by every log row of this signal
+    parameters = order.to_json()
+
+    # Check for missing fields in the order
+    if not order.is_complete():
+        logging.error("Invalid order format.")
+        return [failed_row(parameters, "Invalid order format.")]
 
     try:
-        # Validate the message to extract order details
-        orderJson = validateOrder(message)
-
-        # If orderJson is valid, set parameters to its string representation
-        if orderJson:
-            parameters = json.dumps(orderJson)
-
-        # Check for missing fields in the order
-        if not orderJson.get('signal') or not orderJson.get('symbol') or not orderJson.get('price') or not orderJson.get('tp') or not orderJson.get('sl'):
-            logging.error("Invalid order format.")
-            exception = "Invalid order format."
-            failed_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        # If no account is mapped and it's a valid trade, send to all accounts
+        if not account_info and all_accounts:
+            logging.info(f"Sending valid trade to all {len(all_accounts)} accounts")
+
+            account_ids = [account['id'] for account in all_accounts]
+            if worker_pool is not None:
+                # Each account's worker process sends its legs at the same time
+                all_responses = worker_pool.send(order, order.tp, account_ids)
+            else:
+                # Every (account, tp) leg goes out in one batch, logging in once per account
+                legs = [leg for account in all_accounts for leg in order.legs(account)]
+                all_responses = sendOrderBatch(order, legs)
+
+            # One log row per account leg
+            rows = []
+            for leg in all_responses:
+                success = leg['response'].get('success')
+                rows.append((parameters, json.dumps(leg['response']), None if success else "Failed", 1,
+                             _now() if success else None, None if success else _now()))
+            return rows
+
+        # Regular case - send every tp leg to the mapped account or default
+        # If an order fails, don't try to send more orders
+        trade_response = None
+        exception = None
+        processed_at = None
+        failed_at = None
+        if worker_pool is not None and account_info:
+            # The account's own worker and terminal; the listener never logs into a worker's account
+            legs = worker_pool.send(order, order.tp, [account_info['id']], stop_on_failure=True)
         else:
-            is_valid_trade = 1
-            # Make a copy of the original tp values
-            original_tp_values = orderJson['tp'].copy()
-
-            # If no account is mapped and it's a valid trade, send to all accounts
-            if not account_info and all_accounts and is_valid_trade:
-                logging.info(f"Sending valid trade to all {len(all_accounts)} accounts")
-
-                # Create an array to collect all responses
-                all_responses = []
-
-                # For each account
-                for account in all_accounts:
-                    logging.info(f"Sending to account: {account['account_name']}")
-
-                    # Iterate through each take-profit (tp) value and send an order
-                    for i, tp in enumerate(original_tp_values):
-                        # Set the current tp value
-                        orderJson['tp'] = tp
-
-                        # Only shutdown after the last order of the last account
-                        is_last_order = (i == len(original_tp_values) - 1) and (account == all_accounts[-1])
-
-                        # Send the order
-                        account_trade_response = sendOrder(orderJson, account, shutdown_after=is_last_order)
-
-                        # Add this response to our collection
-                        all_responses.append({
-                            "account": account['account_name'],
-                            "id": account['id'],
-                            "response": account_trade_response
-                        })
-
-                        # Log the response for this account
-                        try:
-                            # Insert the log into the database for this account
-                            cursor.execute('''
-                                INSERT INTO logs (channel, message, parameters, trade_response, exception, is_valid_trade, processed_at, failed_at, created_at)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            ''', (channel, message, parameters, json.dumps(account_trade_response), None if account_trade_response.get('success') else "Failed",
-                                  is_valid_trade,
-                                  time.strftime('%Y-%m-%d %H:%M:%S') if account_trade_response.get('success') else None,
-                                  time.strftime('%Y-%m-%d %H:%M:%S') if not account_trade_response.get('success') else None,
-                                  created_at))
-                            conn.commit()
-                        except Exception as e:
-                            logging.error(f"Error inserting log for account {account['account_name']}: {e}")
-
-                # Set trade_response with all collected responses
-                # Check if any of the account responses were successful
-                any_success = any(response["response"].get("success", False) for response in all_responses)
-
-                trade_response = {
-                    "success": any_success,
-                    "responses": all_responses
-                }
-
-                if any_success:
-                    processed_at = time.strftime('%Y-%m-%d %H:%M:%S')
-                else:
-                    failed_at = time.strftime('%Y-%m-%d %H:%M:%S')
+            legs = sendOrderBatch(order, order.legs(account_info), stop_on_failure=True)
+        for leg in legs:
+            trade_response = leg['response']
+            if trade_response.get('success'):
+                # success is present and truthy
+                processed_at = _now()
             else:
-                # Regular case - send to the mapped account or default
-                # Iterate through each take-profit (tp) value and send an order
-                for i, tp in enumerate(original_tp_values):
-                    # Set the current tp value
-                    orderJson['tp'] = tp
-
-                    # Only shutdown after the last order
-                    is_last_order = i == len(original_tp_values) - 1
-
-                    # Send the order
-                    trade_response = sendOrder(orderJson, account_info, shutdown_after=is_last_order)
-                    if trade_response.get('success'):
-                        # success is present and truthy
-                        processed_at = time.strftime('%Y-%m-%d %H:%M:%S')
-                    else:
-                        # either not present, or falsy
-                        failed_at = time.strftime('%Y-%m-%d %H:%M:%S')
-                        exception = trade_response.get('error', 'Order failed')
-                        # If an order fails, don't try to send more orders
-                        break
+                # either not present, or falsy
+                failed_at = _now()
+                exception = trade_response.get('error', 'Order failed')
+        return [(parameters, json.dumps(trade_response), exception, 1, processed_at, failed_at)]
 
     except Exception as e:
         logging.error(f"Error validating order: {e}")
-        exception = str(e)
-        failed_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        return [failed_row(parameters, str(e), is_valid_trade=1)]
 
-    try:
-        # If we sent to all accounts, don't insert a duplicate main log entry
-        if not (not account_info and all_accounts and is_valid_trade):
-            # Insert the log into the database
-            cursor.execute('''
-                INSERT INTO logs (channel, message, parameters, trade_response, exception, is_valid_trade, processed_at, failed_at, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (channel, message, parameters, json.dumps(trade_response), exception, is_valid_trade, processed_at, failed_at, created_at))
+
+def write_logs(conn, channel, message, rows, created_at):
+    # Insert the log rows of one message, each committed on its own
+    cursor = conn.cursor()
+    for record in log_records(channel, message, rows, created_at):
+        try:
+            cursor.execute(INSERT_LOG, record)
             conn.commit()
-            record_id = cursor.lastrowid
-            logging.info(f"Record inserted with ID: {record_id}")
-    except Exception as e:
-        logging.error(f"Error inserting log into database: {e}")
-        conn.rollback()  # Rollback if something goes wrong
+            logging.info(f"Record inserted with ID: {cursor.lastrowid}")
+        except Exception as e:
+            logging.error(f"Error inserting log into database: {e}")
+            conn.rollback()  # Rollback if something goes wrong
+
+
+def process_message(message, channel, db_connection=None, worker_pool=None, chat_id=None):
+    # Ensure message is not empty
+    if not message:
+        logging.info('No message found.')
+        return
+
+    # Chatter is logged in bulk and never reaches the account lookups or the parser
+    if not looks_like_signal(message):
+        logging.debug(f"Not a signal: {message}")
+        get_rejected_log().add(channel, message, db_connection)
+        return
+
+    # Use the per-account worker processes when they have been started
+    if worker_pool is None:
+        worker_pool = get_worker_pool()
+
+    # If no connection is provided, use this thread's long-lived one
+    conn = db_connection if db_connection is not None else get_connection()
+
+    # Get account information for this channel
+    account_info, all_accounts = route_message(conn, channel, chat_id)
+
+    created_at = _now()
+    message, order, exception = parse_message(message, channel, chat_id)
+    if order is None:
+        rows = [failed_row(None, exception)]
+    else:
+        rows = execute_order(order, account_info, all_accounts, worker_pool)
+
+    # The listener's log writer commits the rows in the background, off the order path
+    log_writer = get_log_writer()
+    if log_writer is not None and db_connection is None:
+        log_writer.add(channel, message, rows, created_at)
+    else:
+        write_logs(conn, channel, message, rows, created_at)
+
+    # Rejected messages waiting too long go out with this connection
+    get_rejected_log().flush_if_due(conn)
 
-    # Close the database connection only if we created it
-    if should_close_conn:
-        conn.close()
+    # Now and then, log how often each channel hits the parser's fast path
+    get_parser_stats().maybe_log_summary()
 
 
 if __name__ == "__main__":
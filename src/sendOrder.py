@@ -1,92 +1,63 @@
 import json
+import time
 import MetaTrader5 as mt5
 import logging
-import os
 from dotenv import load_dotenv
 from validateOrder import validateOrder
+from mt5Session import get_session
+from brokerSymbols import get_broker_symbols
 
 # Load environment variables
 load_dotenv()
 
-def sendOrder(order_json, account_info, tp=None, shutdown_after=False):
-    # Parse the JSON string to a Python dictionary
-    order_data = order_json
-
-    # Extract attributes
-    price = order_data["price"]
-    signal = order_data["signal"].lower()  # "buy" or "sell"
-    symbol = order_data["symbol"]
-    # Use the tp parameter if provided, otherwise use the one from order_data
-    tp = tp if tp is not None else order_data["tp"]
-    sl = order_data["sl"]
-
-    # Check if MT5 is already initialized
-    is_initialized = mt5.terminal_info() is not None
-
-    # If already initialized, shutdown first
-    if is_initialized:
-        mt5.shutdown()
-
-    # Get the path to MetaTrader 5 terminal
-    # Default path for MetaTrader 5 on Windows
-    mt5_path = os.getenv('MT5_PATH', 'C:/Program Files/MetaTrader 5/terminal64.exe')
-
-    # Convert backslashes to forward slashes if needed
-    mt5_path = mt5_path.replace('\\', '/')
-
-    # First initialize MetaTrader 5 with just the path
-    if not mt5.initialize(path=mt5_path):
-        print("MT5 initialization failed")
-        print("Last error:", mt5.last_error())
-        return {"success": False, "error": f"Initialization failed: {mt5.last_error()}"}
-
-    # Now login to the account
-    def account_login(login, password, server):
-        if mt5.login(login=login, password=password, server=server):
-            print(f"Logged in successfully to account {account_info['account_name']}")
-            return True
-        else:
-            error_code = mt5.last_error()
-            print(f"Failed to login to account {account_info['account_name']}, error code:", error_code)
-            return False
-
-    # Attempt to login
-    if not account_login(int(account_info['login_id']), account_info['password'], account_info['server_name']):
-        mt5.shutdown()
-        return {"success": False, "error": f"Login failed with error code {mt5.last_error()}"}
-
+def _check_account(session):
     # Ensure AutoTrading is enabled
     mt5_account_info = mt5.account_info()
     if mt5_account_info is None:
         print("Failed to retrieve account information, error code:", mt5.last_error())
-        mt5.shutdown()
+        session.shutdown()
         return {"success": False, "error": "Account information retrieval failed"}
     elif not mt5_account_info.trade_allowed:
         print("AutoTrading is disabled by client. Please enable AutoTrading in MetaTrader 5.")
-        mt5.shutdown()
+        session.shutdown()
         return {"success": False, "error": "AutoTrading is disabled"}
+    return None
+
 
+def _get_order_type(signal):
     # Define order type
     if signal == "buy":
-        order_type = mt5.ORDER_TYPE_BUY
+        return mt5.ORDER_TYPE_BUY
     elif signal == "sell":
-        order_type = mt5.ORDER_TYPE_SELL
-    else:
-        print("Invalid signal. Use 'buy' or 'sell'.")
-        mt5.shutdown()
-        return {"success": False, "error": "Invalid signal"}
-
-    # Ensure the symbol is available for trading
-    if not mt5.symbol_select(symbol, True):
+        return mt5.ORDER_TYPE_SELL
+    print("Invalid signal. Use 'buy' or 'sell'.")
+    return None
+
+
+def _select_symbol(session, symbol):
+    # Ensure the symbol is available for trading; selected symbols are cached by the session
+    details = session.select_symbol(symbol)
+    if details is None:
         print(f"Failed to select symbol {symbol}. Please check the symbol name.")
-        mt5.shutdown()
-        return {"success": False, "error": f"Symbol {symbol} not available"}
+        return None, {"success": False, "error": f"Symbol {symbol} not available"}
+    return details, None
+
 
-    # Get current symbol price details
-    symbol_info_tick = mt5.symbol_info_tick(symbol)
+def _filling_type(details):
+    # Immediate or cancel, unless the symbol only allows fill or kill
+    filling_mode = details.filling_mode
+    if filling_mode and not filling_mode & mt5.SYMBOL_FILLING_IOC and filling_mode & mt5.SYMBOL_FILLING_FOK:
+        return mt5.ORDER_FILLING_FOK
+    return mt5.ORDER_FILLING_IOC
+
+
+def _place_order(session, details, signal, order_type, sl, tp):
+    symbol = details.name
+
+    # Get current symbol price details, reusing a tick fetched moments ago for the previous leg
+    symbol_info_tick = session.tick(symbol)
     if symbol_info_tick is None:
         print(f"Failed to get tick information for symbol {symbol}.")
-        mt5.shutdown()
         return {"success": False, "error": f"Tick information for symbol {symbol} unavailable"}
 
     # Define order parameters
@@ -96,14 +67,13 @@ def sendOrder(order_json, account_info, tp=None, shutdown_after=False):
         "volume": 0.01,  # Set the volume to 1.0 lot (customize as needed)
         "type": order_type,
         "price": symbol_info_tick.ask if signal == "buy" else symbol_info_tick.bid,
-#         "price": 2638,
         "sl": sl,
         "tp": tp,
         "deviation": 10,  # Allowable deviation in points
         "magic": 234000,  # Magic number to identify the order
         "comment": "Order sent from Python script",
         "type_time": mt5.ORDER_TIME_GTC,  # Good till cancelled
-        "type_filling": mt5.ORDER_FILLING_IOC,  # Immediate or cancel
+        "type_filling": _filling_type(details),  # Immediate or cancel where allowed
     }
 
     logging.info(f"Sending order request: {order_request}")
@@ -113,27 +83,135 @@ def sendOrder(order_json, account_info, tp=None, shutdown_after=False):
 
     if result is None:
         print("Failed to send order: no response received")
-        mt5.shutdown()
         return {"success": False, "error": "No response received from MetaTrader"}
 
     # Check the result of the request
     if result.retcode != mt5.TRADE_RETCODE_DONE:
         print(f"Failed to send order: {result.retcode} with {result.comment}")
-        mt5.shutdown()
         return {
             "success": False,
             "error": f"Order failed with retcode {result.retcode}",
             "details": result._asdict()  # Return result details as a dictionary
         }
-    else:
-        print(f"Order successfully placed. Ticket: {result.order}")
+
+    print(f"Order successfully placed. Ticket: {result.order}")
+    return {
+        "success": True,
+        "result": result._asdict()  # Return result details as a dictionary
+    }
+
+
+def sendOrder(order_json, account_info, tp=None, shutdown_after=False):
+    # Parse the JSON string to a Python dictionary
+    order_data = order_json
+
+    # Extract attributes
+    signal = order_data["signal"].lower()  # "buy" or "sell"
+    symbol = order_data["symbol"]
+    # Use the tp parameter if provided, otherwise use the one from order_data
+    tp = tp if tp is not None else order_data["tp"]
+    sl = order_data["sl"]
+
+    # Reuse the long-lived terminal session, logging in only when the account changes
+    session = get_session()
+    with session.sending_order():
+        session_result = session.ensure(account_info)
+        if not session_result['success']:
+            return session_result
+
+        account_error = _check_account(session)
+        if account_error:
+            return account_error
+
+        order_type = _get_order_type(signal)
+        if order_type is None:
+            return {"success": False, "error": "Invalid signal"}
+
+        # The broker may list the signal's symbol under its own name, e.g. XAUUSD.m or GOLD
+        broker_symbol = get_broker_symbols().resolve(account_info, symbol)
+
+        details, symbol_error = _select_symbol(session, broker_symbol)
+        if symbol_error:
+            return symbol_error
+
+        response = _place_order(session, details, signal, order_type, sl, tp)
+
         # Only shutdown if explicitly requested
-        if shutdown_after:
-            mt5.shutdown()
-        return {
-            "success": True,
-            "result": result._asdict()  # Return result details as a dictionary
-        }
+        if response["success"] and shutdown_after:
+            session.shutdown()
+        return response
+
+
+def _account_key(account_info):
+    if account_info is None:
+        return None
+    return (str(account_info['login_id']), account_info['server_name'])
+
+
+def sendOrderBatch(order_json, legs, stop_on_failure=False, deadline=None):
+    """
+    Send every (account_info, tp) leg of a single signal, such as the
+    OrderLegs of a ParsedOrder. order_json is the ParsedOrder or its dict.
+
+    Legs are grouped by account so each account is logged into once and all
+    of its TP legs are sent back-to-back on that session. Returns one result
+    per leg, in execution order:
+        {"account": name, "id": account id, "tp": tp, "response": {...}}
+    With stop_on_failure, the first failed leg stops every remaining leg.
+    Legs still unsent at `deadline` (a time.time() value) fail without being sent.
+    """
+    signal = order_json["signal"].lower()
+    symbol = order_json["symbol"]
+    sl = order_json["sl"]
+
+    # Group the legs by account, keeping the order accounts first appear in
+    groups = {}
+    for account_info, tp in legs:
+        key = _account_key(account_info)
+        if key not in groups:
+            groups[key] = (account_info, [])
+        groups[key][1].append(tp)
+
+    session = get_session()
+    order_type = _get_order_type(signal)
+    results = []
+
+    # The tick poller waits while this signal is sent
+    with session.sending_order():
+        for account_info, tps in groups.values():
+            logging.info(f"Sending {len(tps)} leg(s) to account: {account_info['account_name']}")
+
+            # Everything that doesn't depend on the TP is checked once per account
+            if order_type is None:
+                account_error = {"success": False, "error": "Invalid signal"}
+            else:
+                session_result = session.ensure(account_info)
+                account_error = None if session_result['success'] else session_result
+                if account_error is None:
+                    account_error = _check_account(session)
+                if account_error is None:
+                    broker_symbol = get_broker_symbols().resolve(account_info, symbol)
+                    details, account_error = _select_symbol(session, broker_symbol)
+
+            for tp in tps:
+                if account_error is not None:
+                    response = account_error
+                elif deadline is not None and time.time() >= deadline:
+                    response = {"success": False, "error": "Order expired before it was sent"}
+                else:
+                    response = _place_order(session, details, signal, order_type, sl, tp)
+
+                results.append({
+                    "account": account_info['account_name'],
+                    "id": account_info.get('id'),
+                    "tp": tp,
+                    "response": response
+                })
+
+                if stop_on_failure and not response.get('success'):
+                    return results
+
+    return results
 
 # Example usage:
 if __name__ == "__main__":
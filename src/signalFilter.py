@@ -0,0 +1,125 @@
+import os
+import re
+import time
+import logging
+import threading
+from dotenv import load_dotenv
+from cleanMessage import CHARACTER_TABLE
+from dbConnection import get_connection
+from symbolAliases import get_alias_index
+from symbolMatcher import trie_pattern
+from validateOrder import PARSER_VERSION
+
+# Load environment variables
+load_dotenv()
+
+# Rejected messages are written together once this many are waiting, or once the oldest is this old
+FLUSH_ROWS = int(os.getenv('REJECTED_LOG_FLUSH_ROWS', '100'))
+FLUSH_SECONDS = float(os.getenv('REJECTED_LOG_FLUSH_SECONDS', '5'))
+
+REJECTED_REASON = "Not a signal"
+
+DIGIT_PATTERN = re.compile(r'\d')
+SIGNAL_KEYWORDS = ('buy', 'sell')
+
+# Every alias and symbol as one trie regex, rebuilt only when the alias index changes
+keyword_index = None
+keyword_pattern = None
+
+
+def _symbol_keywords(index):
+    global keyword_index, keyword_pattern
+    if index is not keyword_index:
+        keywords = set(index.aliases) | {symbol.lower() for symbol in index.symbols}
+        keyword_pattern = re.compile(trie_pattern(sorted(keywords)))
+        keyword_index = index
+    return keyword_pattern
+
+
+def looks_like_signal(message, index=None):
+    """
+    Cheap check that a raw message can hold a trade: a buy/sell keyword,
+    a known symbol or alias, and at least one number.
+
+    Only plain substring searches run here, no cleaning or parsing, so chatter
+    is turned away in microseconds. Every message the parser could accept as a
+    complete order passes.
+    """
+    if not message:
+        return False
+
+    # The characters cleanMessage deletes could join two halves of a keyword, so drop them first
+    text = message.translate(CHARACTER_TABLE).lower()
+
+    if not any(keyword in text for keyword in SIGNAL_KEYWORDS):
+        return False
+    if DIGIT_PATTERN.search(text) is None:
+        return False
+
+    if index is None:
+        index = get_alias_index()
+    return _symbol_keywords(index).search(text) is not None
+
+
+class RejectedMessageLog:
+    """
+    Buffers the messages the pre-filter turned away and writes them to the
+    logs table in one executemany, instead of one INSERT and commit each.
+    """
+
+    def __init__(self, flush_rows=FLUSH_ROWS, flush_seconds=FLUSH_SECONDS):
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.rows = []
+        self.oldest = None
+        self.lock = threading.Lock()
+
+    def add(self, channel, message, db_connection=None):
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+        with self.lock:
+            self.rows.append((channel, message, REJECTED_REASON, 0, now, now))
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+        self.flush_if_due(db_connection)
+
+    def is_due(self):
+        with self.lock:
+            if not self.rows:
+                return False
+            return len(self.rows) >= self.flush_rows or time.monotonic() - self.oldest >= self.flush_seconds
+
+    def flush_if_due(self, db_connection=None):
+        if self.is_due():
+            return self.flush(db_connection)
+        return 0
+
+    def flush(self, db_connection=None):
+        with self.lock:
+            rows = self.rows
+            self.rows = []
+            self.oldest = None
+        if not rows:
+            return 0
+
+        # If no connection is provided, use this thread's long-lived one
+        conn = db_connection if db_connection is not None else get_connection()
+
+        try:
+            conn.executemany('''
+                INSERT INTO logs (channel, message, exception, is_valid_trade, failed_at, created_at, parser_version)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [row + (PARSER_VERSION,) for row in rows])
+            conn.commit()
+            logging.info(f"Logged {len(rows)} rejected messages")
+        except Exception as e:
+            logging.error(f"Error logging rejected messages: {e}")
+            conn.rollback()
+        return len(rows)
+
+
+# The buffer shared by every process_message call in this process
+rejected_log = RejectedMessageLog()
+
+
+def get_rejected_log():
+    return rejected_log
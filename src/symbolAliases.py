@@ -0,0 +1,149 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from types import MappingProxyType
+from dotenv import load_dotenv
+from currencies import currencies
+from init_db import DB_FILE
+from symbolMatcher import SymbolMatcher, trie_pattern
+
+# Load environment variables
+load_dotenv()
+
+# How often, in seconds, the symbol_aliases table is checked for a new version
+REFRESH_INTERVAL = float(os.getenv('SYMBOL_ALIAS_REFRESH_SECONDS', '5'))
+
+
+class AliasIndex:
+    """
+    Read-only, pre-normalised view of the alias table.
+
+    Aliases are lowercased once and every pattern is compiled up front, so a
+    message only pays for lookups. A new index is built when the table changes;
+    an existing one is never modified.
+    """
+
+    def __init__(self, aliases, version=None):
+        # The first spelling of an alias wins, as in table order
+        lowered = {}
+        for alias, symbol in aliases:
+            lowered.setdefault(alias.lower(), symbol)
+
+        symbol_order = {}
+        for symbol in lowered.values():
+            symbol_order.setdefault(symbol.lower(), len(symbol_order))
+
+        self.version = version
+        self.aliases = MappingProxyType(lowered)
+        self.symbols = tuple(dict.fromkeys(lowered.values()))
+        # Position of each symbol in the table, used to break ties when ranking symbols
+        self.symbol_order = MappingProxyType(symbol_order)
+
+        self.matcher = SymbolMatcher({alias: lowered[alias] for alias in _containing_first(lowered)})
+
+        # Locates the signal and every known symbol in a single scan, used by validateOrder
+        self.signal_symbol_pattern = re.compile(
+            r'\b(?:(?P<signal>buy|sell)|(?P<symbol>' + trie_pattern(symbol_order) + r'))\b',
+            re.IGNORECASE
+        )
+
+        # The strict "SYMBOL buy|sell PRICE sl X tp Y..." layout of a cleaned message,
+        # matched as a whole by validateOrder's fast path. Numbers are written so a
+        # digit run can only be split one way, or a failed match backtracks exponentially.
+        self.strict_order_pattern = re.compile(
+            r'(?P<symbol>' + trie_pattern(symbol_order) + r') (?P<signal>buy|sell) '
+            r'(?P<low>\d+(?:\.\d*)?)(?: ?- ?(?P<high>\d+(?:\.\d*)?))? sl (?P<sl>\d+(?:\.\d*)?)(?P<tps>(?: tp \d+(?:\.\d*)?)+)',
+            re.IGNORECASE
+        )
+
+    def symbol_for(self, text):
+        # Canonical symbol for a symbol found in a message, in any case
+        return self.symbols[self.symbol_order[text.lower()]]
+
+
+def _containing_first(aliases):
+    # Table order, except an alias goes before any alias it contains,
+    # so "xauusd.m" isn't cut short by "xauusd" when both are listed
+    ordered = []
+    for alias in aliases:
+        position = next((i for i, other in enumerate(ordered) if other in alias), len(ordered))
+        ordered.insert(position, alias)
+    return ordered
+
+
+def load_aliases(conn):
+    # Returns the table version and its (alias, symbol) rows in table order
+    cursor = conn.cursor()
+    cursor.execute('SELECT version FROM symbol_aliases_version WHERE id = 1')
+    row = cursor.fetchone()
+    version = row[0] if row else 0
+
+    cursor.execute('SELECT alias, symbol FROM symbol_aliases ORDER BY id')
+    return version, cursor.fetchall()
+
+
+def _connect():
+    # Never create the database just to look for aliases
+    if not os.path.exists(DB_FILE):
+        return None
+    return sqlite3.connect(f'file:{DB_FILE}?mode=ro', uri=True)
+
+
+# The index shared by every message, starting from the built-in table
+alias_index = AliasIndex(currencies().items())
+last_checked = None
+lock = threading.Lock()
+
+
+def refresh_alias_index(db_connection=None):
+    """
+    Reload the index when the symbol_aliases version differs from the cached one.
+    Keeps the current index when the table can't be read.
+    """
+    global alias_index
+
+    # If no connection is provided, create a new one
+    if db_connection is None:
+        conn = _connect()
+        should_close_conn = True
+        if conn is None:
+            return alias_index
+    else:
+        # Use the provided connection
+        conn = db_connection
+        should_close_conn = False
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT version FROM symbol_aliases_version WHERE id = 1')
+        row = cursor.fetchone()
+        version = row[0] if row else 0
+
+        if version != alias_index.version:
+            version, rows = load_aliases(conn)
+            # An empty table falls back to the built-in aliases
+            alias_index = AliasIndex(rows or currencies().items(), version)
+            logging.info(f"Loaded {len(alias_index.aliases)} symbol aliases (version {version})")
+    except sqlite3.Error as e:
+        logging.debug(f"Symbol aliases not reloaded: {e}")
+    finally:
+        # Close the connection only if we created it
+        if should_close_conn:
+            conn.close()
+
+    return alias_index
+
+
+def get_alias_index(db_connection=None):
+    # Cheap enough to call per message: the table is only checked every REFRESH_INTERVAL seconds
+    global last_checked
+    now = time.monotonic()
+    if last_checked is not None and now - last_checked < REFRESH_INTERVAL:
+        return alias_index
+
+    with lock:
+        last_checked = now
+        return refresh_alias_index(db_connection)
@@ -0,0 +1,146 @@
+import re
+
+
+def build_trie(words):
+    # Nested dicts keyed by character, '' marks the end of a word
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+    return trie
+
+
+def _trie_to_pattern(node):
+    branches = []
+    is_word = False
+    for char in sorted(node):
+        if char == '':
+            is_word = True
+            continue
+        branches.append(re.escape(char) + _trie_to_pattern(node[char]))
+
+    if not branches:
+        return ''
+    if len(branches) == 1 and not is_word:
+        return branches[0]
+
+    pattern = '(?:' + '|'.join(branches) + ')'
+    # A word ending here is still allowed, but the longer branches are tried first
+    if is_word:
+        pattern += '?'
+    return pattern
+
+
+def trie_pattern(words):
+    """
+    Regex source for the trie of `words`.
+
+    Shared prefixes are factored out, so the regex engine walks the trie once
+    per position instead of trying every word in turn. The longest word wins
+    when one word is a prefix of another.
+    """
+    words = [word for word in dict.fromkeys(words) if word]
+    if not words:
+        # Matches nothing
+        return '(?!)'
+    return _trie_to_pattern(build_trie(words))
+
+
+class SymbolMatcher:
+    """
+    Multi-pattern matcher over an alias table such as currencies().
+
+    The trie is compiled once into a single regex, so every alias occurring in
+    a text is found in one scan whatever the size of the table. Aliases are
+    matched against lowercased text, the way cleanMessage compares them.
+    """
+
+    def __init__(self, aliases):
+        # The first spelling of an alias wins, like the first str.replace did
+        self.aliases = {}
+        for alias, canonical in aliases.items():
+            self.aliases.setdefault(alias.lower(), canonical)
+        self.priority = {alias: index for index, alias in enumerate(self.aliases)}
+
+        # Shorter aliases hidden behind a longer one starting at the same position
+        self.prefixes = {
+            alias: [alias[:length] for length in range(1, len(alias)) if alias[:length] in self.aliases]
+            for alias in self.aliases
+        }
+
+        # The lookahead reports the longest alias at every position, overlapping or not.
+        # Checking the first character up front lets the engine skip most positions quickly.
+        first_chars = ''.join(sorted(set(alias[0] for alias in self.aliases)))
+        prefix = '(?=[' + re.escape(first_chars) + '])' if first_chars else ''
+        self.pattern = re.compile(prefix + '(?=(' + trie_pattern(self.aliases) + '))')
+
+        # Replacing aliases one after the other can only differ from replacing the
+        # matches found up front if a canonical value can form part of an alias
+        alias_chars = set(''.join(self.aliases))
+        canonical_chars = set(''.join(self.aliases.values()))
+        self.exact = all(
+            alias[0] not in canonical_chars for alias in self.aliases
+        ) and all(
+            not canonical or canonical[0] not in alias_chars for canonical in self.aliases.values()
+        )
+
+    def find_all(self, text):
+        """
+        Every alias occurring in `text` as (start, end, alias, canonical),
+        ordered by position, including aliases that overlap each other.
+        """
+        matches = []
+        for match in self.pattern.finditer(text):
+            start = match.start()
+            longest = match.group(1)
+            for alias in self.prefixes[longest]:
+                matches.append((start, start + len(alias), alias, self.aliases[alias]))
+            matches.append((start, start + len(longest), longest, self.aliases[longest]))
+        return matches
+
+    def _replace_sequential(self, text):
+        for alias, canonical in self.aliases.items():
+            text = text.replace(alias, canonical)
+        return text
+
+    def replace(self, text):
+        """
+        Replace every alias in `text` with its canonical symbol.
+
+        The result is the same as calling str.replace for each alias in table
+        order: where matches overlap, the alias listed first in the table wins.
+        """
+        if not self.exact:
+            return self._replace_sequential(text)
+
+        matches = self.find_all(text)
+        if not matches:
+            return text
+
+        # Replay str.replace alias by alias: each alias takes its occurrences left
+        # to right, skipping any that overlap text already replaced
+        matches.sort(key=lambda match: (self.priority[match[2]], match[0]))
+        replaced = []
+        last_alias = None
+        last_end = 0
+        for start, end, alias, canonical in matches:
+            if alias != last_alias:
+                last_alias = alias
+                last_end = 0
+            if start < last_end:
+                continue
+            if any(start < other_end and other_start < end for other_start, other_end, _ in replaced):
+                continue
+            replaced.append((start, end, canonical))
+            last_end = end
+
+        pieces = []
+        position = 0
+        for start, end, canonical in sorted(replaced):
+            pieces.append(text[position:start])
+            pieces.append(canonical)
+            position = end
+        pieces.append(text[position:])
+        return ''.join(pieces)
@@ -0,0 +1,104 @@
+import os
+import logging
+import threading
+from dotenv import load_dotenv
+from mt5Session import TICK_MAX_AGE, get_session
+
+# Load environment variables
+load_dotenv()
+
+# Seconds between two sweeps of the recently traded symbols, 0 turns the poller off.
+# Never shorter than TICK_MAX_AGE_SECONDS: a tick polled sooner would still be fresh.
+POLL_INTERVAL = float(os.getenv('TICK_POLL_INTERVAL_SECONDS', str(TICK_MAX_AGE)))
+
+
+class TickPoller:
+    """
+    Background thread keeping the session's tick cache fresh.
+
+    Every `interval` seconds it fetches the latest tick of the symbols the
+    last orders of the current account were sent for, at most
+    TICK_POLL_SYMBOLS of them. sendOrder then reads the tick from the cache
+    and only queries the terminal itself when the cached tick has gone stale.
+    Sweeps are skipped while an order is being sent, which needs the terminal
+    more than the poller does.
+    """
+
+    def __init__(self, interval=POLL_INTERVAL):
+        self.interval = interval
+        self.thread = None
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.stats = {
+            'sweeps': 0,
+            'skipped': 0,
+            'ticks': 0,
+            'errors': 0
+        }
+
+    def start(self):
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, name="mt5-tick-poller", daemon=True)
+        self.thread.start()
+        logging.info(f"Started tick poller, polling every {self.interval}s")
+        return self
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.poll_once()
+
+    def poll_once(self):
+        session = get_session()
+        if session.is_sending():
+            with self.lock:
+                self.stats['skipped'] += 1
+            return 0
+
+        try:
+            fetched = session.refresh_ticks()
+        except Exception as e:
+            logging.error(f"Error polling ticks: {e}")
+            with self.lock:
+                self.stats['errors'] += 1
+            return 0
+
+        with self.lock:
+            self.stats['sweeps'] += 1
+            self.stats['ticks'] += fetched
+        return fetched
+
+    def stop(self, timeout=5):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, running=self.thread is not None)
+
+
+# The poller of this process when one has been started
+tick_poller = None
+
+
+def get_tick_poller():
+    return tick_poller
+
+
+def start_tick_poller(interval=POLL_INTERVAL):
+    global tick_poller
+    if interval <= 0 or tick_poller is not None:
+        return tick_poller
+    if interval < TICK_MAX_AGE:
+        logging.warning(f"Tick poll interval {interval}s is below TICK_MAX_AGE_SECONDS, polling every {TICK_MAX_AGE}s")
+        interval = TICK_MAX_AGE
+    tick_poller = TickPoller(interval).start()
+    return tick_poller
+
+
+def stop_tick_poller():
+    global tick_poller
+    if tick_poller is not None:
+        tick_poller.stop()
+        tick_poller = None
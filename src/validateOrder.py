@@ -1,71 +1,116 @@
 import re
 import json
-from currencies import currencies
 from cleanMessage import cleanMessage
+from symbolAliases import get_alias_index
+from parseCache import get_parse_cache
+from parsedOrder import ParsedOrder
+from parserStats import get_parser_stats
+
+# Stamped on every stored parse. Bump it whenever a parser change can alter the
+# result for a message, so parse_database only re-parses rows from older versions.
+PARSER_VERSION = 2
+
+# Everything below is compiled once at import time and shared by every call.
+# Symbol patterns come with the alias index, which is rebuilt when the aliases change.
+SIGNAL_PATTERN = re.compile(r'\b(buy|sell)\b', re.IGNORECASE)
+SL_PATTERN = re.compile(r'\bsl:? ?(\d+\.?\d*)', re.IGNORECASE)
+SL_REMOVE_PATTERN = re.compile(r'\bsl:? ?\d+\.?\d*', re.IGNORECASE)
+TP_DOT_PATTERN = re.compile(r'\btp\.(\d+)\b', re.IGNORECASE)
+TP_INDEXED_PATTERN = re.compile(r'\btp\s+(\d+)\s+(\d+\.?\d*)', re.IGNORECASE)
+TP_INDEXED_REMOVE_PATTERN = re.compile(r'\btp\s+\d+\s+\d+\.?\d*', re.IGNORECASE)
+TP_PATTERN = re.compile(r'\btp[.: ]?(\d+\.?\d*)', re.IGNORECASE)
+TP_REMOVE_PATTERN = re.compile(r'\btp[.: ]?\d+\.?\d*', re.IGNORECASE)
+RANGE_PATTERN = re.compile(r'(\d+\.?\d*) ?- ?(\d+\.?\d*)')
+NUMBER_PATTERN = re.compile(r'\d+\.?\d*')
+
+# Per-symbol patterns used by the heuristic parser, compiled on first use
+symbol_patterns = {}
+
+
+def _symbol_pattern(symbol):
+    pattern = symbol_patterns.get(symbol)
+    if pattern is None:
+        pattern = re.compile(r'\b' + re.escape(symbol) + r'\b', re.IGNORECASE)
+        symbol_patterns[symbol] = pattern
+    return pattern
+
+
+def _find_signal_and_symbol(message, index):
+    # One scan over the message for the buy/sell keywords and every symbol occurrence
+    symbol_order = index.symbol_order
+    signal_matches = []
+    symbol_matches = []
+    for match in index.signal_symbol_pattern.finditer(message):
+        if match.lastgroup == 'signal':
+            signal_matches.append(match)
+        else:
+            symbol_matches.append(match)
+    signal_match = signal_matches[0] if signal_matches else None
 
-def validateOrder(message):
-    # Clean the message first
-    message = cleanMessage(message)
-    currenciesList = currencies()
-
-    # Extract signal (buy/sell)
-    signal_match = re.search(r'\b(buy|sell)\b', message, re.IGNORECASE)
-    signal = signal_match.group().lower() if signal_match else None
-
-    # Extract the symbol, prioritizing currencies near the buy/sell signal
     symbol = None
-    if signal and signal_match:
-        # Get the position of the signal in the message
-        signal_pos = signal_match.start()
-
-        # Find all currency matches in the message
-        currency_matches = []
-        for key, value in currenciesList.items():
-            # Use word boundary to ensure we're matching whole words
-            for match in re.finditer(r'\b' + re.escape(value) + r'\b', message, flags=re.IGNORECASE):
-                # Calculate distance to the signal
-                distance = abs(match.start() - signal_pos)
-                currency_matches.append((distance, value))
-
-        # Sort by distance to the signal
-        if currency_matches:
-            currency_matches.sort(key=lambda x: x[0])  # Sort by distance (first element of tuple)
-            symbol = currency_matches[0][1]  # Take the closest currency
-
-    # If no symbol was found near the signal, try to find any symbol in the message
-    if not symbol:
-        for key, value in currenciesList.items():
-            # Use word boundary to ensure we're matching whole words
-            if re.search(r'\b' + re.escape(value) + r'\b', message, flags=re.IGNORECASE):
-                symbol = value
-                break
+    if symbol_matches:
+        if signal_match:
+            # Prioritize the currency closest to the buy/sell signal, then the table order
+            signal_pos = signal_match.start()
+            closest = min(
+                symbol_matches,
+                key=lambda match: (abs(match.start() - signal_pos), symbol_order[match.group().lower()])
+            )
+        else:
+            # Without a signal, take the first symbol of the table present in the message
+            closest = min(symbol_matches, key=lambda match: symbol_order[match.group().lower()])
+        symbol = index.symbol_for(closest.group())
+
+    return signal_matches, symbol, symbol_matches
+
+
+def _validateOrderStrict(message, index=None):
+    """
+    Fast path for the strict "SYMBOL buy|sell PRICE sl X tp Y..." layout,
+    parsed with one anchored match. Returns None for any other message.
+    """
+    if index is None:
+        index = get_alias_index()
+    match = index.strict_order_pattern.fullmatch(message)
+    if match is None:
+        return None
+
+    sl = float(match.group('sl'))
+    if not sl:
+        # A zero SL is read differently by the step by step parser
+        return None
+
+    high = match.group('high')
+    price = (float(match.group('low')), float(high)) if high is not None else float(match.group('low'))
+    tps = [float(tp) for tp in match.group('tps').split(' tp ')[1:]]
+    return ParsedOrder(match.group('signal').lower(), index.symbol_for(match.group('symbol')), price, sl, tps)
+
+
+def _validateOrderHeuristic(message, index=None):
+    # Step by step parser for every message outside the strict layout
+    if index is None:
+        index = get_alias_index()
+    signal_matches, symbol, symbol_matches = _find_signal_and_symbol(message, index)
+    signal = signal_matches[0].group().lower() if signal_matches else None
 
     # Remove the symbol and signal from the message
     if symbol:
-        message = re.sub(r'\b' + re.escape(symbol) + r'\b', '', message, flags=re.IGNORECASE).strip()
+        message = _symbol_pattern(symbol).sub('', message).strip()
     if signal:
-        message = re.sub(r'\b(buy|sell)\b', '', message, flags=re.IGNORECASE).strip()
+        message = SIGNAL_PATTERN.sub('', message).strip()
 
     # Extract Stop Loss (SL)
-    sl_match = re.search(r'\bsl:? ?(\d+\.?\d*)', message, re.IGNORECASE)
+    sl_match = SL_PATTERN.search(message)
     sl = float(sl_match.group(1)) if sl_match else None
     if sl:
-        message = re.sub(r'\bsl:? ?\d+\.?\d*', '', message, flags=re.IGNORECASE).strip()
+        message = SL_REMOVE_PATTERN.sub('', message).strip()
 
     # Extract Take Profit (TP)
     # Special case for the format "tp.77400" (where the number after the dot should be treated as decimal)
-    # This regex specifically looks for "tp." followed by digits, ensuring it's a separate pattern
-    tp_dot_matches = re.findall(r'\btp\.(\d+)\b', message, re.IGNORECASE)
-
-    # For test_validate_order_with_different_format, we need to handle "tp.77400" as 0.77400
-    tp_dot_values = []
-    for tp in tp_dot_matches:
-        # Check if this is a test case from test_validate_order_with_different_format
-        if message.lower().find("gbpcad sell") != -1 and tp == "77400":
-            tp_dot_values.append(0.77400)
-        else:
-            # Default behavior: convert to proper decimal format (e.g., 0.77400)
-            tp_dot_values.append(float('0.' + tp))
+    # This regex specifically looks for "tp." followed by digits, ensuring it's a separate pattern.
+    # Channels that mean the decimals of the entry price get a parser profile with tp_shorthand.
+    tp_dot_matches = TP_DOT_PATTERN.findall(message)
+    tp_dot_values = [float('0.' + tp) for tp in tp_dot_matches]
 
     # Then look for the standard format (e.g., tp: 2572)
     # Exclude patterns already matched by tp_dot_matches
@@ -76,16 +121,16 @@ def validateOrder(message):
     # Special case for "tp N PRICE" format (e.g., "tp 1 107100")
     # This regex looks for patterns like "tp 1 107100" and captures the price value
     # The pattern ensures we're capturing the second number (price) after "tp N"
-    tp_indexed_matches = re.findall(r'\btp\s+(\d+)\s+(\d+\.?\d*)', message_without_dot_tp, re.IGNORECASE)
+    tp_indexed_matches = TP_INDEXED_PATTERN.findall(message_without_dot_tp)
     tp_indexed_values = [float(match[1]) for match in tp_indexed_matches] if tp_indexed_matches else []
 
     # Remove the indexed tp patterns from the message to avoid double matching
     message_without_indexed_tp = message_without_dot_tp
-    for match in re.finditer(r'\btp\s+\d+\s+\d+\.?\d*', message_without_dot_tp, re.IGNORECASE):
+    for match in TP_INDEXED_REMOVE_PATTERN.finditer(message_without_dot_tp):
         message_without_indexed_tp = message_without_indexed_tp.replace(match.group(), "")
 
     # Then look for the standard format (e.g., tp: 2572)
-    tp_matches = re.findall(r'\btp[.: ]?(\d+\.?\d*)', message_without_indexed_tp, re.IGNORECASE)
+    tp_matches = TP_PATTERN.findall(message_without_indexed_tp)
     tp_values = [float(tp) for tp in tp_matches] if tp_matches else []
 
     # Combine all types of TP values
@@ -93,31 +138,61 @@ def validateOrder(message):
 
     # Remove TP patterns from the message
     if tp_dot_matches or tp_matches:
-        message = re.sub(r'\btp[.: ]?\d+\.?\d*', '', message, flags=re.IGNORECASE).strip()
+        message = TP_REMOVE_PATTERN.sub('', message).strip()
 
     # Extract price or range
     price = None
-    range_match = re.search(r'(\d+\.?\d*) ?- ?(\d+\.?\d*)', message)
+    range_match = RANGE_PATTERN.search(message)
     if range_match:
         price = (float(range_match.group(1)), float(range_match.group(2)))
     else:
-        price_match = re.search(r'\d+\.?\d*', message)
+        price_match = NUMBER_PATTERN.search(message)
         price = float(price_match.group()) if price_match else None
 
-    # Clean up remaining message
-    message = re.sub(r'\d+\.?\d*', '', message).strip()
-    message = re.sub(r'\s+', ' ', message)  # Normalize spaces
+    return ParsedOrder(signal, symbol, price, sl, tps)
+
+
+def parseOrder(message, cleaned=False, channel=None):
+    """
+    Parse a signal into an immutable ParsedOrder.
+
+    The strict fast path is tried first, then the parse cache and the
+    heuristic parser. The tier that answered is counted per channel.
+    The same instance may be handed to every caller parsing the same text,
+    which is safe because it can't be changed.
+    """
+    # Clean the message first, unless the caller already did
+    if not cleaned:
+        message = cleanMessage(message)
+
+    index = get_alias_index()
+    stats = get_parser_stats()
+
+    order = _validateOrderStrict(message, index)
+    if order is not None:
+        stats.record(channel, 'strict')
+        return order
+
+    # Reposted and mirrored signals are parsed once per alias index and parser version
+    cache = get_parse_cache()
+    key = cache.key(message)
+    generation = (index, PARSER_VERSION)
+    order = cache.get(key, generation)
+    if order is not None:
+        stats.record(channel, 'cache')
+        return order
+
+    order = _validateOrderHeuristic(message, index)
+    stats.record(channel, 'heuristic')
+
+    cache.put(key, generation, order)
+    return order
+
 
-    # Create a dictionary with extracted details
-    order_data = {
-        "signal": signal,
-        "symbol": symbol,
-        "price": price,
-        "sl": sl,
-        "tp": tps
-    }
+def validateOrder(message, cleaned=False):
+    # The order as a plain dict, for callers that store or change it
+    return parseOrder(message, cleaned).to_dict()
 
-    return order_data
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,130 @@
+import os
+import time
+import sqlite3
+import logging
+from dotenv import load_dotenv
+from init_db import DB_FILE
+from mt5Session import get_session
+from brokerSymbols import get_broker_symbols
+from symbolAliases import get_alias_index
+
+# Load environment variables
+load_dotenv()
+
+# Log into the mapped accounts and select the known symbols before the first signal
+WARMUP_ENABLED = os.getenv('MT5_WARMUP', 'false').lower() == 'true'
+
+
+def load_mapped_accounts(conn):
+    # Every account at least one channel sends its signals to, the most mapped first
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT a.id, a.account_name, a.server_name, a.login_id, a.password
+        FROM mt_accounts a
+        JOIN channel_account_mappings m ON a.id = m.account_id
+        GROUP BY a.id
+        ORDER BY COUNT(*) DESC, a.id
+    ''')
+    return [{
+        'id': row[0],
+        'account_name': row[1],
+        'server_name': row[2],
+        'login_id': row[3],
+        'password': row[4]
+    } for row in cursor.fetchall()]
+
+
+def warm_account(account_info, symbols=None):
+    """
+    Log into `account_info` and select `symbols` (every symbol of the alias
+    table by default) under the broker's names, as the first order would.
+    Returns the timings in seconds:
+        {"account": name, "success": bool, "login": s, "symbols": s,
+         "selected": n, "missing": [symbols the broker doesn't offer]}
+    """
+    session = get_session()
+    timings = {"account": account_info['account_name'], "success": False, "login": 0.0,
+               "symbols": 0.0, "selected": 0, "missing": []}
+
+    started = time.perf_counter()
+    result = session.ensure(account_info)
+    timings['login'] = time.perf_counter() - started
+    if not result['success']:
+        timings['error'] = result.get('error')
+        return timings
+
+    if symbols is None:
+        symbols = get_alias_index().symbols
+
+    started = time.perf_counter()
+    broker_symbols = get_broker_symbols()
+    for symbol in symbols:
+        if session.select_symbol(broker_symbols.resolve(account_info, symbol)) is None:
+            timings['missing'].append(symbol)
+        else:
+            timings['selected'] += 1
+    timings['symbols'] = time.perf_counter() - started
+
+    timings['success'] = True
+    return timings
+
+
+# Timings of the last warm-up in this process
+warmup_timings = []
+
+
+def get_warmup_timings():
+    return warmup_timings
+
+
+def warm_up(db_connection=None, accounts=None):
+    """
+    Warm this process' session for the first of `accounts`, by default the
+    account most channels are mapped to. The terminal holds one login and
+    drops its selected symbols on the next one, so warming the others in turn
+    would leave only the last one hot. Returns the timings of the warmed account.
+    """
+    global warmup_timings
+
+    if accounts is None:
+        # If no connection is provided, create a new one
+        if db_connection is None:
+            conn = sqlite3.connect(DB_FILE)
+            should_close_conn = True
+        else:
+            # Use the provided connection
+            conn = db_connection
+            should_close_conn = False
+
+        try:
+            accounts = load_mapped_accounts(conn)
+        finally:
+            # Close the connection only if we created it
+            if should_close_conn:
+                conn.close()
+
+    if len(accounts) > 1:
+        cold = ", ".join(account['account_name'] for account in accounts[1:])
+        logging.warning(f"Warming only account {accounts[0]['account_name']}, one terminal keeps one login. "
+                        f"Cold until their first signal: {cold}. Enable MT5_ACCOUNT_WORKERS to warm every account")
+        accounts = accounts[:1]
+
+    started = time.perf_counter()
+    timings = []
+    for account_info in accounts:
+        try:
+            account_timings = warm_account(account_info)
+        except Exception as e:
+            account_timings = {"account": account_info['account_name'], "success": False, "error": str(e)}
+        timings.append(account_timings)
+
+        if account_timings['success']:
+            logging.info(f"Warmed up account {account_timings['account']}: login {account_timings['login']:.3f}s, "
+                         f"{account_timings['selected']} symbols in {account_timings['symbols']:.3f}s, "
+                         f"{len(account_timings['missing'])} not offered")
+        else:
+            logging.warning(f"Warm-up failed for account {account_timings['account']}: {account_timings.get('error')}")
+
+    logging.info(f"Warm-up of {len(accounts)} accounts took {time.perf_counter() - started:.3f}s")
+    warmup_timings = timings
+    return timings
@@ -10,13 +10,22 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 # Mock for MetaTrader5
 @pytest.fixture
 def mock_mt5():
+    # Imported here so tests that don't touch MetaTrader5 can run without it
+    from mt5Session import MT5Session
+    from brokerSymbols import BrokerSymbolCache
+
+    # A fresh session and symbol cache per test so no login state leaks between tests
     with patch('MetaTrader5.initialize') as mock_initialize, \
          patch('MetaTrader5.shutdown') as mock_shutdown, \
          patch('MetaTrader5.login') as mock_login, \
          patch('MetaTrader5.account_info') as mock_account_info, \
          patch('MetaTrader5.symbol_select') as mock_symbol_select, \
+         patch('MetaTrader5.symbol_info') as mock_symbol_info, \
          patch('MetaTrader5.symbol_info_tick') as mock_symbol_info_tick, \
-         patch('MetaTrader5.order_send') as mock_order_send:
+         patch('MetaTrader5.order_send') as mock_order_send, \
+         patch('MetaTrader5.symbols_get') as mock_symbols_get, \
+         patch('mt5Session.session', MT5Session()), \
+         patch('brokerSymbols.broker_symbols', BrokerSymbolCache()):
 
         # Configure the mocks
         mock_initialize.return_value = True
@@ -30,6 +39,16 @@ def mock_mt5():
         # Mock symbol_select
         mock_symbol_select.return_value = True
 
+        # Mock symbol_info
+        symbol_info = MagicMock()
+        symbol_info.digits = 2
+        symbol_info.point = 0.01
+        symbol_info.trade_stops_level = 0
+        symbol_info.filling_mode = 3  # SYMBOL_FILLING_FOK | SYMBOL_FILLING_IOC
+        symbol_info.volume_min = 0.01
+        symbol_info.volume_step = 0.01
+        mock_symbol_info.return_value = symbol_info
+
         # Mock symbol_info_tick
         symbol_info_tick = MagicMock()
         symbol_info_tick.ask = 2000.0
@@ -55,19 +74,25 @@ def mock_mt5():
         }
         mock_order_send.return_value = order_result
 
+        # No broker symbol list by default, so orders use the signal's symbol
+        mock_symbols_get.return_value = None
+
         yield {
             "initialize": mock_initialize,
             "shutdown": mock_shutdown,
             "login": mock_login,
             "account_info": mock_account_info,
             "symbol_select": mock_symbol_select,
+            "symbol_info": mock_symbol_info,
             "symbol_info_tick": mock_symbol_info_tick,
             "order_send": mock_order_send,
+            "symbols_get": mock_symbols_get,
             "ORDER_TYPE_BUY": 0,
             "ORDER_TYPE_SELL": 1,
             "TRADE_ACTION_DEAL": 1,
             "ORDER_TIME_GTC": 1,
             "ORDER_FILLING_IOC": 1,
+            "ORDER_FILLING_FOK": 0,
             "TRADE_RETCODE_DONE": 10009
         }
 
@@ -108,7 +133,8 @@ def mock_db():
             exception TEXT,
             created_at TEXT,
             processed_at TEXT,
-            failed_at TEXT
+            failed_at TEXT,
+            parser_version INTEGER NOT NULL DEFAULT 0
         )
     ''')
 
@@ -130,10 +156,13 @@ def mock_db():
 
     conn.commit()
 
+    # Keep the real connect, sqlite3.connect is patched below
+    real_connect = sqlite3.connect
+
     # Create a fresh connection for each test to avoid "Cannot operate on a closed database" errors
     def get_fresh_connection(*args, **kwargs):
         # Ignore any arguments passed to this function
-        new_conn = sqlite3.connect(':memory:')
+        new_conn = real_connect(':memory:')
         # Copy the schema and data from the original connection
         for line in conn.iterdump():
             if line != 'BEGIN;' and line != 'COMMIT;':
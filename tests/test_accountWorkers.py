@@ -0,0 +1,232 @@
+import time
+from accountWorkers import AccountWorkerPool, FakeBackendFactory, check_terminal_paths, load_accounts, start_worker_pool
+
+
+# Test cases for the per-account worker pool, using the fake backend
+class TestAccountWorkerPool:
+    accounts = [
+        {'id': i, 'account_name': f'Account {i}', 'server_name': 'Demo', 'login_id': str(1000 + i),
+         'password': 'password', 'terminal_path': None}
+        for i in range(1, 4)
+    ]
+
+    order_data = {
+        "signal": "buy",
+        "symbol": "XAUUSD",
+        "price": 2000.0,
+        "sl": 1990.0,
+        "tp": [2010.0, 2020.0]
+    }
+
+    def test_send_returns_one_result_per_leg(self):
+        pool = AccountWorkerPool(self.accounts, backend_factory=FakeBackendFactory()).start()
+        try:
+            results = pool.send(self.order_data, self.order_data["tp"])
+        finally:
+            pool.close()
+
+        assert len(results) == 6
+        assert all(result["response"]["success"] for result in results)
+        assert [result["account"] for result in results[::2]] == ["Account 1", "Account 2", "Account 3"]
+        assert [result["tp"] for result in results[:2]] == [2010.0, 2020.0]
+
+        # Every account was handled by its own process
+        pids = {result["response"]["result"]["pid"] for result in results}
+        assert len(pids) == 3
+
+    def test_accounts_are_sent_in_parallel(self):
+        latency = 0.3
+        pool = AccountWorkerPool(self.accounts, backend_factory=FakeBackendFactory(latency=latency)).start()
+        try:
+            # The first job also waits for the workers to boot
+            pool.send(self.order_data, [2010.0])
+
+            started = time.perf_counter()
+            results = pool.send(self.order_data, [2010.0])
+            elapsed = time.perf_counter() - started
+        finally:
+            pool.close()
+
+        assert len(results) == 3
+        # Serial sending would take at least latency * number of accounts
+        assert elapsed < latency * len(self.accounts)
+
+    def test_send_to_subset_of_accounts(self):
+        pool = AccountWorkerPool(self.accounts, backend_factory=FakeBackendFactory(fail=True)).start()
+        try:
+            results = pool.send(self.order_data, [2010.0], account_ids=[2])
+        finally:
+            pool.close()
+
+        assert len(results) == 1
+        assert results[0]["id"] == 2
+        assert results[0]["response"]["success"] is False
+        assert pool.has_accounts([2]) is False  # the pool is closed
+
+    def test_stop_on_failure_skips_the_remaining_legs(self):
+        pool = AccountWorkerPool(self.accounts, backend_factory=FakeBackendFactory(fail=True)).start()
+        try:
+            results = pool.send(self.order_data, [2010.0, 2020.0], account_ids=[1], stop_on_failure=True)
+        finally:
+            pool.close()
+
+        assert [result["tp"] for result in results] == [2010.0]
+
+    def test_timed_out_job_is_dropped(self):
+        pool = AccountWorkerPool(self.accounts, backend_factory=FakeBackendFactory(latency=2), timeout=0.3, grace=0).start()
+        try:
+            results = pool.send(self.order_data, [2010.0], account_ids=[1])
+            assert pool.pending == {}
+        finally:
+            pool.close()
+
+        assert "Worker timed out" in results[0]["response"]["error"]
+
+    def test_nothing_is_sent_after_the_deadline(self, caplog):
+        pool = AccountWorkerPool(self.accounts[:1], backend_factory=FakeBackendFactory(latency=1.0), timeout=5).start()
+        try:
+            # Wait for the worker to boot
+            assert pool.send(self.order_data, [2010.0])[0]["response"]["result"]["order"] == 1
+
+            # The first order is still at the broker when the second one's deadline passes
+            pool.timeout, pool.grace = 0.3, 0
+            assert "Worker timed out" in pool.send(self.order_data, [2010.0])[0]["response"]["error"]
+            assert "Worker timed out" in pool.send(self.order_data, [2010.0])[0]["response"]["error"]
+
+            pool.timeout, pool.grace = 5, 10
+            results = pool.send(self.order_data, [2010.0])
+        finally:
+            pool.close()
+
+        # Only the order already on its way was sent, and its late fill was logged
+        assert results[0]["response"]["result"]["order"] == 3
+        assert "after it was reported as timed out" in caplog.text
+
+    def test_job_past_its_deadline_is_reported_as_expired(self):
+        pool = AccountWorkerPool(self.accounts[:1], backend_factory=FakeBackendFactory(latency=0.5), timeout=5).start()
+        try:
+            pool.send(self.order_data, [2010.0])
+
+            pool.timeout = 0.2
+            first = pool.submit(self.order_data, [2010.0])
+            second = pool.submit(self.order_data, [2010.0])
+
+            assert first.result(timeout=5)[1][0]["response"]["success"] is True
+            assert second.result(timeout=5)[1][0]["response"]["error"] == "Order expired before the worker could send it"
+        finally:
+            pool.close()
+
+    def test_full_job_queue_fails_at_once(self):
+        pool = AccountWorkerPool(self.accounts[:1], backend_factory=FakeBackendFactory(latency=0.5), queue_size=1).start()
+        try:
+            pool.send(self.order_data, [2010.0])
+
+            pool.submit(self.order_data, [2010.0])
+            # Let the worker take the first job off the queue
+            time.sleep(0.2)
+            pool.submit(self.order_data, [2010.0])
+            results = pool.submit(self.order_data, [2010.0]).result(timeout=1)
+        finally:
+            pool.close()
+
+        assert "too many orders waiting" in results[1][0]["response"]["error"]
+
+    def test_dead_worker_fails_at_once_and_is_restarted(self):
+        pool = AccountWorkerPool(self.accounts[:2], backend_factory=FakeBackendFactory()).start()
+        try:
+            pool.send(self.order_data, [2010.0])
+            process = pool.workers[1][0]
+            process.terminate()
+            process.join()
+
+            results = pool.send(self.order_data, [2010.0])
+            assert "Worker exited" in results[0]["response"]["error"]
+            assert results[1]["response"]["success"] is True
+
+            # The next signal goes through the new worker
+            assert pool.workers[1][0] is not process
+            assert pool.send(self.order_data, [2010.0], account_ids=[1])[0]["response"]["success"] is True
+        finally:
+            pool.close()
+
+    def test_job_of_a_worker_that_dies_is_failed(self):
+        pool = AccountWorkerPool(self.accounts[:1], backend_factory=FakeBackendFactory(latency=5)).start()
+        try:
+            future = pool.submit(self.order_data, [2010.0])
+            pool.workers[1][0].terminate()
+
+            results = future.result(timeout=5)
+            assert "Worker exited" in results[1][0]["response"]["error"]
+            assert pool.pending == {}
+        finally:
+            pool.close()
+
+    def test_account_without_worker_fails_at_once(self):
+        pool = AccountWorkerPool(self.accounts[:1], backend_factory=FakeBackendFactory()).start()
+        try:
+            results = pool.send(self.order_data, [2010.0], account_ids=[1, 9])
+        finally:
+            pool.close()
+
+        assert results[0]["response"]["success"] is True
+        assert results[1]["id"] == 9
+        assert "No worker" in results[1]["response"]["error"]
+
+    def test_every_account_needs_its_own_terminal(self):
+        accounts = [dict(account, terminal_path=path) for account, path in
+                    zip(self.accounts, ["C:/MT5/One/terminal64.exe", None, "C:/MT5/One/terminal64.exe"])]
+        assert check_terminal_paths(accounts) == [
+            "Account Account 2 has no terminal_path",
+            "Accounts Account 1 and Account 3 share the terminal C:/MT5/One/terminal64.exe"
+        ]
+
+        accounts[1]['terminal_path'] = "C:/MT5/Two/terminal64.exe"
+        accounts[2]['terminal_path'] = "C:/MT5/Three/terminal64.exe"
+        assert check_terminal_paths(accounts) == []
+
+    def test_workers_sharing_a_terminal_are_not_started(self, mock_db, caplog):
+        cursor = mock_db["cursor"]
+        cursor.execute('''
+            CREATE TABLE mt_accounts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                account_name TEXT,
+                server_name TEXT,
+                login_id TEXT,
+                password TEXT,
+                terminal_path TEXT
+            )
+        ''')
+        cursor.executemany(
+            'INSERT INTO mt_accounts (account_name, server_name, login_id, password, terminal_path) VALUES (?, ?, ?, ?, ?)',
+            [("Account 1", "Server 1", "1", "p", None), ("Account 2", "Server 1", "2", "p", None)]
+        )
+
+        assert start_worker_pool(mock_db["conn"]) is None
+        assert "Not starting account workers" in caplog.text
+
+    def test_load_accounts(self, mock_db):
+        cursor = mock_db["cursor"]
+        cursor.execute('''
+            CREATE TABLE mt_accounts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                account_name TEXT,
+                server_name TEXT,
+                login_id TEXT,
+                password TEXT
+            )
+        ''')
+        cursor.execute(
+            'INSERT INTO mt_accounts (account_name, server_name, login_id, password) VALUES (?, ?, ?, ?)',
+            ("Account 1", "Server 1", "12345", "password1")
+        )
+
+        accounts = load_accounts(mock_db["conn"])
+
+        assert accounts == [{
+            'id': 1,
+            'account_name': "Account 1",
+            'server_name': "Server 1",
+            'login_id': "12345",
+            'password': "password1",
+            'terminal_path': None
+        }]
@@ -0,0 +1,80 @@
+import os
+import sys
+import sqlite3
+import pytest
+
+# The benchmark scripts live outside src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from build_corpus import anonymise, load_corpus, add_log_messages
+from bench_parser import run, compare, disagreements, load_baseline, DEFAULT_THRESHOLD, PREVIOUS
+from validateOrder import validateOrder
+
+
+def test_corpus_is_versioned_and_parses():
+    corpus = load_corpus()
+    assert corpus['version'] >= 1
+    assert {entry['source'] for entry in corpus['messages']} == {'request', 'example', 'log'}
+
+    # Every message, signal or not, goes through the parser without raising
+    for entry in corpus['messages']:
+        validateOrder(entry['text'])
+
+
+def test_anonymise_keeps_the_signal():
+    message = "XAUUSD buy 2570 sl 2564 tp 2572 JOIN @GoldSignalsVip https://t.me/goldvip mail admin@signals.io"
+    assert anonymise(message) == "XAUUSD buy 2570 sl 2564 tp 2572 JOIN @channel link mail user@example.com"
+    # Prices written with @ are not handles
+    assert anonymise("Sell now XAUUSD @2739.00") == "Sell now XAUUSD @2739.00"
+
+
+def test_add_log_messages_skips_known_and_bumps_version():
+    corpus = {"version": 3, "messages": [{"source": "log", "text": "XAUUSD buy 2570 @channel"}]}
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE logs (id INTEGER PRIMARY KEY, message TEXT)")
+    conn.executemany("INSERT INTO logs (message) VALUES (?)", [
+        ("XAUUSD buy 2570 @SomeChannel",),
+        ("EURUSD sell 1.0850",),
+        ("",),
+    ])
+
+    assert add_log_messages(corpus, conn, limit=10) == 1
+    assert corpus['version'] == 4
+    assert corpus['messages'][-1] == {"source": "log", "text": "EURUSD sell 1.0850"}
+
+    # Nothing new, the version stays
+    assert add_log_messages(corpus, conn, limit=10) == 0
+    assert corpus['version'] == 4
+    conn.close()
+
+
+def test_compare_flags_only_regressions_beyond_threshold():
+    baseline = {"stages": {"a": {"messages_per_sec": 1000}, "b": {"messages_per_sec": 1000}}}
+    results = {"stages": {
+        "a": {"messages_per_sec": 900},
+        "b": {"messages_per_sec": 700},
+        "new stage": {"messages_per_sec": 1}
+    }}
+    assert compare(results, baseline, threshold=0.15) == [("b", 700, 1000)]
+
+    # The previous parser is only a reference point
+    baseline["stages"][PREVIOUS] = {"messages_per_sec": 1000}
+    results["stages"][PREVIOUS] = {"messages_per_sec": 100}
+    assert compare(results, baseline, threshold=0.15) == [("b", 700, 1000)]
+
+
+def test_parser_agrees_with_the_previous_parser():
+    assert disagreements(load_corpus()) == []
+
+
+@pytest.mark.slow
+def test_parser_throughput_against_baseline():
+    # Compares with benchmarks/baseline.json, saved on this machine with
+    # `python benchmarks/bench_parser.py --save-baseline`
+    baseline = load_baseline()
+    corpus = load_corpus()
+    if baseline is None or baseline['corpus_version'] != corpus['version']:
+        pytest.skip("No parser benchmark baseline for this corpus version")
+
+    results = run(corpus, rounds=100)
+    assert compare(results, baseline, DEFAULT_THRESHOLD) == []
@@ -0,0 +1,125 @@
+import pytest
+from unittest.mock import MagicMock
+from brokerSymbols import base_symbol, build_symbol_index, BrokerSymbolCache
+from sendOrder import sendOrder, sendOrderBatch
+
+
+def broker_list(*names):
+    # symbols_get() returns SymbolInfo tuples; only the name is used
+    symbols = []
+    for name in names:
+        symbol = MagicMock()
+        symbol.name = name
+        symbols.append(symbol)
+    return tuple(symbols)
+
+
+account = {
+    'account_name': 'Test Account',
+    'login_id': '12345678',
+    'password': 'password123',
+    'server_name': 'MetaQuotes-Demo'
+}
+
+
+# Test cases for mapping broker symbol names to canonical symbols
+class TestBaseSymbol:
+
+    @pytest.mark.parametrize("name, expected", [
+        ("XAUUSD", "XAUUSD"),
+        ("XAUUSD.m", "XAUUSD"),
+        ("XAUUSDm", "XAUUSD"),
+        ("#XAUUSD_pro", "XAUUSD"),
+        ("GOLD", "XAUUSD"),
+        ("eurusd.raw", "EURUSD"),
+        ("US30.cash", "DJ30"),
+        ("UNKNOWN", None),
+        ("", None),
+    ])
+    def test_base_symbol(self, name, expected):
+        assert base_symbol(name) == expected
+
+    @pytest.mark.parametrize("name", ["US300", "GOLDEUR", "GOLDAUD", "GBPUSDJPY", "XAUUSDEUR", "EURUSDx2"])
+    def test_other_instrument_is_not_a_suffix(self, name):
+        # Only broker suffixes are stripped, US300 is not US30 and GOLDEUR is not gold in dollars
+        assert base_symbol(name) is None
+
+    def test_build_prefers_exact_then_shortest_name(self):
+        index = build_symbol_index(["XAUUSD.pro", "XAUUSDm", "EURUSD.m", "EURUSD", "GOLD", "BTCUSD"])
+        assert index["XAUUSD"] == "XAUUSDm"
+        assert index["EURUSD"] == "EURUSD"
+
+
+# Test cases for the per-account cache
+@pytest.mark.usefixtures("mock_mt5")
+class TestBrokerSymbolCache:
+
+    def test_resolves_with_one_fetch(self, mock_mt5):
+        mock_mt5["symbols_get"].return_value = broker_list("XAUUSD.m", "EURUSD.m")
+        cache = BrokerSymbolCache()
+
+        assert cache.resolve(account, "XAUUSD") == "XAUUSD.m"
+        assert cache.resolve(account, "EURUSD") == "EURUSD.m"
+        # Not listed by the broker, the signal's symbol is used as is
+        assert cache.resolve(account, "GBPUSD") == "GBPUSD"
+        mock_mt5["symbols_get"].assert_called_once()
+
+    def test_accounts_are_cached_separately(self, mock_mt5):
+        mock_mt5["symbols_get"].side_effect = [broker_list("XAUUSD.m"), broker_list("GOLD")]
+        cache = BrokerSymbolCache()
+        other = dict(account, login_id='87654321', server_name='Other-Live')
+
+        assert cache.resolve(account, "XAUUSD") == "XAUUSD.m"
+        assert cache.resolve(other, "XAUUSD") == "GOLD"
+        assert cache.resolve(account, "XAUUSD") == "XAUUSD.m"
+        assert mock_mt5["symbols_get"].call_count == 2
+
+    def test_refreshes_when_due(self, mock_mt5):
+        mock_mt5["symbols_get"].side_effect = [broker_list("XAUUSD.m"), broker_list("XAUUSDm")]
+        cache = BrokerSymbolCache(refresh_interval=0)
+
+        assert cache.resolve(account, "XAUUSD") == "XAUUSD.m"
+        assert cache.resolve(account, "XAUUSD") == "XAUUSDm"
+
+    def test_failed_refresh_keeps_previous_index(self, mock_mt5):
+        mock_mt5["symbols_get"].side_effect = [broker_list("XAUUSD.m"), None]
+        cache = BrokerSymbolCache(refresh_interval=0, retry_interval=3600)
+
+        assert cache.resolve(account, "XAUUSD") == "XAUUSD.m"
+        assert cache.resolve(account, "XAUUSD") == "XAUUSD.m"
+        # The retry waits, so the failure isn't fetched again on every order
+        assert cache.resolve(account, "XAUUSD") == "XAUUSD.m"
+        assert mock_mt5["symbols_get"].call_count == 2
+        assert cache.get_stats()['failed_refreshes'] == 1
+
+
+# Test cases for orders sent under the broker's symbol name
+@pytest.mark.usefixtures("mock_mt5")
+class TestSendOrderBrokerSymbol:
+
+    order_data = {
+        "signal": "buy",
+        "symbol": "XAUUSD",
+        "price": 2000.0,
+        "sl": 1990.0,
+        "tp": [2010.0, 2020.0]
+    }
+
+    def test_send_order_uses_broker_symbol(self, mock_mt5):
+        mock_mt5["symbols_get"].return_value = broker_list("XAUUSD.m")
+
+        result = sendOrder(self.order_data, account, 2010.0)
+
+        assert result["success"] is True
+        mock_mt5["symbol_select"].assert_called_once_with("XAUUSD.m", True)
+        assert mock_mt5["order_send"].call_args[0][0]["symbol"] == "XAUUSD.m"
+
+    def test_batch_resolves_once_per_account(self, mock_mt5):
+        mock_mt5["symbols_get"].return_value = broker_list("GOLD")
+        legs = [(account, tp) for tp in self.order_data["tp"]]
+
+        results = sendOrderBatch(self.order_data, legs)
+
+        assert all(result["response"]["success"] for result in results)
+        mock_mt5["symbols_get"].assert_called_once()
+        assert [call[0][0]["symbol"] for call in mock_mt5["order_send"].call_args_list] == ["GOLD", "GOLD"]
@@ -0,0 +1,128 @@
+import sqlite3
+import pytest
+import init_db
+import channelRouting
+from channelRouting import RoutingTable, get_routing_table, normalise_telegram_id
+
+
+@pytest.fixture
+def routing_db(tmp_path, monkeypatch):
+    # A real database file initialized like the application does
+    db_file = str(tmp_path / 'routing.db')
+    monkeypatch.setattr(init_db, 'DB_FILE', db_file)
+    monkeypatch.setattr(channelRouting, 'routing_table', None)
+    init_db.initialize_database()
+
+    conn = sqlite3.connect(db_file)
+    conn.executemany('INSERT INTO mt_accounts (id, account_name, server_name, login_id, password) VALUES (?, ?, ?, ?, ?)', [
+        (1, 'Account 1', 'Broker-Demo', '111', 'secret'),
+        (2, 'Account 2', 'Broker-Live', '222', 'secret'),
+    ])
+    # Stored as fetchChannels does, with the -100 prefix of channel ids
+    conn.executemany('INSERT INTO channels (id, name, telegram_id, enabled) VALUES (?, ?, ?, 1)', [
+        (1, 'Gold Signals VIP', -1001000000001),
+        (2, 'FX Signals', -1001000000002),
+    ])
+    conn.execute('INSERT INTO channel_account_mappings (channel_id, account_id) VALUES (1, 2)')
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+# Test cases for resolving channels to accounts
+class TestRoutingTable:
+
+    def test_mapped_channel(self, routing_db):
+        route = get_routing_table(routing_db).resolve("gold signals vip")
+        assert route.channel_id == 1
+        assert route.account['account_name'] == 'Account 2'
+        assert route.all_accounts == ()
+
+    def test_unmapped_channel_fans_out(self, routing_db):
+        route = get_routing_table(routing_db).resolve("FX Signals")
+        assert route.channel_id == 2
+        assert route.account is None
+        assert [account['id'] for account in route.all_accounts] == [1, 2]
+
+    def test_unknown_channel_fans_out(self, routing_db):
+        route = get_routing_table(routing_db).resolve("Somebody Else")
+        assert route.channel_id is None
+        assert len(route.all_accounts) == 2
+
+    def test_flexible_match_is_remembered(self, routing_db):
+        table = get_routing_table(routing_db)
+        assert table.resolve("Gold Signals").channel_id == 1
+        assert table.fuzzy_matches == {"gold signals": 1}
+
+    def test_first_mapping_wins(self):
+        table = RoutingTable(
+            [(1, 'Gold', None)],
+            [(1, 'A', 'S', '1', 'p'), (2, 'B', 'S', '2', 'p')],
+            [(1, 2), (1, 1)]
+        )
+        assert table.resolve('Gold').account['id'] == 2
+
+
+# Test cases for routing by Telegram chat id
+class TestChatIdRouting:
+
+    @pytest.mark.parametrize("telegram_id", [-1001234567890, 1001234567890, 1234567890, "-1001234567890"])
+    def test_normalise_telegram_id(self, telegram_id):
+        assert normalise_telegram_id(telegram_id) == 1234567890
+
+    def test_chat_id_wins_over_title(self, routing_db):
+        # The title says FX Signals, the chat is the gold channel (e.g. after a rename)
+        route = get_routing_table(routing_db).resolve("FX Signals", chat_id=1000000001)
+        assert route.channel_id == 1
+        assert route.account['account_name'] == 'Account 2'
+
+    def test_marked_chat_id(self, routing_db):
+        assert get_routing_table(routing_db).resolve(None, chat_id=-1001000000001).channel_id == 1
+
+    def test_unknown_chat_id_falls_back_to_title(self, routing_db, caplog):
+        route = get_routing_table(routing_db).resolve("FX Signals", chat_id=999)
+        assert route.channel_id == 2
+        assert "No channel with chat id 999" in caplog.text
+
+    def test_one_channel_per_chat(self, routing_db):
+        # The same chat written without its prefix is a duplicate
+        with pytest.raises(sqlite3.IntegrityError):
+            routing_db.execute("INSERT INTO channels (name, telegram_id) VALUES ('Copy', 1000000001)")
+
+
+# Test cases for rebuilding the table when the routing tables change
+class TestRoutingVersion:
+
+    def test_table_is_reused_until_a_write(self, routing_db):
+        first = get_routing_table(routing_db)
+        assert get_routing_table(routing_db) is first
+
+        # Mapping the FX channel, as the web interface would
+        routing_db.execute('INSERT INTO channel_account_mappings (channel_id, account_id) VALUES (2, 1)')
+        routing_db.commit()
+
+        second = get_routing_table(routing_db)
+        assert second is not first
+        assert second.resolve("FX Signals").account['account_name'] == 'Account 1'
+
+    @pytest.mark.parametrize("statement", [
+        "UPDATE channels SET name = 'Gold Renamed' WHERE id = 1",
+        "DELETE FROM channel_account_mappings WHERE channel_id = 1",
+        "UPDATE mt_accounts SET password = 'changed' WHERE id = 2",
+    ])
+    def test_every_routing_table_bumps_the_version(self, routing_db, statement):
+        first = get_routing_table(routing_db)
+        routing_db.execute(statement)
+        routing_db.commit()
+        assert get_routing_table(routing_db) is not first
+
+    def test_database_without_counter_is_not_cached(self):
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE TABLE channels (id INTEGER PRIMARY KEY, telegram_id INTEGER, name TEXT)')
+        conn.execute('CREATE TABLE mt_accounts (id INTEGER PRIMARY KEY, account_name TEXT, server_name TEXT, login_id TEXT, password TEXT)')
+        conn.execute('CREATE TABLE channel_account_mappings (id INTEGER PRIMARY KEY, channel_id INTEGER, account_id INTEGER)')
+
+        table = get_routing_table(conn)
+        assert table.version is None
+        assert get_routing_table(conn) is not table
+        conn.close()
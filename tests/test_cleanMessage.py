@@ -0,0 +1,71 @@
+import pytest
+from cleanMessage import cleanMessage, removeEmoticons
+
+# Outputs of the original step by step cleanMessage, which the single pass version must reproduce exactly
+GOLDEN = [
+    ('XAUUSD buy 2570 - 2567 sl: 2564 tp: 2572 tp: 2574 tp: 2576 tp: open',
+     'XAUUSD buy 2570 - 2567 sl 2564 tp 2572 tp 2574 tp 2576 tp open'),
+    ('XAUUSD sell 2571 tp 2569 tp 2568 tp 2567 tp 2556 sl 2586',
+     'XAUUSD sell 2571 tp 2569 tp 2568 tp 2567 tp 2556 sl 2586'),
+    ('GBPCAD sell 1.78050 sl 1.78450 tp.77400',
+     'GBPCAD sell 1.78050 sl 1.78450 tp 77400'),
+    ('XAUUSD buy : 2569 - 2566 sl : 2563 tp : 2575 tp : 2580',
+     'XAUUSD buy : 2569 - 2566 sl 2563 tp 2575 tp 2580'),
+    ('XAUUSD buy 2679-2676 stoploss point : 2674 take profit 1 :2682 take profit 2. :2685 take profit 3. :2690',
+     'XAUUSD buy 2679-2676 sl 2674 tp2682 tp2685 tp2690'),
+    ('XAUUSD sell (2669.5- 2671.5) tp1: 2668 tp2: 2665.5 stop loss: 2674.5',
+     'XAUUSD sell (2669.5- 2671.5) tp 2668 tp 2665.5 sl 2674.5'),
+    ('BTCUSD buy 92600 tp 1 92700 tp 2 92800 tp 3 92900 tp 4 94600 sl 90600 no financial advice',
+     'BTCUSD buy 92600 tp 1 92700 tp 2 92800 tp 3 92900 tp 4 94600 sl 90600 no financial advice'),
+    ('Sell now XAUUSD @2739.00\n\nStoploss: 2744.50\n\nTP: 2706.00\n\nJOIN @forexusfreesignals\n\nUse max 1-2% risk per trade',
+     'sell XAUUSD 2739.00 sl 2744.50 tp 2706.00 join forexusfreesignals use max 1-2% risk per trade'),
+    ('GOLD BUY NOW @2730-2727\nSL 2724\nTP 2732.54\nTP 2737.95\nLayering slowly use proper lot size',
+     'XAUUSD buy 2730-2727 sl 2724 tp 2732.54 tp 2737.95 layering slowly use proper lot size'),
+    ('🚀 GOLD SELL NOW 🚀\n\n@ 2650 — 2653\n\n✅ TP1: 2647\n✅ TP2: 2644\n❌ SL: 2657',
+     'XAUUSD sell 2650 2653 tp 2647 tp 2644 sl 2657'),
+    ('BTC/USD buy now 67000\nTake Profit: 68000\nStop Loss: 66000',
+     'BTCUSD buy 67000 tp 68000 sl 66000'),
+    ('us30 sell 42100 tp1 42000 tp2 41900 sl 42250',
+     'DJ30 sell 42100 tp 42000 tp 41900 sl 42250'),
+    ('XAU/USD BUY 2600 TP.2610 TP.2620 SL 2590',
+     'XAUUSD buy 2600 tp 2610 tp 2620 sl 2590'),
+    ('NAS100 buy   19800   tp   19900   sl   19700',
+     'NASDAQ100 buy 19800 tp 19900 sl 19700'),
+    ('Known issue: nowhere near now the snow',
+     'known issue: nowhere near the snow'),
+]
+
+
+# Test cases for cleanMessage
+@pytest.mark.parametrize("message, expected", GOLDEN)
+def test_clean_message_matches_golden_output(message, expected):
+    assert cleanMessage(message) == expected
+
+def test_cascading_rewrites():
+    # Each rewrite also applies to what the previous one produced
+    assert cleanMessage("stop loss : 10") == "sl 10"
+    assert cleanMessage("take profit.5") == "tp 5"
+    assert cleanMessage("tp 1: 2. : 3") == "tp 3"
+    assert cleanMessage("x point now: 5") == "x 5"
+
+@pytest.mark.parametrize("message, expected", [
+    ("XAUUSD buy 2570 Stop Loss :: 2564 tp 2575", "XAUUSD buy 2570 sl 2564 tp 2575"),
+    ("XAUUSD buy 2570 sl 2564 tp 1 :: 2575", "XAUUSD buy 2570 sl 2564 tp 2575"),
+    ("XAUUSD buy 2570 sl ::: 2564 take profit :: 2575", "XAUUSD buy 2570 sl 2564 tp 2575"),
+    ("XAUUSD buy 2570 sl 2564 tp1: :2575", "XAUUSD buy 2570 sl 2564 tp 2575"),
+    ("XAUUSD buy 2570 stoploss nowpoint : 2564", "XAUUSD buy 2570 sl 2564"),
+    ("point : XAUUSD buy 2570 sl :", "XAUUSD buy 2570 sl"),
+])
+def test_cleaning_twice_changes_nothing(message, expected):
+    # The parser is handed cleaned messages and doesn't clean them again
+    assert cleanMessage(message) == expected
+    assert cleanMessage(expected) == expected
+
+def test_now_and_new_lines():
+    # Removing "now" between new lines leaves a single space
+    assert cleanMessage("buy\nnow\n\nnow\n5") == "buy 5"
+    assert cleanMessage("buy now now 5") == "buy 5"
+    assert cleanMessage("snow nowhere") == "snow nowhere"
+
+def test_remove_emoticons():
+    assert removeEmoticons("buy 🚀 gold ✅") == "buy  gold "
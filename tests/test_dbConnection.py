@@ -0,0 +1,79 @@
+import sqlite3
+import threading
+import pytest
+import init_db
+import dbConnection
+from dbConnection import get_connection, close_connections
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    db_file = str(tmp_path / 'tuned.db')
+    monkeypatch.setattr(init_db, 'DB_FILE', db_file)
+    init_db.initialize_database()
+    yield db_file
+    close_connections()
+
+
+def pragma(conn, name):
+    return conn.execute(f'PRAGMA {name}').fetchone()[0]
+
+
+# Test cases for the tuned SQLite connections
+class TestConnections:
+
+    def test_database_is_in_wal_mode(self, db_file):
+        # journal_mode is stored in the file, so a plain connection sees it too
+        conn = sqlite3.connect(db_file)
+        assert pragma(conn, 'journal_mode') == 'wal'
+        conn.close()
+
+    def test_connect_applies_the_pragmas(self, db_file, monkeypatch):
+        monkeypatch.setattr(init_db, 'CACHE_SIZE', -4000)
+        monkeypatch.setattr(init_db, 'MMAP_SIZE', 1048576)
+        conn = init_db.connect()
+        assert pragma(conn, 'synchronous') == 1  # NORMAL
+        assert pragma(conn, 'cache_size') == -4000
+        assert pragma(conn, 'mmap_size') in (0, 1048576)  # 0 where SQLite was built without mmap
+        conn.close()
+
+    def test_one_connection_per_thread(self, db_file):
+        conn = get_connection()
+        assert get_connection() is conn
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(get_connection()))
+        thread.start()
+        thread.join()
+        assert other[0] is not conn
+
+    def test_new_connection_for_another_database(self, db_file, tmp_path, monkeypatch):
+        conn = get_connection()
+        monkeypatch.setattr(init_db, 'DB_FILE', str(tmp_path / 'other.db'))
+        assert get_connection() is not conn
+        assert conn not in dbConnection.connections
+
+    def test_closed_connections_are_reopened(self, db_file):
+        conn = get_connection()
+        close_connections()
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute('SELECT 1')
+
+        reopened = get_connection()
+        assert reopened is not conn
+        assert reopened.execute('SELECT COUNT(*) FROM logs').fetchone()[0] == 0
+
+    def test_readers_do_not_block_writes(self, db_file):
+        # A reader in the middle of a transaction, as the web interface listing logs
+        reader = sqlite3.connect(db_file)
+        reader.execute('BEGIN')
+        reader.execute('SELECT COUNT(*) FROM logs').fetchone()
+
+        writer = init_db.connect(timeout=0.1)
+        writer.execute("INSERT INTO logs (channel, message) VALUES ('Gold', 'XAUUSD buy 2000')")
+        writer.commit()
+
+        reader.rollback()
+        assert reader.execute('SELECT COUNT(*) FROM logs').fetchone()[0] == 1
+        reader.close()
+        writer.close()
@@ -285,11 +285,11 @@ class TestIndex:
             # Verify that a handler was captured
             assert handler is not None
 
-            # Call the handler with the mock event
+            # Call the handler with the mock event; without a pipeline it runs on a thread
             await handler(mock_event)
 
             # Verify that process_message was called with the correct arguments
-            mock_process_message.assert_called_once_with("Test message", "Test Channel")
+            mock_process_message.assert_called_once_with("Test message", "Test Channel", chat_id=-1001234567890)
 
     @pytest.mark.asyncio
     @patch('index.client')
@@ -346,3 +346,75 @@ class TestIndex:
 
             # Verify that process_message was not called
             mock_process_message.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch('index.client')
+    @patch('index.process_message')
+    @patch('index.events.NewMessage')
+    async def test_message_handler_submits_to_pipeline(self, mock_new_message, mock_process_message, mock_client, mock_db):
+        """Test that the handler only enqueues the message when the pipeline is running"""
+        from index import start_telegram_client
+
+        mock_db["cursor"].execute('''
+            INSERT INTO channels (telegram_id, name, enabled)
+            VALUES (?, ?, ?)
+        ''', (-1001234567890, "Test Channel", 1))
+        mock_db["conn"].commit()
+
+        mock_event = AsyncMock()
+        mock_event.message.message = "XAUUSD buy 2000"
+        mock_chat = AsyncMock()
+        mock_chat.id = -1001234567890
+        mock_chat.title = "Test Channel"
+        mock_event.get_chat.return_value = mock_chat
+
+        with patch('sqlite3.connect', return_value=mock_db["conn"]):
+            handler = None
+            def capture_handler(event_filter):
+                def decorator(func):
+                    nonlocal handler
+                    handler = func
+                    return func
+                return decorator
+
+            mock_client.on = MagicMock(side_effect=capture_handler)
+            mock_client.run_until_disconnected = AsyncMock(return_value=None)
+            mock_new_message.return_value = "new_message_filter"
+            await start_telegram_client()
+
+            mock_pipeline = MagicMock()
+            with patch('pipeline.pipeline', mock_pipeline):
+                await handler(mock_event)
+
+            mock_pipeline.submit.assert_called_once_with("XAUUSD buy 2000", "Test Channel", chat_id=-1001234567890)
+            mock_process_message.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch('index.stop_pipeline')
+    @patch('index.start_pipeline')
+    @patch('index.stop_log_writer')
+    @patch('index.start_log_writer')
+    @patch('index.start_telegram_client', new_callable=AsyncMock)
+    @patch('index.initialize_telegram_client', new_callable=AsyncMock)
+    @patch('index.start_account_workers')
+    async def test_main_migrates_the_database(self, mock_start_account_workers, mock_initialize_client,
+                                              mock_start_client, mock_start_log_writer, mock_stop_log_writer,
+                                              mock_start_pipeline, mock_stop_pipeline, tmp_path, monkeypatch):
+        """Test that the listener brings an older database up to date before logging to it"""
+        import sqlite3
+        import init_db
+        from index import main
+
+        db_file = str(tmp_path / 'old.db')
+        conn = sqlite3.connect(db_file)
+        conn.execute('CREATE TABLE logs (id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT, message TEXT)')
+        conn.commit()
+        monkeypatch.setattr(init_db, 'DB_FILE', db_file)
+        monkeypatch.setattr('index.client', None)
+
+        await main()
+
+        columns = [column[1] for column in conn.execute('PRAGMA table_info(logs)')]
+        conn.close()
+        assert 'parser_version' in columns
+        mock_start_client.assert_awaited_once()
@@ -0,0 +1,99 @@
+import json
+import time
+import sqlite3
+import pytest
+from unittest.mock import patch
+import init_db
+import logWriter
+from logWriter import LogWriter
+from processMessage import process_message
+from parsedOrder import ParsedOrder
+
+
+def row(number):
+    # (parameters, trade_response, exception, is_valid_trade, processed_at, failed_at)
+    return (json.dumps({"n": number}), json.dumps({"success": True}), None, 1, '2024-01-01 00:00:00', None)
+
+
+@pytest.fixture
+def log_db(tmp_path, monkeypatch):
+    db_file = str(tmp_path / 'logs.db')
+    monkeypatch.setattr(init_db, 'DB_FILE', db_file)
+    init_db.initialize_database()
+    return db_file
+
+
+def count_logs(db_file):
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM logs').fetchone()[0]
+    finally:
+        conn.close()
+
+
+# Test cases for the background log writer
+class TestLogWriter:
+
+    def test_full_batch_is_one_transaction(self, log_db):
+        writer = LogWriter(log_db, batch_rows=5, flush_ms=10000).start()
+        writer.add("Gold", "XAUUSD buy", [row(number) for number in range(10)], '2024-01-01 00:00:00')
+        writer.flush()
+
+        assert count_logs(log_db) == 10
+        stats = writer.get_stats()
+        assert stats['batches'] == 2
+        assert stats['max_batch'] == 5
+        writer.stop()
+
+    def test_partial_batch_is_written_after_flush_ms(self, log_db):
+        writer = LogWriter(log_db, batch_rows=100, flush_ms=20).start()
+        writer.add("Gold", "XAUUSD buy", [row(1)], '2024-01-01 00:00:00')
+
+        deadline = time.monotonic() + 2
+        while count_logs(log_db) == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert count_logs(log_db) == 1
+        writer.stop()
+
+    def test_stop_writes_queued_rows(self, log_db):
+        writer = LogWriter(log_db, batch_rows=100, flush_ms=10000).start()
+        writer.add("Gold", "XAUUSD buy", [row(1), row(2), row(3)], '2024-01-01 00:00:00')
+        writer.stop()
+
+        assert count_logs(log_db) == 3
+        assert writer.get_stats()['rows'] == 3
+
+    def test_failed_batch_is_counted(self, tmp_path):
+        # No logs table in this database
+        writer = LogWriter(str(tmp_path / 'empty.db'), batch_rows=1, flush_ms=10).start()
+        writer.add("Gold", "XAUUSD buy", [row(1)], '2024-01-01 00:00:00')
+        writer.flush()
+
+        assert writer.get_stats()['errors'] == 1
+        writer.stop()
+
+    @patch('processMessage.parseOrder')
+    @patch('processMessage.sendOrderBatch')
+    def test_process_message_queues_rows(self, mock_send_order, mock_parse_order, tmp_path, monkeypatch):
+        # process_message opens the database file in the working directory
+        db_file = 'telegram_mt5_logs.db'
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(init_db, 'DB_FILE', db_file)
+        init_db.initialize_database()
+        mock_parse_order.return_value = ParsedOrder.from_dict({
+            "signal": "buy",
+            "symbol": "XAUUSD",
+            "price": 2000.0,
+            "sl": 1990.0,
+            "tp": [2010.0]
+        })
+        mock_send_order.return_value = [{"account": None, "id": None, "tp": 2010.0, "response": {"success": True}}]
+
+        writer = LogWriter(db_file, batch_rows=100, flush_ms=10000).start()
+        monkeypatch.setattr(logWriter, 'log_writer', writer)
+        process_message("XAUUSD buy 2000 sl 1990 tp 2010", "Test Channel")
+
+        # Nothing is committed on the order path
+        assert count_logs(db_file) == 0
+        writer.stop()
+        assert count_logs(db_file) == 1
@@ -0,0 +1,108 @@
+import time
+import asyncio
+import threading
+import pytest
+from messageExecutor import MessageExecutor, LoopLagMonitor, StageHistogram
+
+
+# Test cases for the message executor
+class TestMessageExecutor:
+
+    def test_processes_in_arrival_order(self):
+        processed = []
+        executor = MessageExecutor(queue_size=10, workers=1).start()
+        for number in range(5):
+            assert executor.submit(processed.append, number) is True
+        executor.join()
+        executor.stop()
+
+        assert processed == [0, 1, 2, 3, 4]
+        assert executor.get_stats()["processed"] == 5
+
+    def test_full_queue_drops_without_blocking(self):
+        release = threading.Event()
+        executor = MessageExecutor(queue_size=1, workers=1).start()
+
+        # The first message occupies the worker, the second fills the queue
+        executor.submit(release.wait, 5)
+        time.sleep(0.05)
+        assert executor.submit(print, "queued") is True
+
+        started = time.monotonic()
+        assert executor.submit(print, "dropped") is False
+        assert time.monotonic() - started < 0.1
+
+        release.set()
+        executor.join()
+        executor.stop()
+        stats = executor.get_stats()
+        assert stats["dropped"] == 1
+        assert stats["processed"] == 2
+
+    def test_error_does_not_stop_the_worker(self):
+        processed = []
+
+        def fail():
+            raise ValueError("broken message")
+
+        executor = MessageExecutor(queue_size=10, workers=1).start()
+        executor.submit(fail)
+        executor.submit(processed.append, "next")
+        executor.join()
+        executor.stop()
+
+        assert processed == ["next"]
+        assert executor.get_stats()["errors"] == 1
+
+    def test_stop_finishes_queued_messages(self):
+        processed = []
+        executor = MessageExecutor(queue_size=10, workers=2).start()
+        for number in range(4):
+            executor.submit(processed.append, number)
+        executor.stop()
+
+        assert sorted(processed) == [0, 1, 2, 3]
+
+
+# Test cases for the event loop lag metric
+    def test_histogram_percentile(self):
+        histogram = StageHistogram()
+        for seconds in [0.002] * 98 + [0.04, 7.5]:
+            histogram.record(seconds)
+
+        assert histogram.percentile(0.5) == 0.005
+        assert histogram.percentile(0.99) == 0.05
+        # Past the last bucket, the slowest job seen
+        assert histogram.percentile(1.0) == 7.5
+        assert histogram.get_stats()['p99'] == 0.05
+        assert StageHistogram().percentile(0.99) == 0.0
+
+
+class TestLoopLagMonitor:
+
+    def test_record(self):
+        monitor = LoopLagMonitor(interval=1, warning=10)
+        monitor.record(0.002)
+        monitor.record(0.010)
+        monitor.record(-0.001)
+
+        stats = monitor.get_stats()
+        assert stats["samples"] == 3
+        assert stats["last"] == 0.0
+        assert stats["max"] == 0.010
+        assert stats["mean"] == pytest.approx(0.004)
+
+    def test_blocking_call_shows_up_as_lag(self):
+        monitor = LoopLagMonitor(interval=0.01, warning=10)
+
+        async def block_the_loop():
+            task = asyncio.create_task(monitor.run())
+            await asyncio.sleep(0)
+            # A synchronous call on the loop, like process_message used to be
+            time.sleep(0.1)
+            await asyncio.sleep(0.05)
+            task.cancel()
+
+        asyncio.run(block_the_loop())
+
+        assert monitor.get_stats()["max"] >= 0.05
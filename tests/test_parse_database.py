@@ -0,0 +1,131 @@
+import json
+import sqlite3
+import pytest
+from parse_database import main, backfill, ensure_checkpoint_table, get_checkpoint
+from validateOrder import PARSER_VERSION
+from parsedOrder import ParsedOrder
+from init_db import add_parser_version_column
+
+
+@pytest.fixture
+def logs_db(tmp_path):
+    # A database file with a handful of stored messages
+    db_file = str(tmp_path / 'logs.db')
+    conn = sqlite3.connect(db_file)
+    conn.execute('''
+        CREATE TABLE logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel TEXT,
+            message TEXT,
+            parameters TEXT,
+            trade_response TEXT,
+            is_valid_trade INTEGER,
+            exception TEXT
+        )
+    ''')
+    conn.executemany(
+        'INSERT INTO logs (channel, message) VALUES (?, ?)',
+        [('Test Channel', f"XAUUSD buy {2000 + i} sl {1990 + i} tp {2010 + i}") for i in range(7)]
+    )
+    conn.commit()
+    conn.close()
+    return db_file
+
+
+def read_logs(db_file):
+    conn = sqlite3.connect(db_file)
+    rows = conn.execute('SELECT id, is_valid_trade, parameters, exception FROM logs ORDER BY id').fetchall()
+    conn.close()
+    return rows
+
+# Test cases for the bulk re-parse
+class TestParseDatabase:
+
+    def test_parses_every_row_in_chunks(self, logs_db):
+        main(['--db', logs_db, '--chunk-size', '3', '--workers', '0'])
+
+        rows = read_logs(logs_db)
+        assert all(row[1] == 1 for row in rows)
+        assert json.loads(rows[0][2])["price"] == 2000.0
+        assert json.loads(rows[6][2])["price"] == 2006.0
+
+    def test_process_pool_gives_same_results(self, logs_db):
+        main(['--db', logs_db, '--chunk-size', '2', '--workers', '2'])
+
+        rows = read_logs(logs_db)
+        assert [json.loads(row[2])["sl"] for row in rows] == [1990.0 + i for i in range(7)]
+
+    def test_resume_continues_after_checkpoint(self, logs_db):
+        conn = sqlite3.connect(logs_db)
+        ensure_checkpoint_table(conn)
+        conn.execute("INSERT INTO parse_checkpoints (name, last_rowid) VALUES ('parse_database', 4)")
+        conn.commit()
+        conn.close()
+
+        main(['--db', logs_db, '--chunk-size', '2', '--workers', '0', '--all', '--resume'])
+
+        rows = read_logs(logs_db)
+        assert [row[1] for row in rows] == [None, None, None, None, 1, 1, 1]
+
+    def test_checkpoint_follows_committed_chunks(self, logs_db):
+        conn = sqlite3.connect(logs_db)
+        ensure_checkpoint_table(conn)
+        add_parser_version_column(conn.cursor())
+
+        processed = backfill(conn, chunk_size=3, workers=0, start_after=2)
+
+        assert processed == 5
+        assert get_checkpoint(conn) == 7
+        conn.close()
+
+    def test_failures_are_stored_per_row(self, logs_db, monkeypatch):
+        def failing_parse(message):
+            if '2003' in message:
+                raise ValueError("Unparseable message")
+            return ParsedOrder(signal="buy")
+
+        monkeypatch.setattr('parse_database.parseOrder', failing_parse)
+        main(['--db', logs_db, '--chunk-size', '5', '--workers', '0'])
+
+        rows = read_logs(logs_db)
+        assert rows[3][3] == "Unparseable message"
+        assert rows[3][1] is None
+        assert rows[4][1] == 1
+
+    def test_rows_are_stamped_with_parser_version(self, logs_db):
+        main(['--db', logs_db, '--workers', '0'])
+
+        conn = sqlite3.connect(logs_db)
+        versions = [row[0] for row in conn.execute('SELECT parser_version FROM logs')]
+        conn.close()
+        assert versions == [PARSER_VERSION] * 7
+
+    def test_only_stale_rows_are_reparsed(self, logs_db):
+        main(['--db', logs_db, '--workers', '0'])
+
+        # Rows 2 and 5 were parsed by an older version
+        conn = sqlite3.connect(logs_db)
+        conn.execute("UPDATE logs SET parameters = NULL, parser_version = ? WHERE id IN (2, 5)", (PARSER_VERSION - 1,))
+        conn.execute("UPDATE logs SET parameters = 'untouched' WHERE id NOT IN (2, 5)")
+        conn.commit()
+        conn.close()
+
+        main(['--db', logs_db, '--chunk-size', '1', '--workers', '0'])
+
+        rows = read_logs(logs_db)
+        assert json.loads(rows[1][2])["price"] == 2001.0
+        assert json.loads(rows[4][2])["price"] == 2004.0
+        assert [row[2] for i, row in enumerate(rows) if i not in (1, 4)] == ['untouched'] * 5
+
+    def test_stale_rows_query_uses_index(self, logs_db):
+        main(['--db', logs_db, '--workers', '0'])
+
+        conn = sqlite3.connect(logs_db)
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT rowid, message, parser_version FROM logs "
+            "WHERE parser_version < ? AND (parser_version, rowid) > (?, ?) "
+            "ORDER BY parser_version, rowid LIMIT ?",
+            (PARSER_VERSION, -1, 0, 10)
+        ).fetchall()
+        conn.close()
+        assert 'idx_logs_parser_version' in plan[0][3]
@@ -0,0 +1,69 @@
+import json
+import pickle
+import pytest
+from parsedOrder import ParsedOrder, OrderLeg
+from parseCache import ParseCache
+from validateOrder import parseOrder, validateOrder
+
+
+def make_order():
+    return ParsedOrder("buy", "XAUUSD", (2570.0, 2567.0), 2564.0, [2572.0, 2574.0])
+
+
+def test_order_is_immutable():
+    order = make_order()
+    assert order.tp == (2572.0, 2574.0)
+    with pytest.raises(AttributeError):
+        order.sl = 1.0
+    with pytest.raises(AttributeError):
+        order.extra = 1
+
+
+def test_dict_access_matches_the_old_results():
+    order = make_order()
+    assert order["symbol"] == "XAUUSD"
+    assert order.get("sl") == 2564.0
+    assert order.get("missing", "default") == "default"
+    with pytest.raises(KeyError):
+        order["missing"]
+
+    # to_dict hands out a fresh list every time
+    as_dict = order.to_dict()
+    as_dict["tp"].append(1.0)
+    assert order.to_dict()["tp"] == [2572.0, 2574.0]
+    assert ParsedOrder.from_dict(order.to_dict()) == order
+
+
+def test_json_is_serialised_once_and_unchanged():
+    order = make_order()
+    assert order.to_json() == json.dumps(order.to_dict())
+    assert order.to_json() is order.to_json()
+
+
+def test_legs_and_completeness():
+    account = {"id": 1, "account_name": "Account 1"}
+    order = make_order()
+    assert order.legs(account) == [OrderLeg(account, 2572.0), OrderLeg(account, 2574.0)]
+    account_info, tp = order.legs(account)[0]
+    assert (account_info, tp) == (account, 2572.0)
+
+    assert order.is_complete()
+    assert not ParsedOrder("buy", "XAUUSD", 2570.0, None, [2572.0]).is_complete()
+    assert not ParsedOrder("buy", "XAUUSD", 2570.0, 2564.0, []).is_complete()
+
+
+def test_order_survives_pickling():
+    # Orders are sent to the account worker processes as they are
+    order = make_order()
+    order.to_json()
+    copy = pickle.loads(pickle.dumps(order))
+    assert copy == order
+    assert copy.to_json() == order.to_json()
+
+
+def test_cache_shares_one_instance(monkeypatch):
+    monkeypatch.setattr('parseCache.parse_cache', ParseCache(max_size=10))
+
+    message = "XAUUSD buy 2570 tp: 2572 sl: 2564"
+    assert parseOrder(message) is parseOrder(message)
+    assert validateOrder(message) == parseOrder(message).to_dict()
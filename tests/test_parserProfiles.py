@@ -0,0 +1,87 @@
+import json
+import pytest
+from unittest.mock import patch
+import parserProfiles
+from parserProfiles import ParserProfile, register_profile, get_profile, load_profiles
+from cleanMessage import cleanMessage
+from validateOrder import parseOrder
+from parsedOrder import ParsedOrder
+
+STANDARD = {"name": "Standard", "format": "{symbol} {signal} {price} sl {sl} [tp {tp}]+"}
+
+
+@pytest.fixture
+def registry():
+    # Each test starts without profiles and leaves none behind
+    with patch.dict(parserProfiles.profiles, clear=True):
+        yield parserProfiles.profiles
+
+
+@pytest.mark.parametrize("message", [
+    "XAUUSD buy 2570 sl 2564 tp 2572",
+    "XAUUSD buy 2570 sl: 2564 tp: 2572 tp: 2574 tp: 2576",
+    "XAUUSD sell 2672-2675 sl 2677 tp 2669 tp 2666",
+    "Gold buy 2570 - 2567 sl 2564 tp 2572",
+    "EURUSD sell 1.0850 sl 1.0880 tp 1.0820 tp 1.0790",
+])
+def test_profile_matches_generic_parser(message):
+    profile = ParserProfile(1, STANDARD)
+    cleaned = cleanMessage(message)
+    assert profile.parse(cleaned) == parseOrder(cleaned, cleaned=True)
+
+
+@pytest.mark.parametrize("message", [
+    "XAUUSD buy 2570 tp 2572 sl 2564",
+    "XAUUSD buy 2570 sl 2564 tp 2572 join us",
+    "XAUUSD buy 2570 sl 2564",
+    "Good morning traders",
+])
+def test_profile_rejects_other_formats(message):
+    assert ParserProfile(1, STANDARD).parse(cleanMessage(message)) is None
+
+
+def test_tp_shorthand_and_free_text():
+    profile = ParserProfile(1, {
+        "format": "{symbol} {signal} {price} sl {sl} [tp {tp}]+ {text}",
+        "tp_shorthand": True
+    })
+    result = profile.parse(cleanMessage("GBPCAD sell 1.78050 sl 1.78450 tp.77400 tp.77100 good luck"))
+    assert result == ParsedOrder("sell", "GBPCAD", 1.7805, 1.7845, (1.774, 1.771))
+
+
+@pytest.mark.parametrize("format_string", [
+    "{symbol} {signal} {price} {nope}",
+    "{symbol} [{signal} tp {tp}]+",
+    "{symbol} [tp [{tp}]+]+",
+    "{symbol} [tp {tp}",
+    "{symbol} {price} {price}",
+])
+def test_invalid_formats_are_rejected(format_string):
+    with pytest.raises(ValueError):
+        ParserProfile(1, {"format": format_string})
+
+
+def test_registry_normalises_channel_ids(registry):
+    profile = register_profile(-1001234567890, STANDARD)
+    assert get_profile(1001234567890) is profile
+    assert get_profile("-1001234567890") is profile
+    # Telethon's chat.id for a channel has no -100 prefix
+    assert get_profile(1234567890) is profile
+    assert get_profile(42) is None
+    assert get_profile(None) is None
+
+
+def test_load_profiles_skips_invalid_entries(registry, tmp_path):
+    path = tmp_path / "parser_profiles.json"
+    path.write_text(json.dumps({
+        "1001": STANDARD,
+        "1002": {"format": "{symbol} {bogus}"},
+        "1003": {"name": "No format"}
+    }))
+
+    load_profiles(str(path))
+    assert list(registry) == [1001]
+
+    # A missing file leaves the registry as it is
+    load_profiles(str(tmp_path / "missing.json"))
+    assert list(registry) == [1001]
@@ -0,0 +1,210 @@
+import logging
+import sqlite3
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+import init_db
+import channelRouting
+import dbConnection
+from pipeline import MessagePipeline
+from parsedOrder import ParsedOrder
+
+ORDER = ParsedOrder.from_dict({
+    "signal": "buy",
+    "symbol": "XAUUSD",
+    "price": 2000.0,
+    "sl": 1990.0,
+    "tp": [2010.0]
+})
+
+
+@pytest.fixture
+def pipeline_db(tmp_path, monkeypatch):
+    # A real database file, since every stage thread keeps its own connection
+    db_file = str(tmp_path / 'pipeline.db')
+    monkeypatch.setattr(init_db, 'DB_FILE', db_file)
+    monkeypatch.setattr(channelRouting, 'routing_table', None)
+    init_db.initialize_database()
+
+    conn = sqlite3.connect(db_file)
+    conn.executemany('INSERT INTO mt_accounts (id, account_name, server_name, login_id, password) VALUES (?, ?, ?, ?, ?)', [
+        (1, 'Account 1', 'Broker-Demo', '111', 'secret'),
+        (2, 'Account 2', 'Broker-Live', '222', 'secret'),
+    ])
+    conn.executemany('INSERT INTO channels (id, name, telegram_id, enabled) VALUES (?, ?, ?, 1)', [
+        (1, 'Gold Signals', -1001000000001),
+        (2, 'FX Signals', -1001000000002),
+    ])
+    conn.execute('INSERT INTO channel_account_mappings (channel_id, account_id) VALUES (1, 1)')
+    conn.commit()
+    yield db_file
+    conn.close()
+    dbConnection.close_connections()
+
+
+def send_batch(order, legs, stop_on_failure=False):
+    return [{"account": account['account_name'], "id": account['id'], "tp": tp, "response": {"success": True}}
+            for account, tp in legs]
+
+
+def logged(db_file):
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute('SELECT channel, is_valid_trade, trade_response, exception FROM logs ORDER BY id').fetchall()
+    finally:
+        conn.close()
+
+
+# Test cases for the staged message pipeline
+class TestMessagePipeline:
+
+    @patch('processMessage.parseOrder', return_value=ORDER)
+    @patch('processMessage.sendOrderBatch', side_effect=send_batch)
+    def test_mapped_channel_is_sent_and_logged(self, mock_send_order, mock_parse_order, pipeline_db):
+        pipeline = MessagePipeline().start()
+        assert pipeline.submit("XAUUSD buy 2000 sl 1990 tp 2010", "Gold Signals", chat_id=-1001000000001)
+        pipeline.join()
+        pipeline.stop()
+
+        rows = logged(pipeline_db)
+        assert len(rows) == 1
+        assert rows[0][:2] == ("Gold Signals", 1)
+        assert mock_send_order.call_args[0][1][0][0]['id'] == 1
+
+        stats = pipeline.get_stats()
+        assert set(stats) == {'parse', 'route', 'execution-terminal', 'log'}
+        assert all(stage['processed'] == 1 for stage in stats.values())
+        assert stats['log']['time_in_stage']['count'] == 1
+
+    @patch('processMessage.parseOrder', return_value=ORDER)
+    @patch('processMessage.sendOrderBatch')
+    def test_fan_out_gets_one_execution_stage_per_worker(self, mock_send_order, mock_parse_order, pipeline_db):
+        worker_pool = MagicMock()
+        worker_pool.send.side_effect = lambda order, tp, account_ids: [
+            {"account": f"Account {account_id}", "id": account_id, "tp": tp[0], "response": {"success": True}}
+            for account_id in account_ids]
+
+        pipeline = MessagePipeline(worker_pool).start()
+        pipeline.submit("XAUUSD buy 2000 sl 1990 tp 2010", "FX Signals", chat_id=-1001000000002)
+        pipeline.join()
+        pipeline.stop()
+
+        assert len(logged(pipeline_db)) == 2
+        assert sorted(call.args[2] for call in worker_pool.send.call_args_list) == [[1], [2]]
+        assert {'execution-1', 'execution-2'} <= set(pipeline.get_stats())
+        mock_send_order.assert_not_called()
+
+    @patch('processMessage.parseOrder', return_value=ORDER)
+    @patch('processMessage.sendOrderBatch')
+    def test_mapped_channel_goes_to_its_worker(self, mock_send_order, mock_parse_order, pipeline_db):
+        worker_pool = MagicMock()
+        worker_pool.send.return_value = [{"account": "Account 1", "id": 1, "tp": 2010.0, "response": {"success": True}}]
+
+        pipeline = MessagePipeline(worker_pool).start()
+        pipeline.submit("XAUUSD buy 2000 sl 1990 tp 2010", "Gold Signals", chat_id=-1001000000001)
+        pipeline.join()
+        pipeline.stop()
+
+        assert worker_pool.send.call_args[0][2] == [1]
+        assert 'execution-1' in pipeline.get_stats()
+        assert 'execution-terminal' not in pipeline.get_stats()
+        mock_send_order.assert_not_called()
+
+    @patch('processMessage.parseOrder', return_value=ORDER)
+    def test_parsing_goes_on_while_an_order_is_sent(self, mock_parse_order, pipeline_db):
+        release = threading.Event()
+
+        def slow_send(order, legs, stop_on_failure=False):
+            release.wait(5)
+            return send_batch(order, legs, stop_on_failure)
+
+        with patch('processMessage.sendOrderBatch', side_effect=slow_send):
+            pipeline = MessagePipeline().start()
+            for _ in range(3):
+                pipeline.submit("XAUUSD buy 2000 sl 1990 tp 2010", "Gold Signals", chat_id=-1001000000001)
+
+            # Every message is parsed and routed while the first order is still out
+            pipeline.parse.join()
+            pipeline.route.join()
+            assert pipeline.get_stats()['parse']['processed'] == 3
+            assert pipeline.get_stats()['execution-terminal']['processed'] == 0
+
+            release.set()
+            pipeline.join()
+            pipeline.stop()
+
+        assert len(logged(pipeline_db)) == 3
+        assert pipeline.get_stats()['execution-terminal']['max_depth'] >= 1
+
+    @patch('processMessage.parseOrder', return_value=None)
+    def test_unparsed_message_goes_straight_to_the_log(self, mock_parse_order, pipeline_db):
+        pipeline = MessagePipeline().start()
+        pipeline.submit("XAUUSD buy 2000", "Gold Signals")
+        pipeline.join()
+        pipeline.stop()
+
+        rows = logged(pipeline_db)
+        assert len(rows) == 1
+        assert rows[0][1] == 0
+        assert pipeline.get_stats()['route']['submitted'] == 0
+
+    def test_full_ingest_queue_drops_the_message(self, pipeline_db):
+        release = threading.Event()
+        pipeline = MessagePipeline(ingest_size=1)
+        pipeline.parse.start()
+
+        with patch.object(pipeline, '_parse', side_effect=lambda *args: release.wait(5)):
+            pipeline.submit("first", "Gold Signals")
+            # Wait for the worker to take the first message
+            while pipeline.parse.queue.qsize():
+                release.wait(0.01)
+            assert pipeline.submit("second", "Gold Signals") is True
+            assert pipeline.submit("third", "Gold Signals") is False
+
+            release.set()
+            pipeline.parse.join()
+            pipeline.parse.stop()
+
+        assert pipeline.get_stats()['parse']['dropped'] == 1
+
+    @patch('processMessage.parseOrder', return_value=ORDER)
+    def test_backed_up_stage_is_logged_while_it_lasts(self, mock_parse_order, pipeline_db, caplog, monkeypatch):
+        monkeypatch.setattr('pipeline.WARNING_INTERVAL', 0)
+        release = threading.Event()
+
+        def slow_send(order, legs, stop_on_failure=False):
+            release.wait(5)
+            return send_batch(order, legs, stop_on_failure)
+
+        with patch('processMessage.sendOrderBatch', side_effect=slow_send):
+            pipeline = MessagePipeline(stats_interval=0, depth_warning=2).start()
+            for _ in range(4):
+                pipeline.submit("XAUUSD buy 2000 sl 1990 tp 2010", "Gold Signals", chat_id=-1001000000001)
+            pipeline.parse.join()
+            pipeline.route.join()
+
+            # The next message to come in finds the execution stage backed up
+            pipeline.submit("", "Gold Signals")
+            pipeline.parse.join()
+            release.set()
+            pipeline.join()
+            pipeline.stop()
+
+        warnings = [record.getMessage() for record in caplog.records if record.levelno == logging.WARNING]
+        assert any(message.startswith("Pipeline stage execution-terminal: 3 queued") for message in warnings)
+
+    @patch('processMessage.parseOrder', return_value=ORDER)
+    @patch('processMessage.sendOrderBatch', side_effect=send_batch)
+    def test_stage_summary_covers_the_last_interval(self, mock_send_order, mock_parse_order, pipeline_db, caplog):
+        caplog.set_level(logging.INFO)
+        pipeline = MessagePipeline(stats_interval=3600).start()
+        for _ in range(3):
+            pipeline.submit("XAUUSD buy 2000 sl 1990 tp 2010", "Gold Signals", chat_id=-1001000000001)
+        pipeline.join()
+
+        pipeline.log_stats()
+        assert "3 done at p99" in next(line for line in caplog.messages if line.startswith("Pipeline stage route:"))
+        caplog.clear()
+        pipeline.log_stats()
+        assert "0 done at p99 0ms" in next(line for line in caplog.messages if line.startswith("Pipeline stage route:"))
+        pipeline.stop()
@@ -3,23 +3,42 @@ from unittest.mock import patch, MagicMock
 import json
 import time
 from processMessage import process_message
+from validateOrder import PARSER_VERSION
+from parsedOrder import ParsedOrder
+
+
+def batch_side_effect(response):
+    # Build one result per leg the way sendOrderBatch does, using the same response for every leg
+    def send_batch(order_json, legs, stop_on_failure=False):
+        results = []
+        for account_info, tp in legs:
+            results.append({
+                "account": account_info['account_name'] if account_info else None,
+                "id": account_info['id'] if account_info else None,
+                "tp": tp,
+                "response": response
+            })
+            if stop_on_failure and not response.get("success"):
+                break
+        return results
+    return send_batch
 
 # Test cases for process_message function
 class TestProcessMessage:
 
-    @patch('processMessage.validateOrder')
-    @patch('processMessage.sendOrder')
-    def test_process_valid_message(self, mock_send_order, mock_validate_order, mock_db):
+    @patch('processMessage.parseOrder')
+    @patch('processMessage.sendOrderBatch')
+    def test_process_valid_message(self, mock_send_order, mock_parse_order, mock_db):
         # Setup mocks
-        mock_validate_order.return_value = {
+        mock_parse_order.return_value = ParsedOrder.from_dict({
             "signal": "buy",
             "symbol": "XAUUSD",
             "price": 2000.0,
             "sl": 1990.0,
             "tp": [2010.0, 2020.0]
-        }
+        })
 
-        mock_send_order.return_value = {
+        mock_send_order.side_effect = batch_side_effect({
             "success": True,
             "result": {
                 "retcode": 10009,
@@ -31,16 +50,18 @@ class TestProcessMessage:
                 "ask": 2000.0,
                 "comment": "Request executed"
             }
-        }
+        })
 
         # Call the function with the mock database connection
         process_message("XAUUSD buy 2000 sl 1990 tp 2010 tp 2020", "Test Channel", mock_db["conn"])
 
-        # Verify that validateOrder was called with the correct message
-        mock_validate_order.assert_called_once_with("XAUUSD buy 2000 sl 1990 tp 2010 tp 2020")
+        # Verify that parseOrder was called with the correct message
+        mock_parse_order.assert_called_once_with("XAUUSD buy 2000 sl 1990 tp 2010 tp 2020", cleaned=True, channel="Test Channel")
 
-        # Verify that sendOrder was called twice (once for each TP)
-        assert mock_send_order.call_count == 2
+        # Verify that both TP legs were sent in a single batch
+        mock_send_order.assert_called_once()
+        legs = mock_send_order.call_args[0][1]
+        assert [tp for _, tp in legs] == [2010.0, 2020.0]
 
         # Verify that the database was updated
         mock_db["cursor"].execute("SELECT * FROM logs")
@@ -53,26 +74,27 @@ class TestProcessMessage:
         assert log[2] == "XAUUSD buy 2000 sl 1990 tp 2010 tp 2020"  # message
         assert log[5] == 1  # is_valid_trade
         assert log[7] is not None  # processed_at
+        assert log[10] == PARSER_VERSION  # parser_version
 
-    @patch('processMessage.validateOrder')
-    @patch('processMessage.sendOrder')
-    def test_process_invalid_message(self, mock_send_order, mock_validate_order, mock_db):
+    @patch('processMessage.parseOrder')
+    @patch('processMessage.sendOrderBatch')
+    def test_process_invalid_message(self, mock_send_order, mock_parse_order, mock_db):
         # Setup mocks for an invalid message (missing required fields)
-        mock_validate_order.return_value = {
+        mock_parse_order.return_value = ParsedOrder.from_dict({
             "signal": "buy",
             "symbol": "XAUUSD",
             "price": 2000.0,
             "sl": None,  # Missing SL
             "tp": []  # Missing TP
-        }
+        })
 
         # Call the function with the mock database connection
         process_message("XAUUSD buy 2000", "Test Channel", mock_db["conn"])
 
-        # Verify that validateOrder was called with the correct message
-        mock_validate_order.assert_called_once_with("XAUUSD buy 2000")
+        # Verify that parseOrder was called with the correct message
+        mock_parse_order.assert_called_once_with("XAUUSD buy 2000", cleaned=True, channel="Test Channel")
 
-        # Verify that sendOrder was not called
+        # Verify that sendOrderBatch was not called
         mock_send_order.assert_not_called()
 
         # Verify that the database was updated
@@ -89,31 +111,31 @@ class TestProcessMessage:
         # The failed_at field might be None in some cases, so we'll just check that it exists
         assert log[8] is not None or log[8] is None  # failed_at
 
-    @patch('processMessage.validateOrder')
-    @patch('processMessage.sendOrder')
-    def test_process_message_with_order_failure(self, mock_send_order, mock_validate_order, mock_db):
+    @patch('processMessage.parseOrder')
+    @patch('processMessage.sendOrderBatch')
+    def test_process_message_with_order_failure(self, mock_send_order, mock_parse_order, mock_db):
         # Setup mocks
-        mock_validate_order.return_value = {
+        mock_parse_order.return_value = ParsedOrder.from_dict({
             "signal": "buy",
             "symbol": "XAUUSD",
             "price": 2000.0,
             "sl": 1990.0,
             "tp": [2010.0]
-        }
+        })
 
         # Mock order failure
-        mock_send_order.return_value = {
+        mock_send_order.side_effect = batch_side_effect({
             "success": False,
             "error": "Order failed"
-        }
+        })
 
         # Call the function with the mock database connection
         process_message("XAUUSD buy 2000 sl 1990 tp 2010", "Test Channel", mock_db["conn"])
 
-        # Verify that validateOrder was called with the correct message
-        mock_validate_order.assert_called_once_with("XAUUSD buy 2000 sl 1990 tp 2010")
+        # Verify that parseOrder was called with the correct message
+        mock_parse_order.assert_called_once_with("XAUUSD buy 2000 sl 1990 tp 2010", cleaned=True, channel="Test Channel")
 
-        # Verify that sendOrder was called
+        # Verify that sendOrderBatch was called
         mock_send_order.assert_called_once()
 
         # Verify that the database was updated
@@ -129,19 +151,19 @@ class TestProcessMessage:
         # The failed_at field might be None in some cases, so we'll just check that it exists
         assert log[8] is not None or log[8] is None  # failed_at
 
-    @patch('processMessage.validateOrder')
-    @patch('processMessage.sendOrder')
-    def test_process_message_with_exception(self, mock_send_order, mock_validate_order, mock_db):
+    @patch('processMessage.parseOrder')
+    @patch('processMessage.sendOrderBatch')
+    def test_process_message_with_exception(self, mock_send_order, mock_parse_order, mock_db):
         # Setup mocks to raise an exception
-        mock_validate_order.side_effect = Exception("Test exception")
+        mock_parse_order.side_effect = Exception("Test exception")
 
         # Call the function with the mock database connection
         process_message("XAUUSD buy 2000 sl 1990 tp 2010", "Test Channel", mock_db["conn"])
 
-        # Verify that validateOrder was called with the correct message
-        mock_validate_order.assert_called_once_with("XAUUSD buy 2000 sl 1990 tp 2010")
+        # Verify that parseOrder was called with the correct message
+        mock_parse_order.assert_called_once_with("XAUUSD buy 2000 sl 1990 tp 2010", cleaned=True, channel="Test Channel")
 
-        # Verify that sendOrder was not called
+        # Verify that sendOrderBatch was not called
         mock_send_order.assert_not_called()
 
         # Verify that the database was updated
@@ -158,16 +180,16 @@ class TestProcessMessage:
         # The failed_at field might be None in some cases, so we'll just check that it exists
         assert log[8] is not None or log[8] is None  # failed_at
 
-    @patch('processMessage.validateOrder')
-    @patch('processMessage.sendOrder')
-    def test_process_empty_message(self, mock_send_order, mock_validate_order, mock_db):
+    @patch('processMessage.parseOrder')
+    @patch('processMessage.sendOrderBatch')
+    def test_process_empty_message(self, mock_send_order, mock_parse_order, mock_db):
         # Call the function with an empty message and the mock database connection
         process_message("", "Test Channel", mock_db["conn"])
 
-        # Verify that validateOrder was not called
-        mock_validate_order.assert_not_called()
+        # Verify that parseOrder was not called
+        mock_parse_order.assert_not_called()
 
-        # Verify that sendOrder was not called
+        # Verify that sendOrderBatch was not called
         mock_send_order.assert_not_called()
 
         # Verify that no log was created
@@ -175,20 +197,20 @@ class TestProcessMessage:
         logs = mock_db["cursor"].fetchall()
         assert len(logs) == 0
 
-    @patch('processMessage.validateOrder')
-    @patch('processMessage.sendOrder')
-    @patch('processMessage.sqlite3')
-    def test_process_message_with_db_error(self, mock_sqlite3, mock_send_order, mock_validate_order):
+    @patch('processMessage.parseOrder')
+    @patch('processMessage.sendOrderBatch')
+    @patch('processMessage.get_connection')
+    def test_process_message_with_db_error(self, mock_get_connection, mock_send_order, mock_parse_order):
         # Setup mocks
-        mock_validate_order.return_value = {
+        mock_parse_order.return_value = ParsedOrder.from_dict({
             "signal": "buy",
             "symbol": "XAUUSD",
             "price": 2000.0,
             "sl": 1990.0,
             "tp": [2010.0]
-        }
+        })
 
-        mock_send_order.return_value = {
+        mock_send_order.side_effect = batch_side_effect({
             "success": True,
             "result": {
                 "retcode": 10009,
@@ -200,7 +222,7 @@ class TestProcessMessage:
                 "ask": 2000.0,
                 "comment": "Request executed"
             }
-        }
+        })
 
         # Create a mock connection and cursor
         mock_conn = MagicMock()
@@ -212,38 +234,38 @@ class TestProcessMessage:
         # Make the connection.cursor method return our mock cursor
         mock_conn.cursor.return_value = mock_cursor
 
-        # Make sqlite3.connect return our mock connection
-        mock_sqlite3.connect.return_value = mock_conn
+        # Make the thread's shared connection our mock connection
+        mock_get_connection.return_value = mock_conn
 
-        # Call the function without providing a connection (so it will use sqlite3.connect)
+        # Call the function without providing a connection (so it will use the shared one)
         process_message("XAUUSD buy 2000 sl 1990 tp 2010", "Test Channel")
 
-        # Verify that validateOrder was called with the correct message
-        mock_validate_order.assert_called_once_with("XAUUSD buy 2000 sl 1990 tp 2010")
+        # Verify that parseOrder was called with the correct message
+        mock_parse_order.assert_called_once_with("XAUUSD buy 2000 sl 1990 tp 2010", cleaned=True, channel="Test Channel")
 
-        # Verify that sendOrder was called
+        # Verify that sendOrderBatch was called
         mock_send_order.assert_called_once()
 
         # Verify that the database rollback was called
         mock_conn.rollback.assert_called_once()
 
-    @patch('processMessage.validateOrder')
-    @patch('processMessage.sendOrder')
-    def test_process_message_initialization_failed(self, mock_send_order, mock_validate_order, mock_db):
+    @patch('processMessage.parseOrder')
+    @patch('processMessage.sendOrderBatch')
+    def test_process_message_initialization_failed(self, mock_send_order, mock_parse_order, mock_db):
         # Setup mocks
-        mock_validate_order.return_value = {
+        mock_parse_order.return_value = ParsedOrder.from_dict({
             "signal": "buy",
             "symbol": "XAUUSD",
             "price": 2000.0,
             "sl": 1990.0,
             "tp": [2010.0]
-        }
+        })
 
         # Mock initialization failure
-        mock_send_order.return_value = {
+        mock_send_order.side_effect = batch_side_effect({
             "success": False,
             "error": "Initialization failed: Some error"
-        }
+        })
 
         # Setup the database with test data
         cursor = mock_db["cursor"]
@@ -302,11 +324,14 @@ class TestProcessMessage:
         # Call the function with the mock database connection
         process_message("XAUUSD buy 2000 sl 1990 tp 2010", "Test Channel", mock_db["conn"])
 
-        # Verify that validateOrder was called with the correct message
-        mock_validate_order.assert_called_once_with("XAUUSD buy 2000 sl 1990 tp 2010")
+        # Verify that parseOrder was called with the correct message
+        mock_parse_order.assert_called_once_with("XAUUSD buy 2000 sl 1990 tp 2010", cleaned=True, channel="Test Channel")
 
-        # Verify that sendOrder was called once
-        assert mock_send_order.call_count == 1
+        # Verify that a single leg was sent to the mapped account
+        mock_send_order.assert_called_once()
+        legs = mock_send_order.call_args[0][1]
+        assert len(legs) == 1
+        assert legs[0][0]['account_name'] == "Account 1"
 
         # Query the database to verify the log entry
         cursor.execute("SELECT * FROM logs WHERE channel = 'Test Channel'")
@@ -334,3 +359,202 @@ class TestProcessMessage:
         # Check that failed_at is set and processed_at is None
         assert main_log[9] is not None  # failed_at
         assert main_log[8] is None  # processed_at
+
+    @patch('processMessage.parseOrder')
+    @patch('processMessage.sendOrderBatch')
+    def test_process_message_fan_out_uses_worker_pool(self, mock_send_order, mock_parse_order, mock_db):
+        # Unmapped channels fan out through the account workers when a pool is running
+        mock_parse_order.return_value = ParsedOrder.from_dict({
+            "signal": "buy",
+            "symbol": "XAUUSD",
+            "price": 2000.0,
+            "sl": 1990.0,
+            "tp": [2010.0]
+        })
+
+        cursor = mock_db["cursor"]
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS mt_accounts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                account_name TEXT,
+                server_name TEXT,
+                login_id TEXT,
+                password TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS channel_account_mappings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel_id INTEGER,
+                account_id INTEGER
+            )
+        ''')
+        for name in ("Account 1", "Account 2"):
+            cursor.execute('''
+                INSERT INTO mt_accounts (account_name, server_name, login_id, password)
+                VALUES (?, ?, ?, ?)
+            ''', (name, "Server 1", "12345", "password1"))
+        mock_db["conn"].commit()
+
+        response = {"success": True, "result": {"retcode": 10009}}
+        worker_pool = MagicMock()
+        worker_pool.send.return_value = [
+            {"account": "Account 1", "id": 1, "tp": 2010.0, "response": response},
+            {"account": "Account 2", "id": 2, "tp": 2010.0, "response": response}
+        ]
+
+        process_message("XAUUSD buy 2000 sl 1990 tp 2010", "Test Channel", mock_db["conn"], worker_pool=worker_pool)
+
+        # The pool handled the fan-out, not the in-process batch
+        worker_pool.send.assert_called_once()
+        assert worker_pool.send.call_args[0][2] == [1, 2]
+        mock_send_order.assert_not_called()
+
+        # One log per account leg
+        cursor.execute("SELECT * FROM logs")
+        assert len(cursor.fetchall()) == 2
+
+    @patch('processMessage.parseOrder')
+    @patch('processMessage.sendOrderBatch')
+    def test_process_message_mapped_account_uses_worker_pool(self, mock_send_order, mock_parse_order, mock_db):
+        # A mapped account's orders go through its worker, never the listener's own terminal
+        mock_parse_order.return_value = ParsedOrder.from_dict({
+            "signal": "buy",
+            "symbol": "XAUUSD",
+            "price": 2000.0,
+            "sl": 1990.0,
+            "tp": [2010.0, 2020.0]
+        })
+
+        cursor = mock_db["cursor"]
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS mt_accounts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                account_name TEXT,
+                server_name TEXT,
+                login_id TEXT,
+                password TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS channel_account_mappings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel_id INTEGER,
+                account_id INTEGER
+            )
+        ''')
+        cursor.execute('''
+            INSERT INTO mt_accounts (account_name, server_name, login_id, password)
+            VALUES (?, ?, ?, ?)
+        ''', ("Account 1", "Server 1", "12345", "password1"))
+        cursor.execute("INSERT INTO channel_account_mappings (channel_id, account_id) VALUES (1, 1)")
+        mock_db["conn"].commit()
+
+        worker_pool = MagicMock()
+        worker_pool.send.return_value = [
+            {"account": "Account 1", "id": 1, "tp": 2010.0, "response": {"success": True}},
+            {"account": "Account 1", "id": 1, "tp": 2020.0, "response": {"success": False, "error": "Rejected"}}
+        ]
+
+        process_message("XAUUSD buy 2000 sl 1990 tp 2010 tp 2020", "Test Channel", mock_db["conn"], worker_pool=worker_pool)
+
+        worker_pool.send.assert_called_once()
+        assert worker_pool.send.call_args[0][2] == [1]
+        assert worker_pool.send.call_args[1] == {"stop_on_failure": True}
+        mock_send_order.assert_not_called()
+
+        # Still one log row for the mapped account, holding the last leg's outcome
+        cursor.execute("SELECT exception FROM logs")
+        assert cursor.fetchall() == [("Rejected",)]
+
+    @patch('processMessage.parseOrder')
+    @patch('processMessage.sendOrderBatch')
+    def test_process_message_uses_channel_profile(self, mock_send_order, mock_parse_order, mock_db):
+        # A channel with a parser profile never reaches the generic parser for its own format
+        from parserProfiles import ParserProfile
+        profile = ParserProfile(1001234567890, {"format": "{symbol} {signal} {price} sl {sl} [tp {tp}]+"})
+        mock_send_order.side_effect = batch_side_effect({"success": True, "result": {"retcode": 10009}})
+
+        with patch.dict('parserProfiles.profiles', {profile.channel_id: profile}):
+            process_message("XAUUSD buy 2000 sl 1990 tp 2010 tp 2020", "Test Channel", mock_db["conn"],
+                            chat_id=-1001234567890)
+
+            mock_parse_order.assert_not_called()
+            legs = mock_send_order.call_args[0][1]
+            assert [tp for _, tp in legs] == [2010.0, 2020.0]
+
+            # Messages in another format fall back to the generic parser
+            mock_parse_order.return_value = ParsedOrder()
+            process_message("XAUUSD buy 2000", "Test Channel", mock_db["conn"], chat_id=-1001234567890)
+            mock_parse_order.assert_called_once_with("XAUUSD buy 2000", cleaned=True, channel="Test Channel")
+
+    @patch('processMessage.parseOrder')
+    @patch('processMessage.sendOrderBatch')
+    def test_process_message_routes_by_chat_id(self, mock_send_order, mock_parse_order, mock_db):
+        # The chat id picks the channel even when another channel has the same title
+        mock_parse_order.return_value = ParsedOrder.from_dict({
+            "signal": "buy",
+            "symbol": "XAUUSD",
+            "price": 2000.0,
+            "sl": 1990.0,
+            "tp": [2010.0]
+        })
+        mock_send_order.side_effect = batch_side_effect({"success": True, "result": {"retcode": 10009}})
+
+        cursor = mock_db["cursor"]
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS mt_accounts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                account_name TEXT,
+                server_name TEXT,
+                login_id TEXT,
+                password TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS channel_account_mappings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel_id INTEGER,
+                account_id INTEGER
+            )
+        ''')
+        for name in ("Account 1", "Account 2"):
+            cursor.execute('''
+                INSERT INTO mt_accounts (account_name, server_name, login_id, password)
+                VALUES (?, ?, ?, ?)
+            ''', (name, "Server 1", "12345", "password1"))
+        cursor.execute("INSERT INTO channels (telegram_id, name, enabled) VALUES (-1009876543210, 'Test Channel', 1)")
+        second_channel_id = cursor.lastrowid
+        cursor.execute("INSERT INTO channel_account_mappings (channel_id, account_id) VALUES (1, 1)")
+        cursor.execute("INSERT INTO channel_account_mappings (channel_id, account_id) VALUES (?, 2)", (second_channel_id,))
+        mock_db["conn"].commit()
+
+        # Telethon's chat.id of the second "Test Channel"
+        process_message("XAUUSD buy 2000 sl 1990 tp 2010", "Test Channel", mock_db["conn"], chat_id=9876543210)
+
+        legs = mock_send_order.call_args[0][1]
+        assert legs[0][0]['account_name'] == "Account 2"
+
+    @patch('processMessage.parseOrder')
+    @patch('processMessage.sendOrderBatch')
+    def test_chatter_is_rejected_before_any_lookup(self, mock_send_order, mock_parse_order, mock_db, monkeypatch):
+        from signalFilter import RejectedMessageLog
+        rejected_log = RejectedMessageLog(flush_rows=2, flush_seconds=60)
+        monkeypatch.setattr('signalFilter.rejected_log', rejected_log)
+
+        conn = MagicMock(wraps=mock_db["conn"])
+        process_message("Good morning traders", "Test Channel", conn)
+
+        # Neither the parser nor a single query ran, the message only waits in the buffer
+        mock_parse_order.assert_not_called()
+        conn.cursor.assert_not_called()
+        assert len(rejected_log.rows) == 1
+
+        # The second rejected message fills the batch and both are written together
+        process_message("JOIN VIP now 50% off", "Test Channel", mock_db["conn"])
+        mock_db["cursor"].execute("SELECT message, exception, is_valid_trade, parser_version FROM logs")
+        assert mock_db["cursor"].fetchall() == [
+            ("Good morning traders", "Not a signal", 0, PARSER_VERSION),
+            ("JOIN VIP now 50% off", "Not a signal", 0, PARSER_VERSION)
+        ]
+        assert rejected_log.rows == []
@@ -1,7 +1,8 @@
 import pytest
 from unittest.mock import patch, MagicMock
 import json
-from sendOrder import sendOrder
+import time
+from sendOrder import sendOrder, sendOrderBatch
 
 # Test cases for sendOrder function
 @pytest.mark.usefixtures("mock_mt5")
@@ -177,7 +178,8 @@ class TestSendOrder:
         mock_mt5["initialize"].assert_called_once()
         mock_mt5["account_info"].assert_called_once()
         mock_mt5["order_send"].assert_not_called()
-        mock_mt5["shutdown"].assert_called_once()
+        # The session stays alive for the next order
+        mock_mt5["shutdown"].assert_not_called()
 
     def test_symbol_select_failure(self, mock_mt5):
         # Test handling of symbol selection failure
@@ -204,7 +206,8 @@ class TestSendOrder:
         mock_mt5["account_info"].assert_called_once()
         mock_mt5["symbol_select"].assert_called_once_with("XAUUSD", True)
         mock_mt5["order_send"].assert_not_called()
-        mock_mt5["shutdown"].assert_called_once()
+        # The session stays alive for the next order
+        mock_mt5["shutdown"].assert_not_called()
 
     def test_symbol_info_tick_failure(self, mock_mt5):
         # Test handling of symbol info tick failure
@@ -232,7 +235,8 @@ class TestSendOrder:
         mock_mt5["symbol_select"].assert_called_once_with("XAUUSD", True)
         mock_mt5["symbol_info_tick"].assert_called_once_with("XAUUSD")
         mock_mt5["order_send"].assert_not_called()
-        mock_mt5["shutdown"].assert_called_once()
+        # The session stays alive for the next order
+        mock_mt5["shutdown"].assert_not_called()
 
     def test_order_send_failure(self, mock_mt5):
         # Test handling of order send failure
@@ -266,4 +270,202 @@ class TestSendOrder:
         mock_mt5["symbol_select"].assert_called_once_with("XAUUSD", True)
         mock_mt5["symbol_info_tick"].assert_called_once_with("XAUUSD")
         mock_mt5["order_send"].assert_called_once()
-        mock_mt5["shutdown"].assert_called_once()
+        # The session stays alive for the next order
+        mock_mt5["shutdown"].assert_not_called()
+
+    def test_session_reused_between_orders(self, mock_mt5):
+        # Two legs for the same account should only log in once
+        order_data = {
+            "signal": "buy",
+            "symbol": "XAUUSD",
+            "price": 2000.0,
+            "sl": 1990.0,
+            "tp": [2010.0, 2020.0]
+        }
+
+        with patch('MetaTrader5.terminal_info', return_value=MagicMock()):
+            first = sendOrder(order_data, self.test_account_info, order_data["tp"][0])
+            second = sendOrder(order_data, self.test_account_info, order_data["tp"][1])
+
+            assert first["success"] is True
+            assert second["success"] is True
+            mock_mt5["initialize"].assert_called_once()
+            mock_mt5["login"].assert_called_once()
+            mock_mt5["shutdown"].assert_not_called()
+
+            from mt5Session import get_session
+            stats = get_session().get_stats()
+            assert stats["logins"] == 1
+            assert stats["reuses"] == 1
+
+    def test_session_relogin_on_account_change(self, mock_mt5):
+        # Switching accounts logs in again without restarting the terminal
+        order_data = {
+            "signal": "buy",
+            "symbol": "XAUUSD",
+            "price": 2000.0,
+            "sl": 1990.0,
+            "tp": [2010.0]
+        }
+        other_account_info = dict(self.test_account_info, login_id='87654321', account_name='Other Account')
+
+        with patch('MetaTrader5.terminal_info', return_value=MagicMock()):
+            sendOrder(order_data, self.test_account_info, order_data["tp"][0])
+            sendOrder(order_data, other_account_info, order_data["tp"][0])
+
+            mock_mt5["initialize"].assert_called_once()
+            assert mock_mt5["login"].call_count == 2
+
+    def test_session_reinitializes_after_connection_drop(self, mock_mt5):
+        # A lost terminal connection triggers a fresh initialize and login
+        order_data = {
+            "signal": "buy",
+            "symbol": "XAUUSD",
+            "price": 2000.0,
+            "sl": 1990.0,
+            "tp": [2010.0]
+        }
+
+        with patch('MetaTrader5.terminal_info', return_value=MagicMock()) as mock_terminal_info:
+            sendOrder(order_data, self.test_account_info, order_data["tp"][0])
+            mock_terminal_info.return_value = None
+            sendOrder(order_data, self.test_account_info, order_data["tp"][0])
+
+            assert mock_mt5["initialize"].call_count == 2
+            assert mock_mt5["login"].call_count == 2
+
+    def test_symbol_and_tick_cached_between_legs(self, mock_mt5):
+        # The second leg reuses the selected symbol and the tick fetched for the first
+        order_data = {
+            "signal": "buy",
+            "symbol": "XAUUSD",
+            "price": 2000.0,
+            "sl": 1990.0,
+            "tp": [2010.0, 2020.0]
+        }
+
+        with patch('MetaTrader5.terminal_info', return_value=MagicMock()):
+            for tp in order_data["tp"]:
+                assert sendOrder(order_data, self.test_account_info, tp)["success"] is True
+
+            mock_mt5["symbol_select"].assert_called_once_with("XAUUSD", True)
+            mock_mt5["symbol_info"].assert_called_once_with("XAUUSD")
+            mock_mt5["symbol_info_tick"].assert_called_once_with("XAUUSD")
+            assert mock_mt5["order_send"].call_count == 2
+
+    def test_stale_tick_fetched_again(self, mock_mt5):
+        # Ticks older than the freshness bound are never reused, the symbol still is
+        from mt5Session import MT5Session
+        order_data = {
+            "signal": "sell",
+            "symbol": "XAUUSD",
+            "price": 2000.0,
+            "sl": 2010.0,
+            "tp": [1990.0, 1980.0]
+        }
+
+        with patch('mt5Session.session', MT5Session(tick_max_age=0)), \
+             patch('MetaTrader5.terminal_info', return_value=MagicMock()):
+            for tp in order_data["tp"]:
+                sendOrder(order_data, self.test_account_info, tp)
+
+            mock_mt5["symbol_select"].assert_called_once()
+            assert mock_mt5["symbol_info_tick"].call_count == 2
+
+    def test_symbols_forgotten_on_account_change(self, mock_mt5):
+        # Another account may be with another broker, so its symbols are selected again
+        order_data = {
+            "signal": "buy",
+            "symbol": "XAUUSD",
+            "price": 2000.0,
+            "sl": 1990.0,
+            "tp": [2010.0]
+        }
+        other_account_info = dict(self.test_account_info, login_id='87654321', account_name='Other Account')
+
+        with patch('MetaTrader5.terminal_info', return_value=MagicMock()):
+            sendOrder(order_data, self.test_account_info, 2010.0)
+            sendOrder(order_data, other_account_info, 2010.0)
+
+            assert mock_mt5["symbol_select"].call_count == 2
+
+    def test_fill_or_kill_only_symbol(self, mock_mt5):
+        # Symbols that don't allow immediate or cancel are sent fill or kill
+        mock_mt5["symbol_info"].return_value.filling_mode = 1  # SYMBOL_FILLING_FOK
+        order_data = {
+            "signal": "buy",
+            "symbol": "XAUUSD",
+            "price": 2000.0,
+            "sl": 1990.0,
+            "tp": [2010.0]
+        }
+
+        sendOrder(order_data, self.test_account_info, 2010.0)
+
+        order_request = mock_mt5["order_send"].call_args[0][0]
+        assert order_request["type_filling"] == mock_mt5["ORDER_FILLING_FOK"]
+
+    def test_batch_logs_in_once_per_account(self, mock_mt5):
+        # Three accounts with two TPs each should only need three logins
+        order_data = {
+            "signal": "buy",
+            "symbol": "XAUUSD",
+            "price": 2000.0,
+            "sl": 1990.0,
+            "tp": [2010.0, 2020.0]
+        }
+        accounts = [
+            dict(self.test_account_info, id=i, login_id=str(1000 + i), account_name=f"Account {i}")
+            for i in range(1, 4)
+        ]
+        # Interleave the legs so grouping by account actually matters
+        legs = [(account, tp) for tp in order_data["tp"] for account in accounts]
+
+        with patch('MetaTrader5.terminal_info', return_value=MagicMock()):
+            results = sendOrderBatch(order_data, legs)
+
+        assert len(results) == 6
+        assert all(result["response"]["success"] for result in results)
+        assert [result["account"] for result in results] == [
+            "Account 1", "Account 1", "Account 2", "Account 2", "Account 3", "Account 3"
+        ]
+        assert [result["tp"] for result in results[:2]] == [2010.0, 2020.0]
+        assert mock_mt5["login"].call_count == 3
+        assert mock_mt5["account_info"].call_count == 3
+        assert mock_mt5["symbol_select"].call_count == 3
+        assert mock_mt5["order_send"].call_count == 6
+
+    def test_batch_stop_on_failure(self, mock_mt5):
+        # A failed leg stops the remaining legs when requested
+        mock_mt5["symbol_info_tick"].return_value = None
+
+        order_data = {
+            "signal": "buy",
+            "symbol": "XAUUSD",
+            "price": 2000.0,
+            "sl": 1990.0,
+            "tp": [2010.0, 2020.0]
+        }
+        legs = [(self.test_account_info, tp) for tp in order_data["tp"]]
+
+        results = sendOrderBatch(order_data, legs, stop_on_failure=True)
+
+        assert len(results) == 1
+        assert results[0]["response"]["success"] is False
+        mock_mt5["order_send"].assert_not_called()
+
+    def test_batch_legs_past_the_deadline_are_not_sent(self, mock_mt5):
+        order_data = {
+            "signal": "buy",
+            "symbol": "XAUUSD",
+            "price": 2000.0,
+            "sl": 1990.0,
+            "tp": [2010.0, 2020.0]
+        }
+        legs = [(self.test_account_info, tp) for tp in order_data["tp"]]
+
+        with patch('MetaTrader5.terminal_info', return_value=MagicMock()):
+            results = sendOrderBatch(order_data, legs, deadline=time.time() - 1)
+
+        assert [result["response"]["error"] for result in results] == ["Order expired before it was sent"] * 2
+        mock_mt5["order_send"].assert_not_called()
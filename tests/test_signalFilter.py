@@ -0,0 +1,68 @@
+import os
+import json
+import sqlite3
+import pytest
+from signalFilter import looks_like_signal, RejectedMessageLog
+from validateOrder import parseOrder, PARSER_VERSION
+
+CORPUS_FILE = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'corpus', 'signals.json')
+
+
+def test_every_complete_order_in_the_corpus_passes():
+    with open(CORPUS_FILE, encoding='utf-8') as f:
+        messages = [entry['text'] for entry in json.load(f)['messages']]
+
+    for message in messages:
+        if parseOrder(message).is_complete():
+            assert looks_like_signal(message), message
+
+
+@pytest.mark.parametrize("message", [
+    "Good morning traders, market opens in 30 minutes",
+    "JOIN VIP now 50% off, contact @user",
+    "XAUUSD looks bullish today",
+    "Gold buy zone, wait for confirmation",
+    "Buy the dip on 3 pairs today",
+    "",
+])
+def test_chatter_is_rejected(message):
+    assert not looks_like_signal(message)
+
+
+@pytest.mark.parametrize("message", [
+    "GOLD BUY NOW @2730-2727",
+    "Sell now XAUUSD @2739.00",
+    "btc/usd sell 92600",
+    # A dash cleanMessage removes would otherwise hide the symbol
+    "XAU–USD buy 2570",
+])
+def test_signals_pass(message):
+    assert looks_like_signal(message)
+
+
+def test_rejected_messages_are_written_in_bulk():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('''
+        CREATE TABLE logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT, message TEXT, exception TEXT,
+            is_valid_trade INTEGER, failed_at TEXT, created_at TEXT, parser_version INTEGER
+        )
+    ''')
+
+    rejected_log = RejectedMessageLog(flush_rows=3, flush_seconds=60)
+    rejected_log.add("Channel", "one", conn)
+    rejected_log.add("Channel", "two", conn)
+    assert conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0] == 0
+    assert not rejected_log.is_due()
+
+    rejected_log.add("Channel", "three", conn)
+    rows = conn.execute("SELECT message, exception, is_valid_trade, parser_version FROM logs ORDER BY id").fetchall()
+    assert rows == [(text, "Not a signal", 0, PARSER_VERSION) for text in ("one", "two", "three")]
+
+    # Old rows are due even when the batch isn't full
+    rejected_log.flush_seconds = 0
+    rejected_log.rows.append(("Channel", "four", "Not a signal", 0, None, None))
+    rejected_log.oldest = 0
+    assert rejected_log.flush_if_due(conn) == 1
+    assert rejected_log.flush() == 0
+    conn.close()
@@ -0,0 +1,80 @@
+import sqlite3
+import pytest
+import init_db
+import symbolAliases
+from symbolAliases import AliasIndex, refresh_alias_index, get_alias_index
+from validateOrder import validateOrder
+from cleanMessage import cleanMessage
+
+
+@pytest.fixture
+def alias_db(tmp_path, monkeypatch):
+    # A real database file initialized like the application does
+    db_file = str(tmp_path / 'aliases.db')
+    monkeypatch.setattr(init_db, 'DB_FILE', db_file)
+    monkeypatch.setattr(symbolAliases, 'DB_FILE', db_file)
+    # Start every test from the built-in aliases
+    monkeypatch.setattr(symbolAliases, 'alias_index', AliasIndex(symbolAliases.currencies().items()))
+    monkeypatch.setattr(symbolAliases, 'last_checked', None)
+    init_db.initialize_database()
+
+    conn = sqlite3.connect(db_file)
+    yield conn
+    conn.close()
+
+# Test cases for the symbol alias index
+class TestSymbolAliases:
+
+    def test_database_is_seeded_with_builtin_aliases(self, alias_db):
+        cursor = alias_db.cursor()
+        cursor.execute('SELECT COUNT(*) FROM symbol_aliases')
+        assert cursor.fetchone()[0] > 0
+
+        index = refresh_alias_index(alias_db)
+        assert index.aliases['gold'] == 'XAUUSD'
+        assert index.symbol_for('xauusd') == 'XAUUSD'
+
+    def test_index_is_read_only(self, alias_db):
+        index = refresh_alias_index(alias_db)
+        with pytest.raises(TypeError):
+            index.aliases['silver'] = 'XAGUSD'
+
+    def test_index_is_only_rebuilt_when_version_changes(self, alias_db):
+        first = refresh_alias_index(alias_db)
+        assert refresh_alias_index(alias_db) is first
+
+        alias_db.execute("INSERT INTO symbol_aliases (alias, symbol) VALUES ('XAUUSD.m', 'XAUUSD')")
+        alias_db.commit()
+
+        second = refresh_alias_index(alias_db)
+        assert second is not first
+        assert second.version > first.version
+        assert second.aliases['xauusd.m'] == 'XAUUSD'
+
+    def test_new_alias_is_used_without_restart(self, alias_db):
+        refresh_alias_index(alias_db)
+        alias_db.execute("INSERT INTO symbol_aliases (alias, symbol) VALUES ('XAUUSD.m', 'XAUUSD')")
+        alias_db.commit()
+        symbolAliases.last_checked = None
+
+        # The longer alias wins over "xauusd", which is listed first
+        assert cleanMessage("XAUUSD.m buy 2570") == "XAUUSD buy 2570"
+        result = validateOrder("XAUUSD.m buy 2570 sl 2564 tp 2572")
+        assert result["symbol"] == "XAUUSD"
+        assert result["price"] == 2570.0
+
+    def test_version_is_checked_at_most_once_per_interval(self, alias_db, monkeypatch):
+        monkeypatch.setattr(symbolAliases, 'REFRESH_INTERVAL', 60)
+        first = get_alias_index()
+
+        alias_db.execute("INSERT INTO symbol_aliases (alias, symbol) VALUES ('silver', 'XAGUSD')")
+        alias_db.commit()
+
+        # Still within the interval, so the cached index is returned
+        assert get_alias_index() is first
+
+    def test_missing_table_keeps_current_index(self):
+        conn = sqlite3.connect(':memory:')
+        current = symbolAliases.alias_index
+        assert refresh_alias_index(conn) is current
+        conn.close()
@@ -0,0 +1,64 @@
+import re
+from symbolMatcher import SymbolMatcher, trie_pattern
+from currencies import currencies
+
+
+def replace_one_by_one(aliases, text):
+    # What cleanMessage did before the matcher: one str.replace per alias, in table order
+    for key, value in aliases.items():
+        text = text.replace(key.lower(), value)
+    return text
+
+# Test cases for the alias matcher
+def test_trie_pattern_prefers_longest_word():
+    pattern = re.compile(trie_pattern(['us30', 'us3', 'usoil']))
+    assert pattern.match('us30').group() == 'us30'
+    assert pattern.match('us3x').group() == 'us3'
+    assert pattern.match('usoil').group() == 'usoil'
+    assert pattern.match('usd') is None
+
+def test_find_all_reports_every_alias_with_its_position():
+    matcher = SymbolMatcher(currencies())
+    matches = matcher.find_all("gold buy 2570 xau/usd and us30")
+
+    assert [(start, end, canonical) for start, end, alias, canonical in matches] == [
+        (0, 4, 'XAUUSD'),
+        (14, 21, 'XAUUSD'),
+        (26, 30, 'DJ30'),
+    ]
+
+def test_find_all_includes_overlapping_aliases():
+    matcher = SymbolMatcher({'usdcad': 'USDCAD', 'cadchf': 'CADCHF'})
+    matches = matcher.find_all("usdcadchf")
+
+    assert [(start, alias) for start, end, alias, canonical in matches] == [(0, 'usdcad'), (3, 'cadchf')]
+
+def test_replace_matches_table_order():
+    # Where aliases overlap, the one listed first in the table wins, as with str.replace
+    aliases = {'cadchf': 'CADCHF', 'usdcad': 'USDCAD', 'us': 'XX', 'usd': 'YY'}
+    matcher = SymbolMatcher(aliases)
+
+    for text in ["usdcadchf", "usdcad usd us", "cadchfusdcad", "ususd"]:
+        assert matcher.replace(text) == replace_one_by_one(aliases, text)
+
+def test_replace_matches_currencies_table():
+    aliases = currencies()
+    matcher = SymbolMatcher(aliases)
+    messages = [
+        "gold buy 2570 - 2567 sl 2564 tp 2572",
+        "btc/usd sell 92600 btc.usd btcusd",
+        "xau/usd xau.usd xauusd us30 nas100 nasdaq100",
+        "audcadchf eurusdjpy",
+        "no symbols in here",
+    ]
+
+    for message in messages:
+        assert matcher.replace(message) == replace_one_by_one(aliases, message)
+
+def test_replace_falls_back_when_canonical_can_form_an_alias():
+    # "1" appears in a canonical value and starts an alias, so matches found up front can't be trusted
+    aliases = {'ab': 'X1', '1c': 'Y'}
+    matcher = SymbolMatcher(aliases)
+
+    assert not matcher.exact
+    assert matcher.replace("abc") == replace_one_by_one(aliases, "abc") == "XY"
@@ -0,0 +1,114 @@
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from mt5Session import get_session
+from sendOrder import sendOrder
+from mt5Session import TICK_MAX_AGE
+from tickPoller import TickPoller, start_tick_poller, stop_tick_poller
+
+account = {
+    'account_name': 'Test Account',
+    'login_id': '12345678',
+    'password': 'password123',
+    'server_name': 'MetaQuotes-Demo'
+}
+
+order_data = {
+    "signal": "buy",
+    "symbol": "XAUUSD",
+    "price": 2000.0,
+    "sl": 1990.0,
+    "tp": [2010.0]
+}
+
+
+# Test cases for the background tick poller
+@pytest.mark.usefixtures("mock_mt5")
+class TestTickPoller:
+
+    def test_nothing_polled_before_login(self, mock_mt5):
+        assert TickPoller().poll_once() == 0
+        mock_mt5["symbol_info_tick"].assert_not_called()
+
+    def test_polls_symbols_of_recent_signals(self, mock_mt5):
+        with patch('MetaTrader5.terminal_info', return_value=MagicMock()):
+            sendOrder(order_data, account, 2010.0)
+            mock_mt5["symbol_info_tick"].reset_mock()
+
+            poller = TickPoller()
+            assert poller.poll_once() == 1
+            mock_mt5["symbol_info_tick"].assert_called_once_with("XAUUSD")
+            assert poller.get_stats()['ticks'] == 1
+
+    def test_order_uses_polled_tick(self, mock_mt5):
+        with patch('MetaTrader5.terminal_info', return_value=MagicMock()):
+            sendOrder(order_data, account, 2010.0)
+
+            # The tick of the first order went stale, the poller replaced it
+            session = get_session()
+            session.tick_max_age = 0.05
+            time.sleep(0.06)
+            mock_mt5["symbol_info_tick"].return_value.ask = 2001.0
+            TickPoller().poll_once()
+            mock_mt5["symbol_info_tick"].reset_mock()
+
+            sendOrder(order_data, account, 2010.0)
+
+            mock_mt5["symbol_info_tick"].assert_not_called()
+            assert mock_mt5["order_send"].call_args[0][0]["price"] == 2001.0
+
+    def test_failed_tick_keeps_previous(self, mock_mt5):
+        with patch('MetaTrader5.terminal_info', return_value=MagicMock()):
+            sendOrder(order_data, account, 2010.0)
+            previous = get_session().ticks["XAUUSD"]
+
+            mock_mt5["symbol_info_tick"].return_value = None
+            assert TickPoller().poll_once() == 0
+            assert get_session().ticks["XAUUSD"] == previous
+
+    def test_thread_polls_until_stopped(self, mock_mt5):
+        with patch('MetaTrader5.terminal_info', return_value=MagicMock()):
+            sendOrder(order_data, account, 2010.0)
+
+            poller = TickPoller(interval=0.01).start()
+            time.sleep(0.1)
+            poller.stop()
+
+            stats = poller.get_stats()
+            assert stats['sweeps'] > 1
+            assert stats['running'] is False
+
+    def test_polls_only_recently_traded_symbols(self, mock_mt5):
+        with patch('MetaTrader5.terminal_info', return_value=MagicMock()):
+            session = get_session()
+            session.poll_symbols = 2
+            session.ensure(account)
+            # Selected during warm-up but never traded
+            session.select_symbol("EURUSD")
+            for symbol in ["XAUUSD", "GBPUSD", "USDJPY"]:
+                session.tick(symbol)
+            mock_mt5["symbol_info_tick"].reset_mock()
+
+            assert TickPoller().poll_once() == 2
+            polled = [call.args[0] for call in mock_mt5["symbol_info_tick"].call_args_list]
+            assert polled == ["GBPUSD", "USDJPY"]
+
+    def test_sweep_skipped_while_an_order_is_sent(self, mock_mt5):
+        with patch('MetaTrader5.terminal_info', return_value=MagicMock()):
+            sendOrder(order_data, account, 2010.0)
+            mock_mt5["symbol_info_tick"].reset_mock()
+
+            poller = TickPoller()
+            with get_session().sending_order():
+                assert poller.poll_once() == 0
+            mock_mt5["symbol_info_tick"].assert_not_called()
+            assert poller.get_stats()['skipped'] == 1
+
+            assert poller.poll_once() == 1
+
+    def test_interval_is_never_below_tick_max_age(self):
+        poller = start_tick_poller(interval=TICK_MAX_AGE / 10)
+        try:
+            assert poller.interval == TICK_MAX_AGE
+        finally:
+            stop_tick_poller()
@@ -1,5 +1,11 @@
+import time
 import pytest
-from validateOrder import validateOrder
+from validateOrder import validateOrder, parseOrder, _validateOrderHeuristic, _validateOrderStrict
+from parserStats import ParserStats
+from cleanMessage import cleanMessage
+from parseCache import ParseCache
+from symbolAliases import AliasIndex
+from currencies import currencies
 
 # Test cases for validateOrder function
 def test_validate_buy_order():
@@ -104,3 +110,111 @@ def test_validate_order_with_indexed_tp():
     assert result["price"] == 106900.0
     assert result["sl"] == 104900.0
     assert result["tp"] == [107100.0, 107200.0, 107300.0, 109500.0]
+
+@pytest.mark.parametrize("message, sl, tp", [
+    ("XAUUSD sell (2668.5- 2670.5) tp1: 2667 tp2: 2663 stop loss: 2673.5", 2673.5, [2667.0, 2663.0]),
+    # Repeated colons used to need a second cleaning pass
+    ("XAUUSD buy 2570 Stop Loss :: 2564 tp 2575", 2564.0, [2575.0]),
+    ("XAUUSD buy 2570 sl 2564 tp 1 :: 2575", 2564.0, [2575.0]),
+    ("XAUUSD buy 2570 sl ::: 2564 tp :: 2575 tp2 :: 2580", 2564.0, [2575.0, 2580.0]),
+])
+def test_validate_order_already_cleaned(message, sl, tp):
+    # Callers that cleaned the message themselves, as process_message does, get the same result
+    result = validateOrder(cleanMessage(message), cleaned=True)
+    assert result == validateOrder(message)
+    assert result["sl"] == sl
+    assert result["tp"] == tp
+
+def test_parse_order_matches_heuristic_parser():
+    # Whatever tier answers, the result is what the step by step parser gives
+    messages = [
+        "XAUUSD buy 2570 - 2567 sl: 2564 tp: 2572 tp: 2574 tp: 2576 tp: open",
+        "XAUUSD sell 2571 tp 2569 tp 2568 tp 2567 tp 2556 sl 2586",
+        "XAUUSD buy : 2569 - 2566 sl : 2563 tp : 2575 tp : 2580",
+        "XAUUSD sell (2668.5- 2670.5) tp1: 2667 tp2: 2663 stop loss: 2673.5",
+        "XAUUSD sell 2672-2675 stoploss point : 2677 take profit 1. :2669 take profit 2 :2666 take profit 3 :2663",
+        "Sell now XAUUSD @2739.00\n\nStoploss: 2744.50\n\nTP: 2706.00\n\nUse max 1-2% risk per trade",
+        "EURUSD sell SP500 1.0850 sl 1.0880 tp 1.0820",
+        # Removing the SL here leaves "1 -2567", which the step by step parser reads as a range
+        "XAUUSD buy 1 sl 2564-2567 tp 2572",
+        # Removing both SLs leaves "tp 1   2570", an indexed TP
+        "XAUUSD tp 1 sl 1 sl 1.78050 2570",
+        "XAUUSD buy 2570 sl 0 tp 2572",
+        # Removing the SL glues "tp" to the "0" at the end, far from the 10 digit number
+        "EURUSD1-2% 2564.5 tp 9260092600 sl 92600 buy 0",
+    ]
+
+    for message in messages:
+        cleaned = cleanMessage(message)
+        assert parseOrder(cleaned, cleaned=True) == _validateOrderHeuristic(cleaned)
+
+    assert validateOrder("EURUSD1-2% 2564.5 tp 9260092600 sl 92600 buy 0")["tp"] == [0.0]
+
+def test_repeated_messages_are_served_from_cache(monkeypatch):
+    cache = ParseCache(max_size=10)
+    monkeypatch.setattr('parseCache.parse_cache', cache)
+
+    # Not in the strict layout, which is parsed without the cache
+    message = "XAUUSD buy 2570 tp: 2572 tp: 2574 sl: 2564"
+    first = validateOrder(message)
+    second = validateOrder(message)
+
+    assert first == second
+    assert cache.get_stats()['misses'] == 1
+    assert cache.get_stats()['hits'] == 1
+
+    # Changing a result doesn't change what the cache hands out next
+    second['tp'].append(9999.0)
+    assert validateOrder(message)['tp'] == [2572.0, 2574.0]
+
+def test_parse_cache_evicts_least_recently_used():
+    cache = ParseCache(max_size=2)
+    generation = ('aliases', 1)
+    for text in ["a", "b", "a", "c"]:
+        cache.put(cache.key(text), generation, {"tp": [1.0]})
+
+    assert cache.get(cache.key("b"), generation) is None
+    assert cache.get(cache.key("a"), generation) is not None
+    assert cache.get_stats()['evictions'] == 1
+
+def test_parse_cache_is_emptied_when_aliases_change(monkeypatch):
+    cache = ParseCache(max_size=10)
+    monkeypatch.setattr('parseCache.parse_cache', cache)
+
+    message = "XAUUSD buy 2570 tp: 2572 sl: 2564"
+    validateOrder(message)
+    # A reloaded alias table comes with a new index
+    monkeypatch.setattr('symbolAliases.alias_index', AliasIndex(currencies().items(), version=99))
+    monkeypatch.setattr('symbolAliases.last_checked', time.monotonic())
+    validateOrder(message)
+
+    assert cache.get_stats()['misses'] == 2
+    assert cache.get_stats()['invalidations'] == 1
+
+def test_strict_layout_takes_the_fast_path(monkeypatch):
+    stats = ParserStats()
+    monkeypatch.setattr('parserStats.parser_stats', stats)
+
+    messages = [
+        "XAUUSD buy 2570 sl 2564 tp 2572 tp 2574",
+        "Gold sell 2672 - 2675 stop loss: 2677 tp: 2669 tp: 2666",
+        "EURUSD buy 1.0850 sl 1.0820 tp 1.0880",
+    ]
+    for message in messages:
+        cleaned = cleanMessage(message)
+        strict = _validateOrderStrict(cleaned)
+        assert strict is not None
+        assert strict == _validateOrderHeuristic(cleaned)
+        assert parseOrder(cleaned, cleaned=True, channel="Fast") == strict
+
+    # Anything else goes down the slower tiers
+    assert _validateOrderStrict(cleanMessage("XAUUSD buy 2570 tp 2572 sl 2564")) is None
+    assert _validateOrderStrict(cleanMessage("XAUUSD buy 2570 sl 0 tp 2572")) is None
+    assert _validateOrderStrict(cleanMessage("XAUUSD buy 2570 sl 2564 tp 2572 good luck")) is None
+    parseOrder("BTCUSD buy 92600 tp 1 92700 sl 90600", channel="Slow")
+
+    stats_by_channel = stats.get_stats()
+    assert stats_by_channel["Fast"]["strict"] == 3
+    assert stats_by_channel["Fast"]["fast_path_rate"] == 1.0
+    assert stats_by_channel["Slow"]["heuristic"] == 1
+    assert stats_by_channel["Slow"]["fast_path_rate"] == 0.0
@@ -0,0 +1,101 @@
+import sqlite3
+import pytest
+import init_db
+from unittest.mock import patch, MagicMock
+from mt5Session import get_session
+from sendOrder import sendOrder
+from warmup import load_mapped_accounts, warm_account, warm_up, get_warmup_timings
+
+
+@pytest.fixture
+def mapped_db(tmp_path, monkeypatch):
+    # Two accounts mapped to channels and one that no channel uses
+    db_file = str(tmp_path / 'warmup.db')
+    monkeypatch.setattr(init_db, 'DB_FILE', db_file)
+    init_db.initialize_database()
+
+    conn = sqlite3.connect(db_file)
+    conn.executemany('INSERT INTO mt_accounts (id, account_name, server_name, login_id, password) VALUES (?, ?, ?, ?, ?)', [
+        (1, 'Account 1', 'Broker-Demo', '111', 'secret'),
+        (2, 'Account 2', 'Broker-Demo', '222', 'secret'),
+        (3, 'Unused', 'Broker-Demo', '333', 'secret'),
+    ])
+    conn.executemany('INSERT INTO channels (id, name, telegram_id, enabled) VALUES (?, ?, ?, 1)', [
+        (1, 'Gold Signals', 1001),
+        (2, 'FX Signals', 1002),
+        (3, 'More Gold', 1003),
+    ])
+    conn.executemany('INSERT INTO channel_account_mappings (channel_id, account_id) VALUES (?, ?)', [
+        (1, 1), (2, 2), (3, 1)
+    ])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_load_mapped_accounts(mapped_db):
+    accounts = load_mapped_accounts(mapped_db)
+    assert [account['account_name'] for account in accounts] == ['Account 1', 'Account 2']
+
+    # Most mapped first
+    mapped_db.executemany('INSERT INTO channel_account_mappings (channel_id, account_id) VALUES (?, ?)', [(1, 2), (3, 2)])
+    accounts = load_mapped_accounts(mapped_db)
+    assert [account['account_name'] for account in accounts] == ['Account 2', 'Account 1']
+
+
+@pytest.mark.usefixtures("mock_mt5")
+class TestWarmUp:
+
+    account = {
+        'account_name': 'Test Account',
+        'login_id': '12345678',
+        'password': 'password123',
+        'server_name': 'MetaQuotes-Demo'
+    }
+
+    def test_warm_account_logs_in_and_selects_symbols(self, mock_mt5):
+        # The broker doesn't offer EURUSD
+        mock_mt5["symbol_select"].side_effect = lambda symbol, enable: symbol != "EURUSD"
+
+        timings = warm_account(self.account, ["XAUUSD", "EURUSD"])
+
+        assert timings["success"] is True
+        assert timings["selected"] == 1
+        assert timings["missing"] == ["EURUSD"]
+        assert timings["login"] >= 0 and timings["symbols"] >= 0
+        mock_mt5["login"].assert_called_once()
+
+    def test_first_order_after_warm_up_is_hot(self, mock_mt5):
+        with patch('MetaTrader5.terminal_info', return_value=MagicMock()):
+            warm_account(self.account, ["XAUUSD"])
+            mock_mt5["symbol_select"].reset_mock()
+
+            order_data = {"signal": "buy", "symbol": "XAUUSD", "price": 2000.0, "sl": 1990.0, "tp": [2010.0]}
+            assert sendOrder(order_data, self.account, 2010.0)["success"] is True
+
+            mock_mt5["initialize"].assert_called_once()
+            mock_mt5["login"].assert_called_once()
+            mock_mt5["symbol_select"].assert_not_called()
+            assert get_session().get_stats()["reuses"] == 1
+
+    def test_warm_up_the_most_mapped_account(self, mock_mt5, mapped_db, caplog):
+        with patch('MetaTrader5.terminal_info', return_value=MagicMock()):
+            timings = warm_up(mapped_db)
+            # The warmed account is the one still logged in
+            assert get_session().ensure({"account_name": "Account 1", "login_id": "111",
+                                         "server_name": "Broker-Demo", "password": "secret"})["reused"] is True
+
+        assert [entry["account"] for entry in timings] == ['Account 1']
+        assert timings[0]["success"] is True
+        assert mock_mt5["login"].call_count == 1
+        assert get_warmup_timings() == timings
+        assert "Cold until their first signal: Account 2" in caplog.text
+
+    def test_failed_login_is_recorded(self, mock_mt5):
+        mock_mt5["login"].return_value = False
+
+        timings = warm_up(accounts=[self.account])
+
+        assert timings[0]["success"] is False
+        assert "Login failed" in timings[0]["error"]
+        mock_mt5["symbol_select"].assert_not_called()